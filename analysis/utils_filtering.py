@@ -0,0 +1,210 @@
+import os
+import yaml
+import polars as pl
+from polars import col as d
+
+
+#########################
+# RULE SETS
+#########################
+
+## A rule is a (name, predicate) tuple: the predicate is True for the rows to KEEP.
+## The predicate is a Polars expression, or a SQL string (e.g. "DIST_GC_KM >= 7400") parsed with pl.sql_expr.
+
+## XLR performance / airports feasibility (filtering.ipynb, "combining every criterion")
+RULES_PERFO = [
+    ('IS_FEASIBLE', d.IS_FEASIBLE),
+    ('DIST_GC_KM <= 8700', d.DIST_GC_KM <= 8700),
+    ('DIST_GC_KM >= 7400', d.DIST_GC_KM >= 7400),
+    ('not closed', d.CLOSING_YEAR_A.is_null() & d.CLOSING_YEAR_B.is_null()),
+    ('not industrial', ~d.APT_CODE_A.is_in(['YMX']) & ~d.APT_CODE_B.is_in(['YMX'])),
+]
+
+## Airport metrics (filtering.ipynb, "combining filter")
+RULES_APT_METRICS = [
+    ('not 1 runway both ends', ~((d.NB_RUNWAYS_A == 1) & (d.NB_RUNWAYS_B == 1))),
+    ('NB_REVIEW_LOG > 5 both ends', (d.NB_REVIEW_LOG_A > 5) & (d.NB_REVIEW_LOG_B > 5)),
+    ('NB_REVIEW_LOG_A + B >= 13', d.NB_REVIEW_LOG_A + d.NB_REVIEW_LOG_B >= 13),
+    ('APT_CITY_DRIVE_TIME_H <= 1.5 both ends', (d.APT_CITY_DRIVE_TIME_H_A <= 1.5) & (d.APT_CITY_DRIVE_TIME_H_B <= 1.5)),
+    ('ROUTE_DRIVE_TIME_H >= 0.4', d.ROUTE_DRIVE_TIME_H >= 0.4),
+    ('ROUTE_DRIVE_DIST_KM <= 100', d.ROUTE_DRIVE_DIST_KM <= 100),
+    ('ROUTE_DRIVE_DIST_KM >= 20', d.ROUTE_DRIVE_DIST_KM >= 20),
+    ('ROUTE_RATING <= 9', d.ROUTE_RATING <= 9),
+    ('RATING > 3 both ends', (d.RATING_A > 3) & (d.RATING_B > 3)),
+    ('not RATING < 3.5 both ends', ~((d.RATING_A < 3.5) & (d.RATING_B < 3.5))),
+    ('not island both ends', ~((d.IS_ISLAND_A == 1) & (d.IS_ISLAND_B == 1))),
+    ('not ELEV_FT >= 1500 both ends', ~((d.ELEV_FT_A >= 1500) & (d.ELEV_FT_B >= 1500))),
+    ('not ELEV_FT_A >= 500 & ELEV_FT_B >= 2500', ~((d.ELEV_FT_A >= 500) & (d.ELEV_FT_B >= 2500))),
+    ('not ELEV_FT_A >= 2500 & ELEV_FT_B >= 500', ~((d.ELEV_FT_A >= 2500) & (d.ELEV_FT_B >= 500))),
+    ('not ELEV_FT_A < 0 & ELEV_FT_B >= 1000', ~((d.ELEV_FT_A < 0) & (d.ELEV_FT_B >= 1000))),
+    ('not ELEV_FT_B < 0 & ELEV_FT_A >= 1000', ~((d.ELEV_FT_B < 0) & (d.ELEV_FT_A >= 1000))),
+]
+
+
+#########################
+# HELPER FUNCTIONS
+#########################
+
+def excluded_airports_rule(name: str, apt_codes: list[str]) -> tuple[str, pl.Expr]:
+    """
+    Rule removing the routes with an airport of `apt_codes` at either end.
+
+    Example:
+        >>> list_heli_aero = df_airports_ratings.filter(d.GOOGLE_NAME.str.contains('Heliport|Aerodrome'))['APT_CODE'].to_list()
+        >>> rule = excluded_airports_rule('not heliport/aerodrome', list_heli_aero)
+    """
+    return (name, ~d.APT_CODE_A.is_in(apt_codes) & ~d.APT_CODE_B.is_in(apt_codes))
+
+
+def load_rules(source: str) -> list[tuple[str, pl.Expr]]:
+    """
+    Load a rule set from a YAML file or string.
+
+    The YAML is a list of {name, expr} items, `expr` being a SQL predicate on the columns:
+
+        - name: range max
+          expr: DIST_GC_KM <= 8700
+        - name: not closed
+          expr: CLOSING_YEAR_A IS NULL AND CLOSING_YEAR_B IS NULL
+
+    Parameters:
+        source (str): Path of a YAML file, or the YAML content itself.
+
+    Returns:
+        list[tuple[str, pl.Expr]]: The rules.
+    """
+    if os.path.isfile(source):
+        with open(source) as f:
+            items = yaml.safe_load(f)
+    else:
+        items = yaml.safe_load(source)
+
+    return [(item['name'], item['expr']) for item in items]
+
+
+def _to_expr(predicate: pl.Expr | str) -> pl.Expr:
+    """
+    Rule predicate as a Polars expression, null counting as not kept (same as `.filter`).
+    """
+    if isinstance(predicate, str):
+        predicate = pl.sql_expr(predicate)
+
+    return predicate.fill_null(False)
+
+
+#########################
+# MAIN FUNCTIONS
+#########################
+
+def apply_rules(
+    df: pl.DataFrame | pl.LazyFrame,
+    rules: list[tuple[str, pl.Expr | str]]
+) -> tuple[pl.DataFrame, pl.DataFrame]:
+    """
+    Filter a route table with a rule set and report the attrition of every rule, in a single scan.
+
+    Each rule is evaluated once as a boolean mask; the filtered frame, the standalone counts
+    (rows kept by the rule alone) and the cumulative counts (rows kept by the rule and all the
+    previous ones, in order) are all derived from these masks, in one lazy plan (the masks are
+    never materialized next to the full table).
+
+    Parameters:
+        df (pl.DataFrame | pl.LazyFrame): Table to filter (e.g. df_route_combinaison_enhanced).
+        rules (list[tuple[str, pl.Expr | str]]): Ordered list of (name, predicate), the predicate is True for the rows to keep.
+
+    Returns:
+        tuple[pl.DataFrame, pl.DataFrame]:
+            - the filtered table,
+            - the attrition report with one row per rule (plus a first 'ALL' row): RULE, NB_KEPT_ALONE,
+              NB_REMOVED_ALONE, NB_KEPT_CUMUL and NB_REMOVED_STEP (rows removed by this rule after the previous ones).
+
+    Example:
+        >>> df_filtered, df_attrition = apply_rules(df_route_combinaison_enhanced, RULES_PERFO + RULES_APT_METRICS)
+    """
+    masks = [f"__RULE_{i}" for i in range(len(rules))]
+
+    ## evaluate each rule once
+    lf_masked = df.lazy().with_columns([_to_expr(predicate).alias(mask) for (_, predicate), mask in zip(rules, masks)])
+
+    ## standalone and cumulative counts from the masks
+    lf_counts = lf_masked.select(
+        pl.len().alias('NB_ROWS'),
+        *[d(mask).sum().alias(f"ALONE_{i}") for i, mask in enumerate(masks)],
+        *[pl.all_horizontal(masks[:i + 1]).sum().alias(f"CUMUL_{i}") for i in range(len(masks))],
+    )
+    lf_filtered = (lf_masked.filter(pl.all_horizontal(masks)) if masks else lf_masked).drop(masks)
+
+    ## one plan: the scan and the masks are shared by the counts and the filtered frame
+    df_counts, df_filtered = pl.collect_all([lf_counts, lf_filtered])
+    counts = df_counts.row(0, named=True)
+
+    nb_rows = counts['NB_ROWS']
+    df_attrition = (
+        pl.DataFrame({
+            'RULE': ['ALL', *[name for name, _ in rules]],
+            'NB_KEPT_ALONE': [nb_rows, *[counts[f"ALONE_{i}"] for i in range(len(rules))]],
+            'NB_KEPT_CUMUL': [nb_rows, *[counts[f"CUMUL_{i}"] for i in range(len(rules))]],
+        }, schema_overrides={'NB_KEPT_ALONE': pl.UInt32, 'NB_KEPT_CUMUL': pl.UInt32})
+        .with_columns(NB_REMOVED_ALONE = nb_rows - d.NB_KEPT_ALONE.cast(pl.Int64),
+                      NB_REMOVED_STEP = (d.NB_KEPT_CUMUL.cast(pl.Int64).shift(1) - d.NB_KEPT_CUMUL).fill_null(0))
+        .select('RULE', 'NB_KEPT_ALONE', 'NB_REMOVED_ALONE', 'NB_KEPT_CUMUL', 'NB_REMOVED_STEP')
+    )
+
+    return df_filtered, df_attrition
+
+
+def compare_scenarios(
+    df: pl.DataFrame | pl.LazyFrame,
+    scenarios: dict[str, list[tuple[str, pl.Expr | str]]]
+) -> pl.DataFrame:
+    """
+    Count the rows kept by several rule sets, in a single scan of the table.
+
+    Rules shared by several scenarios (same name) are evaluated only once. Two rules with the same name
+    must have the same predicate, otherwise a ValueError is raised.
+
+    Parameters:
+        df (pl.DataFrame | pl.LazyFrame): Table to filter (e.g. df_route_combinaison_enhanced).
+        scenarios (dict[str, list[tuple[str, pl.Expr | str]]]): Scenario name -> rule set.
+
+    Returns:
+        pl.DataFrame: SCENARIO, NB_RULES, NB_KEPT and PCT_KEPT of each scenario.
+
+    Example:
+        >>> compare_scenarios(df_route_combinaison_enhanced, {
+        ...     'perfo': RULES_PERFO,
+        ...     'perfo + metrics': RULES_PERFO + RULES_APT_METRICS,
+        ... })
+    """
+    ## one mask per distinct rule name
+    unique_rules = {}
+    for rules in scenarios.values():
+        for name, predicate in rules:
+            if name in unique_rules and not _to_expr(unique_rules[name]).meta.eq(_to_expr(predicate)):
+                raise ValueError(f"Rule name {name!r} is used with different predicates: {unique_rules[name]} and {predicate}")
+            unique_rules.setdefault(name, predicate)
+    masks = {name: f"__RULE_{i}" for i, name in enumerate(unique_rules)}
+
+    counts = (
+        df.lazy()
+        .with_columns([_to_expr(predicate).alias(masks[name]) for name, predicate in unique_rules.items()])
+        .select(
+            pl.len().alias('__NB_ROWS'),
+            ## positional names: any scenario name is allowed
+            *[
+                (pl.all_horizontal([masks[name] for name, _ in rules]).sum() if rules else pl.len()).alias(f"__SCENARIO_{i}")
+                for i, rules in enumerate(scenarios.values())
+            ],
+        )
+        .collect()
+        .row(0, named=True)
+    )
+
+    return (
+        pl.DataFrame({
+            'SCENARIO': list(scenarios),
+            'NB_RULES': [len(rules) for rules in scenarios.values()],
+            'NB_KEPT': [counts[f"__SCENARIO_{i}"] for i in range(len(scenarios))],
+        })
+        .with_columns(PCT_KEPT = d.NB_KEPT / counts['__NB_ROWS'] * 100)
+    )
@@ -5,6 +5,156 @@ import polars as pl
 from plotly.subplots import make_subplots
 import plotly.graph_objects as go
 
+## Float columns of a heatmap with more distinct values than this are binned when no bins are given
+## (the pre-binned columns of the notebooks, e.g. RATING_A at 0.1 steps, keep their values)
+AUTO_BIN_MIN_DISTINCT = 100
+
+
+def _nice_bin_size(span: float, nbins: int) -> float:
+    """
+    Bin size close to span / nbins, rounded to 1, 2, 2.5 or 5 times a power of 10 (as the Plotly auto-binning).
+    """
+    if span <= 0:
+        return 1.0
+
+    rough = span / nbins
+    base = 10 ** np.floor(np.log10(rough))
+    return float(base * next(m for m in [1, 2, 2.5, 5, 10] if m * base >= rough))
+
+
+def _prebinned_histogram_figure(
+    df: pl.DataFrame | pd.DataFrame,
+    category: str,
+    value_vars: list[str],
+    dico_color: dict,
+    histnorm: str,
+    order: dict,
+    nbins: int,
+    height: int
+) -> go.Figure:
+    """
+    Same figure as `px.histogram(..., facet_col="variable", marginal="box")`, built from summaries computed in Polars:
+    one bar trace per (category, variable) with the binned counts, and one box trace with precomputed quartiles.
+    """
+    ## bar height of every normalization supported by plotly
+    norms = {
+        None: pl.col("len").cast(pl.Float64),
+        "": pl.col("len").cast(pl.Float64),
+        "percent": pl.col("len") / pl.col("TOTAL") * 100,
+        "probability": pl.col("len") / pl.col("TOTAL"),
+        "density": pl.col("len") / pl.col("BIN_SIZE"),
+        "probability density": pl.col("len") / pl.col("TOTAL") / pl.col("BIN_SIZE"),
+    }
+    if histnorm not in norms:
+        raise ValueError(f"Unsupported histnorm {histnorm!r}, expected one of {[n for n in norms if n]} or None")
+
+    df_long = (
+        (pl.from_pandas(df) if isinstance(df, pd.DataFrame) else df)
+        .lazy()
+        .select(category, *[pl.col(c).cast(pl.Float64) for c in value_vars])
+        .unpivot(index=category, on=value_vars, variable_name="variable", value_name="value")
+        .filter(pl.col("value").is_not_null() & pl.col("value").is_not_nan())
+        .filter(pl.col(category).is_not_null()) ## rows without category are not plotted (as plotly express)
+        .collect()
+    )
+
+    ## categories order: given order, then order of appearance (as plotly express)
+    categories = df_long[category].unique(maintain_order=True).to_list()
+    if order and category in order:
+        categories = [c for c in order[category] if c in categories] + [c for c in categories if c not in order[category]]
+
+    palette = px.colors.qualitative.Plotly
+    colors = {c: (dico_color or {}).get(c, palette[i % len(palette)]) for i, c in enumerate(categories)}
+
+    ## same bins for all the categories of a variable
+    df_range = df_long.group_by("variable").agg(MIN=pl.col("value").min(), MAX=pl.col("value").max())
+    bins = {}
+    for var, vmin, vmax in df_range.iter_rows():
+        size = _nice_bin_size(vmax - vmin, nbins)
+        bins[var] = (np.floor(vmin / size) * size, size)
+
+    df_bins = pl.DataFrame({
+        "variable": list(bins),
+        "BIN_START": [b[0] for b in bins.values()],
+        "BIN_SIZE": [b[1] for b in bins.values()],
+    })
+
+    ## histograms: counts per (category, variable, bin)
+    df_hist = (
+        df_long
+        .join(df_bins, on="variable")
+        .with_columns(BIN = ((pl.col("value") - pl.col("BIN_START")) / pl.col("BIN_SIZE")).floor().cast(pl.Int64))
+        .group_by(category, "variable", "BIN", "BIN_START", "BIN_SIZE")
+        .len()
+        .with_columns(TOTAL = pl.col("len").sum().over(category, "variable"))
+        .with_columns(
+            X = pl.col("BIN_START") + (pl.col("BIN") + 0.5) * pl.col("BIN_SIZE"),
+            Y = norms[histnorm]
+        )
+        .sort(category, "variable", "BIN")
+    )
+
+    ## boxes: quartiles (linear, as plotly), whiskers at the most extreme values within 1.5 IQR
+    df_box = (
+        df_long
+        .group_by(category, "variable")
+        .agg(
+            Q1 = pl.col("value").quantile(0.25, "linear"),
+            MEDIAN = pl.col("value").median(),
+            Q3 = pl.col("value").quantile(0.75, "linear"),
+        )
+        .with_columns(IQR = pl.col("Q3") - pl.col("Q1"))
+    )
+    df_box = df_box.join(
+        df_long
+        .join(df_box, on=[category, "variable"])
+        .group_by(category, "variable")
+        .agg(
+            LOWER = pl.col("value").filter(pl.col("value") >= pl.col("Q1") - 1.5 * pl.col("IQR")).min(),
+            UPPER = pl.col("value").filter(pl.col("value") <= pl.col("Q3") + 1.5 * pl.col("IQR")).max(),
+        ),
+        on=[category, "variable"]
+    )
+
+    ## layout of plotly express: boxes on top (row 1), histograms below (row 2)
+    fig = make_subplots(
+        rows=2, cols=len(value_vars),
+        row_heights=[0.2574, 0.7326], vertical_spacing=0.01, horizontal_spacing=0.03,
+        column_titles=[f"variable={v}" for v in value_vars]
+    )
+
+    y_title = histnorm if histnorm else "count"
+    for cat in categories:
+        for j, var in enumerate(value_vars, start=1):
+            df_h = df_hist.filter((pl.col(category) == cat) & (pl.col("variable") == var))
+            df_b = df_box.filter((pl.col(category) == cat) & (pl.col("variable") == var))
+            first = j == 1
+
+            fig.add_trace(go.Bar(
+                x=df_h["X"].to_numpy(), y=df_h["Y"].to_numpy(), width=bins[var][1] if var in bins else None,
+                name=str(cat), legendgroup=str(cat), showlegend=first,
+                marker=dict(color=colors[cat], opacity=0.5, line_width=0),
+                hovertemplate=f"{category}={cat}<br>variable={var}<br>value=%{{x}}<br>{y_title}=%{{y}}<extra></extra>"
+            ), row=2, col=j)
+
+            if df_b.height:
+                b = df_b.row(0, named=True)
+                fig.add_trace(go.Box(
+                    y=[str(cat)], q1=[b["Q1"]], median=[b["MEDIAN"]], q3=[b["Q3"]],
+                    lowerfence=[b["LOWER"]], upperfence=[b["UPPER"]],
+                    orientation="h",
+                    name=str(cat), legendgroup=str(cat), showlegend=False, marker=dict(color=colors[cat]),
+                    hovertemplate=f"{category}={cat}<br>variable={var}<br>value=%{{x}}<extra></extra>"
+                ), row=1, col=j)
+
+    hist_axes = [f"y{len(value_vars) + j}" for j in range(1, len(value_vars) + 1)]
+    fig.update_layout(barmode="overlay", bargap=0, height=height, legend=dict(title_text=category, tracegroupgap=0))
+    fig.update_yaxes(matches=hist_axes[0], row=2)
+    fig.update_yaxes(matches="y", row=1)
+    fig.update_yaxes(title_text=y_title, row=2, col=1)
+
+    return fig
+
 
 def facet_distribution_plot(
     df: pd.DataFrame,
@@ -15,7 +165,8 @@ def facet_distribution_plot(
     title_x: str = "", 
     order: dict = None, 
     nbins: int = 50, 
-    height: int = 400
+    height: int = 400,
+    prebinned: bool = False
 ):
     """
     Plot interactive histograms with faceted subplots and marginal boxplots.
@@ -27,7 +178,7 @@ def facet_distribution_plot(
 
     Parameters:
     -----------
-        df (pd.DataFrame): Input DataFrame containing the data to plot.
+        df (pd.DataFrame | pl.DataFrame): Input DataFrame containing the data to plot (Polars only with `prebinned=True`).
         category (str): Column name in df to use for coloring (categorical grouping).
         value_vars (list[str]): List of numeric columns to facet into separate histograms.
         dico_color (dict): Mapping from category values to specific colors.
@@ -38,6 +189,9 @@ def facet_distribution_plot(
                       Example: {category: ["A", "B", "C"]}. 
         nbins (int): Number of bins for histograms. Default to 50.
         height (int): Height of the figure. Default to 400.
+        prebinned (bool): If True, histogram bins and box statistics are computed in Polars and only these
+                          summaries are sent to the figure (bar and box traces), instead of every row.
+                          The payload then scales with bins x categories. Outliers are not drawn. Default to False.
 
     Returns:
     --------
@@ -52,14 +206,20 @@ def facet_distribution_plot(
         ...     dico_color={"A": "blue", "B": "red"}
         ... )
         >>> fig.show()
+
+        >>> ## on the full route table, without converting it to pandas
+        >>> fig = facet_distribution_plot(df_scheduled_enhanced_apt_metrics, category='IS_OPENING',
+        ...     value_vars=['APT_CITY_DRIVE_DIST_KM_A', 'APT_CITY_DRIVE_DIST_KM_B'], dico_color=dico_is_opening, prebinned=True)
     """
 
-    ## melt dataframe to long format: each value_var becomes "variable", values go in "value"
-    df_melted = df.melt(id_vars=category, value_vars=value_vars)
+    if prebinned:
+        fig = _prebinned_histogram_figure(df, category, value_vars, dico_color, histnorm, order, nbins, height)
+    else:
+        ## melt dataframe to long format: each value_var becomes "variable", values go in "value"
+        df_melted = df.melt(id_vars=category, value_vars=value_vars)
 
-    ## build interactive histogram with facets (per variable) and marginal boxplots
-    fig = (
-        px.histogram(
+        ## build interactive histogram with facets (per variable) and marginal boxplots
+        fig = px.histogram(
             df_melted,
             x="value",
             color=category,
@@ -74,6 +234,9 @@ def facet_distribution_plot(
             category_orders=order, ## the personnalized order
             facet_col_spacing=0.03
         )
+
+    fig = (
+        fig
         .update_xaxes(
             matches=None, 
             autotickangles=45*np.ones(len(value_vars)),   ## rotate tick labels
@@ -111,13 +274,42 @@ def facet_distribution_plot(
 
 
 
-########
-# TO DO: do something with the color axis but idk if it's better to have multiple coloraxis or a unique one.
-########
+def _bin_column(series: pl.Series, nbins: int | list[float], binning: str) -> tuple[pl.Series, list[str]]:
+    """
+    Bin a numeric column into labelled intervals "[a, b)" (the last one closed).
+
+    Parameters:
+        series (pl.Series): Column to bin.
+        nbins (int | list[float]): Number of bins, or the bin edges.
+        binning (str): "fixed" (same width) or "quantile" (same count) when `nbins` is a number.
+
+    Returns:
+        tuple[pl.Series, list[str]]: the label of each row (null for null values) and the labels in order.
+                                     A column without any value has a single null bin.
+    """
+    values = series.drop_nulls()
+    if values.is_empty():
+        return pl.Series(series.name, [None] * series.len(), dtype=pl.Utf8), [None]
+    if isinstance(nbins, int):
+        if binning == "quantile":
+            edges = np.quantile(values.to_numpy(), np.linspace(0, 1, nbins + 1))
+        else:
+            edges = np.linspace(values.min(), values.max(), nbins + 1)
+    else:
+        edges = np.asarray(nbins, dtype=float)
+    edges = np.unique(edges)
+    if len(edges) == 1: ## constant column: a single bin
+        edges = np.repeat(edges, 2)
+
+    labels = [f"[{a:.4g}, {b:.4g}{']' if i == len(edges) - 2 else ')'}" for i, (a, b) in enumerate(zip(edges[:-1], edges[1:]))]
+
+    ## index of the bin of each value, the max value in the last bin, values out of the edges as null
+    idx = np.clip(np.searchsorted(edges, series.to_numpy(), side="right") - 1, 0, len(labels) - 1)
+    out_of_range = series.is_null() | (series < edges[0]) | (series > edges[-1])
+    binned = pl.Series(series.name, np.array(labels, dtype=object)[idx], dtype=pl.Utf8)
+
+    return pl.select(pl.when(out_of_range).then(None).otherwise(binned)).to_series().alias(series.name), labels
 
-########
-# TO DO: parameters to choose the display order of groups
-########
 
 def plot_heatmap_by_group(
     df: pl.DataFrame,
@@ -125,7 +317,11 @@ def plot_heatmap_by_group(
     x_col: str,
     y_col: str,
     normalize: bool = False,
-    colorscale: str = "Cividis"
+    colorscale: str = "Cividis",
+    bins: dict = None,
+    binning: str = "fixed",
+    shared_coloraxis: bool = False,
+    group_order: list = None
 ):
     """
     Plots a series of heatmaps for each unique value in a specified grouping column.
@@ -133,7 +329,8 @@ def plot_heatmap_by_group(
     Each heatmap shows the count (or percentage if normalized) of occurrences 
     for combinations of `x_col` and `y_col` within the group.
 
-    Warning: for floating data, the range need to be binned.
+    The counts of all the groups are computed at once as a dense group x y x x cube (one Polars aggregation),
+    and the normalization is done on the whole cube.
     
     Parameters:
     -----------
@@ -143,15 +340,15 @@ def plot_heatmap_by_group(
     y_col (str): The column to use for the y-axis of the heatmap.
     normalize (bool): If True, counts are normalized to percentages within each group. Default to False.
     colorscale (str): The colorscale to use for the heatmaps. Default to "Cividis".
+    bins (dict): Binning of `x_col` / `y_col`: column -> number of bins or list of bin edges. Float columns
+                 not in `bins` with more than AUTO_BIN_MIN_DISTINCT values are binned in 10 bins. Default to None.
+    binning (str): "fixed" (same width) or "quantile" (same count) bins, when the number of bins is given. Default to "fixed".
+    shared_coloraxis (bool): If True, all the heatmaps share one color axis (same scale, one colorbar). Default to False.
+    group_order (list): Display order of the groups; groups not listed are added after, sorted. Default to None (sorted).
     
     Returns:
     --------
     plotly.graph_objects.Figure: A figure containing subplots for each group with heatmaps.
-
-    Warning:
-    --------
-    For floating/continuous data in `x_col` or `y_col`, you must bin the values first before using this function.
-    Otherwise, the heatmap axes may become too large or unreadable.
     
     Example:
     --------
@@ -163,19 +360,57 @@ def plot_heatmap_by_group(
         ...     normalize=True,
         ... )
         >>> fig.show()
+
+        >>> fig = plot_heatmap_by_group(
+        ...     df=df_route_combinaison_enhanced, group_col="IS_FEASIBLE", x_col="RATING_A", y_col="RATING_B",
+        ...     bins={"RATING_A": 8, "RATING_B": 8}, binning="quantile", shared_coloraxis=True, group_order=[True, False]
+        ... )
     """
-    
-    ## compute counts of each combination of group, x, and y
-    df_counts = (
-        df.group_by([group_col, x_col, y_col])
-          .len()
-          .rename({"len": "COUNT"})
-    )
+    bins = bins or {}
 
-    ## get unique values for groups, x-axis, and y-axis
-    group_vals = df_counts[group_col].unique().to_list()
-    all_x = df_counts[x_col].unique().to_list()
-    all_y = df_counts[y_col].unique().to_list()
+    ## bin the float columns, other columns keep their (sorted) values
+    df = df.select(group_col, x_col, y_col)
+    axis_values = {}
+    for c in [x_col, y_col]:
+        if c in bins or (df.schema[c].is_float() and df[c].n_unique() > AUTO_BIN_MIN_DISTINCT):
+            binned, labels = _bin_column(df[c], bins.get(c, 10), binning)
+            df = df.with_columns(binned)
+            axis_values[c] = labels
+        else:
+            axis_values[c] = df[c].drop_nulls().unique().sort().to_list()
+
+    group_vals = df[group_col].unique().to_list()
+    group_order = [g for g in (group_order or []) if g in group_vals]
+    group_vals = group_order + sorted([g for g in group_vals if g not in group_order], key=str)
+
+    ## index of each value on its axis of the cube
+    index = {
+        c: pl.DataFrame({c: values, f"__IDX_{c}": np.arange(len(values), dtype=np.int64)}, schema_overrides={c: df.schema[c]}, strict=False)
+        for c, values in [(group_col, group_vals), (x_col, axis_values[x_col]), (y_col, axis_values[y_col])]
+    }
+
+    ## compute counts of each combination of group, x, and y (single aggregation)
+    df_counts = df.group_by([group_col, x_col, y_col]).len()
+    for c, df_index in index.items():
+        df_counts = df_counts.join(df_index, on=c, how="inner", nulls_equal=True)
+
+    cube = np.zeros((len(group_vals), len(axis_values[y_col]), len(axis_values[x_col])))
+    cube[df_counts[f"__IDX_{group_col}"].to_numpy(), df_counts[f"__IDX_{y_col}"].to_numpy(), df_counts[f"__IDX_{x_col}"].to_numpy()] = df_counts["len"].to_numpy()
+
+    ## normalize to percentages within each group (all groups at once), missing combinations as gaps
+    totals = cube.sum(axis=(1, 2), keepdims=True)
+    is_normalized = normalize and bool((totals > 0).any())
+    if is_normalized:
+        cube = np.divide(cube * 100.0, totals, out=np.zeros_like(cube), where=totals > 0)
+    z_cube = np.where(cube > 0, cube, np.nan)
+
+    ## set hover info and text formatting
+    if is_normalized:
+        hover = f"{x_col}=%{{x}}<br>{y_col}=%{{y}}<br>PERCENT=%{{z:.2f}}%<extra></extra>"
+        texttemplate_str = "%{z:.2f}"
+    else:
+        hover = f"{x_col}=%{{x}}<br>{y_col}=%{{y}}<br>COUNT=%{{z:.0f}}<extra></extra>"
+        texttemplate_str = "%{z:.0f}"
 
     ## initialize subplots: one column per group
     fig = make_subplots(
@@ -183,59 +418,37 @@ def plot_heatmap_by_group(
         subplot_titles=[f"{group_col}={val}" for val in group_vals]
     )
 
-    for i, val in enumerate(group_vals, start=1):
-        ## filter data for the current group and pivot to create a 2D table
-        df_filtered = (
-            df_counts
-            .filter(pl.col(group_col) == val)
-            .to_pandas()
-            .pivot(index=y_col, columns=x_col, values="COUNT")
-            .reindex(index=all_y, columns=all_x)   ## ensure consistent axis order accross group
-            .astype(float)
-        )
-
-        ## total count for normalization
-        total = np.nansum(df_filtered.values)
-
-        ## normalize to percentages if requested
-        if normalize and total > 0:
-            df_norm = df_filtered / total * 100.0
-            is_normalized = True
-        else:
-            df_norm = df_filtered.copy()
-            is_normalized = False
-
-        z = df_norm.values
-
-        ## set hover info and text formatting
-        if is_normalized:
-            hover = f"{x_col}=%{{x}}<br>{y_col}=%{{y}}<br>PERCENT=%{{z:.2f}}%<extra></extra>"
-            texttemplate_str = "%{z:.2f}"
+    for i, z in enumerate(z_cube, start=1):
+        if shared_coloraxis:
+            color_args = dict(coloraxis="coloraxis")
         else:
-            hover = f"{x_col}=%{{x}}<br>{y_col}=%{{y}}<br>COUNT=%{{z:.0f}}<extra></extra>"
-            texttemplate_str = "%{z:.0f}" 
+            color_args = dict(colorscale=colorscale, zmin=np.nanmin(z) if np.isfinite(z).any() else 0, zmax=np.nanmax(z) if np.isfinite(z).any() else 1)
 
         ## create the heatmap trace
         heatmap = go.Heatmap(
             z=z,
-            x=df_norm.columns,
-            y=df_norm.index,
+            x=[str(v) for v in axis_values[x_col]],
+            y=[str(v) for v in axis_values[y_col]],
             text=z,
             texttemplate=texttemplate_str,
             hovertemplate=hover,
-            colorscale=colorscale,
-            zmin=np.nanmin(z),
-            zmax=np.nanmax(z),
-            hoverongaps=False
+            hoverongaps=False,
+            **color_args
         )
 
         ## add heatmap to the subplot
         fig.add_trace(heatmap, row=1, col=i)
 
-        ## update axis titles and types
-        fig.update_xaxes(title_text=x_col, row=1, col=i)
-        fig.update_yaxes(title_text=y_col, row=1, col=i)
-        fig.update_xaxes(type="category", row=1, col=i)
-        fig.update_yaxes(type="category", row=1, col=i)
+    ## update axis titles and types
+    fig.update_xaxes(title_text=x_col, type="category")
+    fig.update_yaxes(title_text=y_col, type="category")
+
+    if shared_coloraxis:
+        fig.update_layout(coloraxis=dict(
+            colorscale=colorscale,
+            cmin=np.nanmin(z_cube) if np.isfinite(z_cube).any() else 0,
+            cmax=np.nanmax(z_cube) if np.isfinite(z_cube).any() else 1,
+            colorbar_title="PERCENT" if is_normalized else "COUNT"
+        ))
 
-    return fig
\ No newline at end of file
+    return fig
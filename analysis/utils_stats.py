@@ -0,0 +1,266 @@
+import numpy as np
+import polars as pl
+from polars import col as d
+from scipy import stats
+from concurrent.futures import ProcessPoolExecutor
+
+
+#########################
+# CONFIGURATION
+#########################
+
+## Features of df_cities_metrics_preprocessed_for_stat (analysis_cities_metrics_and_routes_openings.ipynb)
+CAT_COLUMNS = ['IS_SPECIAL_A', 'IS_CAPITAL_A', 'IS_GLOBAL_HUB_A', 'IS_DOMESTIC_HUB_A', 'IS_SPECIAL_B', 'IS_CAPITAL_B', 'IS_GLOBAL_HUB_B', 'IS_DOMESTIC_HUB_B']
+NUM_COLUMNS = ['POPU_A', 'POPU_B', 'EVO_POPU_A', 'EVO_POPU_B', 'INC_LC_A', 'INC_LC_B', 'EVO_INC_LC_A', 'EVO_INC_LC_B', 'INC_USD2019_A', 'INC_USD2019_B', 'EVO_INC_USD2019_A', 'EVO_INC_USD2019_B', 'POPU_LOG_A', 'POPU_LOG_B', 'INC_LC_LOG_A', 'INC_LC_LOG_B']
+
+## Grouping tags -> reference group (every other group of the tag is compared to it)
+TAGS = {
+    'IS_OPENING': False,
+    'TAG_DURATION_OPENING': 'NO_OPENING',
+    'TAG_NEW_OPENING': 'OLD_2010',
+}
+
+## Year windows (name -> filter, None for all the rows)
+WINDOWS = {
+    'all': None,
+    'base_2010': (d.YEAR == 2010) | d.IS_OPENING,
+}
+
+## Number of bootstrap resamples drawn at once (memory: BOOT_BATCH x group size)
+BOOT_BATCH = 100
+
+
+#########################
+# RANK BASED TESTS
+#########################
+
+def _rank_blocks(values: np.ndarray) -> tuple[np.ndarray, int]:
+    """Tie block of every value (0 for the smallest value, equal values share a block) and number of blocks."""
+    uniques, blocks = np.unique(values, return_inverse=True)
+    return blocks, len(uniques)
+
+
+def _u_statistic(count_g: np.ndarray, count_r: np.ndarray) -> np.ndarray:
+    """Mann-Whitney U of the group from the counts of both samples in each tie block (last axis)."""
+    below_r = np.cumsum(count_r, axis=-1) - count_r
+    return (count_g * (below_r + 0.5 * count_r)).sum(axis=-1)
+
+
+def _rank_tests(blocks_g: np.ndarray, blocks_r: np.ndarray, nb_blocks: int) -> dict:
+    """
+    Mann-Whitney U (asymptotic, tie and continuity corrected), AUC and two-sample KS from the tie blocks.
+
+    The KS test runs on the tie blocks, which keep the order and the ties of the values: its statistic and
+    p-value are those of `stats.ks_2samp` on the values (exact p-value up to 10000 values per group).
+    """
+    count_g = np.bincount(blocks_g, minlength=nb_blocks)
+    count_r = np.bincount(blocks_r, minlength=nb_blocks)
+    n1, n0 = len(blocks_g), len(blocks_r)
+    n = n1 + n0
+
+    u = _u_statistic(count_g, count_r)
+    ties = count_g + count_r
+    sigma = np.sqrt(n1 * n0 / 12 * ((n + 1) - (ties**3 - ties).sum() / (n * (n - 1))))
+    p_mw = min(1.0, 2 * stats.norm.sf((abs(u - n1 * n0 / 2) - 0.5) / sigma)) if sigma > 0 else 1.0
+
+    ks = stats.ks_2samp(blocks_g, blocks_r)
+
+    return {'U': u, 'P_MW': p_mw, 'AUC': u / (n1 * n0), 'KS': ks.statistic, 'P_KS': ks.pvalue}
+
+
+def _point_biserial(values_g: np.ndarray, values_r: np.ndarray) -> tuple[float, float]:
+    """Point-biserial correlation between the group indicator and the values, and its p-value."""
+    n1, n0 = len(values_g), len(values_r)
+    n = n1 + n0
+    std = np.concatenate([values_g, values_r]).std()
+    if std == 0 or n < 3:
+        return np.nan, np.nan
+
+    r = (values_g.mean() - values_r.mean()) / std * np.sqrt(n1 * n0) / n
+    t = r * np.sqrt((n - 2) / max(1 - r**2, 1e-300))
+    return r, 2 * stats.t.sf(abs(t), n - 2)
+
+
+def _bootstrap_task(args) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Bootstrap samples of the AUC and of the difference of means of one comparison (run in a worker process).
+
+    The groups are resampled separately; the AUC of a resample is computed from the tie blocks of the
+    original ranking, so nothing is sorted again.
+    """
+    blocks_g, blocks_r, values_g, values_r, nb_blocks, n_boot, seed = args
+    rng = np.random.default_rng(seed)
+    n1, n0 = len(blocks_g), len(blocks_r)
+
+    aucs, diffs = [], []
+    for start in range(0, n_boot, BOOT_BATCH):
+        batch = min(BOOT_BATCH, n_boot - start)
+        idx_g = rng.integers(0, n1, (batch, n1))
+        idx_r = rng.integers(0, n0, (batch, n0))
+
+        offset = np.arange(batch)[:, None] * nb_blocks
+        count_g = np.bincount((blocks_g[idx_g] + offset).ravel(), minlength=batch * nb_blocks).reshape(batch, nb_blocks)
+        count_r = np.bincount((blocks_r[idx_r] + offset).ravel(), minlength=batch * nb_blocks).reshape(batch, nb_blocks)
+
+        aucs.append(_u_statistic(count_g, count_r) / (n1 * n0))
+        diffs.append(values_g[idx_g].mean(axis=1) - values_r[idx_r].mean(axis=1))
+
+    return np.concatenate(aucs), np.concatenate(diffs)
+
+
+#########################
+# CATEGORICAL TESTS
+#########################
+
+def _categorical_tests(values_g: np.ndarray, values_r: np.ndarray) -> dict:
+    """Chi-squared test of the group x category contingency table, and Fisher's exact test when it is 2 x 2."""
+    levels, codes = np.unique(np.concatenate([values_g, values_r]), return_inverse=True)
+    table = np.stack([
+        np.bincount(codes[:len(values_g)], minlength=len(levels)),
+        np.bincount(codes[len(values_g):], minlength=len(levels)),
+    ])
+
+    res = {'CHI2': np.nan, 'P_CHI2': np.nan, 'ODDS_RATIO': np.nan, 'P_FISHER': np.nan}
+    if len(levels) < 2 or (table.sum(axis=1) == 0).any():
+        return res
+
+    chi2 = stats.chi2_contingency(table)
+    res.update(CHI2=chi2.statistic, P_CHI2=chi2.pvalue)
+    if len(levels) == 2:
+        fisher = stats.fisher_exact(table[:, ::-1]) ## odds of the "True"/largest level
+        res.update(ODDS_RATIO=fisher.statistic, P_FISHER=fisher.pvalue)
+
+    return res
+
+
+#########################
+# ENGINE
+#########################
+
+def run_tests(
+    df: pl.DataFrame | pl.LazyFrame,
+    num_cols: list[str] = NUM_COLUMNS,
+    cat_cols: list[str] = CAT_COLUMNS,
+    tags: dict = TAGS,
+    windows: dict[str, pl.Expr] = None,
+    n_boot: int = 0,
+    ci: float = 0.95,
+    seed: int = 0,
+    max_workers: int = None
+) -> pl.DataFrame:
+    """
+    Univariate tests of every feature x grouping tag x year window, in one call.
+
+    For every tag, each group is compared to the reference group of the tag (e.g. IS_OPENING True vs False,
+    SHORT_OPENING and LONG_OPENING vs NO_OPENING). Numeric features get Mann-Whitney U, AUC, KS, point-biserial
+    correlation and the difference of means; categorical features get chi-squared and Fisher's exact tests.
+
+    Each numeric column is ranked once per window (tie blocks), then the U, AUC and KS of all the comparisons,
+    and the AUC of all the bootstrap resamples, are counts over these blocks. The bootstrap of the AUC and of
+    the difference of means runs in a process pool; each comparison has its own seed spawned from `seed`,
+    so the results do not depend on `max_workers`.
+
+    Parameters:
+        df (pl.DataFrame | pl.LazyFrame): One row per route and year (e.g. df_cities_metrics_preprocessed_for_stat).
+        num_cols (list[str]): Numeric features. Default to NUM_COLUMNS.
+        cat_cols (list[str]): Categorical features. Default to CAT_COLUMNS.
+        tags (dict): Grouping tag -> reference group. Default to TAGS.
+        windows (dict[str, pl.Expr]): Window name -> row filter (None for all rows). Default to None ({'all': None}).
+        n_boot (int): Number of bootstrap resamples (0: no confidence interval). Default to 0.
+        ci (float): Level of the bootstrap confidence intervals. Default to 0.95.
+        seed (int): Seed of the bootstrap. Default to 0.
+        max_workers (int): Processes of the bootstrap (1: in the current process). Default to None (all cores).
+
+    Returns:
+        pl.DataFrame: WINDOW, TAG, GROUP, REFERENCE, FEATURE, N_GROUP, N_REF, TEST, STATISTIC, P_VALUE, CI_LOW, CI_HIGH.
+                      TEST is mannwhitney, auc, ks, pointbiserial, mean_diff (numeric) or chi2, fisher (categorical).
+
+    Example:
+        >>> df_res = run_tests(df_cities_analysis, windows=WINDOWS, n_boot=1000)
+        >>> df_res.filter(d.TEST == 'auc').sort('P_VALUE')
+    """
+    windows = windows or {'all': None}
+    df = df.lazy()
+
+    rows, boot_tasks, boot_rows = [], [], []
+    for window, where in windows.items():
+        df_window = (df if where is None else df.filter(where)).select(*tags, *num_cols, *cat_cols).collect()
+        tag_values = {tag: df_window[tag].to_numpy() for tag in tags}
+
+        ## comparisons of the window: (tag, group, reference, group mask, reference mask)
+        comparisons = []
+        for tag, reference in tags.items():
+            mask_r = tag_values[tag] == reference
+            for group in df_window[tag].drop_nulls().unique(maintain_order=True).sort().to_list():
+                if group != reference:
+                    comparisons.append((tag, group, reference, tag_values[tag] == group, mask_r))
+
+        for feature in num_cols:
+            values = df_window[feature].cast(pl.Float64).fill_nan(None).to_numpy()
+            valid = ~np.isnan(values)
+            blocks, nb_blocks = _rank_blocks(values[valid])
+            positions = np.cumsum(valid) - 1 ## row -> position among the valid rows
+
+            for tag, group, reference, mask_g, mask_r in comparisons:
+                sel_g, sel_r = positions[mask_g & valid], positions[mask_r & valid]
+                key = {'WINDOW': window, 'TAG': tag, 'GROUP': str(group), 'REFERENCE': str(reference), 'FEATURE': feature,
+                       'N_GROUP': len(sel_g), 'N_REF': len(sel_r)}
+                if len(sel_g) == 0 or len(sel_r) == 0:
+                    continue
+
+                values_g, values_r = values[valid][sel_g], values[valid][sel_r]
+                res = _rank_tests(blocks[sel_g], blocks[sel_r], nb_blocks)
+                r, p_r = _point_biserial(values_g, values_r)
+
+                rows += [
+                    {**key, 'TEST': 'mannwhitney', 'STATISTIC': res['U'], 'P_VALUE': res['P_MW']},
+                    {**key, 'TEST': 'auc', 'STATISTIC': res['AUC'], 'P_VALUE': res['P_MW']},
+                    {**key, 'TEST': 'ks', 'STATISTIC': res['KS'], 'P_VALUE': res['P_KS']},
+                    {**key, 'TEST': 'pointbiserial', 'STATISTIC': r, 'P_VALUE': p_r},
+                    {**key, 'TEST': 'mean_diff', 'STATISTIC': values_g.mean() - values_r.mean(), 'P_VALUE': None},
+                ]
+                if n_boot > 0:
+                    boot_tasks.append((blocks[sel_g], blocks[sel_r], values_g, values_r, nb_blocks, n_boot))
+                    boot_rows.append(key)
+
+        for feature in cat_cols:
+            values = df_window[feature].to_numpy()
+            valid = ~df_window[feature].is_null().to_numpy()
+
+            for tag, group, reference, mask_g, mask_r in comparisons:
+                values_g, values_r = values[mask_g & valid], values[mask_r & valid]
+                key = {'WINDOW': window, 'TAG': tag, 'GROUP': str(group), 'REFERENCE': str(reference), 'FEATURE': feature,
+                       'N_GROUP': len(values_g), 'N_REF': len(values_r)}
+                if len(values_g) == 0 or len(values_r) == 0:
+                    continue
+
+                res = _categorical_tests(values_g, values_r)
+                rows += [
+                    {**key, 'TEST': 'chi2', 'STATISTIC': res['CHI2'], 'P_VALUE': res['P_CHI2']},
+                    {**key, 'TEST': 'fisher', 'STATISTIC': res['ODDS_RATIO'], 'P_VALUE': res['P_FISHER']},
+                ]
+
+    df_res = pl.DataFrame(rows, schema={
+        'WINDOW': pl.Utf8, 'TAG': pl.Utf8, 'GROUP': pl.Utf8, 'REFERENCE': pl.Utf8, 'FEATURE': pl.Utf8,
+        'N_GROUP': pl.Int64, 'N_REF': pl.Int64, 'TEST': pl.Utf8, 'STATISTIC': pl.Float64, 'P_VALUE': pl.Float64,
+    })
+
+    ## bootstrap confidence intervals of the AUC and of the difference of means
+    df_ci = pl.DataFrame(schema={**{c: df_res.schema[c] for c in ['WINDOW', 'TAG', 'GROUP', 'FEATURE', 'TEST']}, 'CI_LOW': pl.Float64, 'CI_HIGH': pl.Float64})
+    if boot_tasks:
+        seeds = np.random.SeedSequence(seed).spawn(len(boot_tasks))
+        tasks = [(*task, s) for task, s in zip(boot_tasks, seeds)]
+        if max_workers == 1:
+            samples = list(map(_bootstrap_task, tasks))
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                samples = list(executor.map(_bootstrap_task, tasks, chunksize=max(1, len(tasks) // 64)))
+
+        q = [(1 - ci) / 2 * 100, (1 + ci) / 2 * 100]
+        df_ci = pl.DataFrame([
+            {**{c: key[c] for c in ['WINDOW', 'TAG', 'GROUP', 'FEATURE']}, 'TEST': test, 'CI_LOW': low, 'CI_HIGH': high}
+            for key, (aucs, diffs) in zip(boot_rows, samples)
+            for test, (low, high) in [('auc', np.percentile(aucs, q)), ('mean_diff', np.percentile(diffs, q))]
+        ], schema=df_ci.schema)
+
+    return df_res.join(df_ci, on=['WINDOW', 'TAG', 'GROUP', 'FEATURE', 'TEST'], how='left', maintain_order='left')
@@ -0,0 +1,195 @@
+"""
+Benchmark of the heavy steps of the pipeline on synthetic data, at several scales of today's data.
+
+Each stage runs in a fresh process (spawn), reads its inputs from disk and writes its outputs to disk,
+so the wall time and the peak memory (max RSS) of every stage are measured independently.
+
+Stages:
+    - ingestion: yearly raw CSVs -> hive partitioned parquet store (utils_ingestion)
+    - lifecycle: yearly aggregation + lifecycle tagging of df_enhanced (utils_lifecycle)
+    - pair_build: all EU <-> NA directional pairs with airport metrics, as in apt_combinaison.ipynb
+    - filtering: rule chain of filtering.ipynb with its attrition report (utils_filtering)
+    - plots: facet_distribution_plot (pre-binned) and plot_heatmap_by_group on the route table (utils_plot)
+
+With --profile-dir, every stage also writes the per-step profile of its pipeline (utils_profiling) as
+x{scale}_{stage}.json / .html, to compare with `utils_profiling.compare_reports`.
+
+Usage:
+    python benchmarks/bench_pipeline.py --scales 1 10 100 --work-dir /tmp/atslab_bench --output bench.csv
+"""
+import os
+import sys
+import time
+import argparse
+import polars as pl
+from polars import col as d
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(REPO_PATH, 'data_processing'), os.path.join(REPO_PATH, 'analysis')]
+
+from utils_synthetic import write_synthetic_dataset
+from utils_ingestion import build_schedule_store, scan_schedule_store
+from utils_lifecycle import build_enhanced_datasets
+from utils_artifacts import build_route_combinaison_enhanced
+from utils_filtering import apply_rules, excluded_airports_rule, RULES_PERFO, RULES_APT_METRICS
+from utils_profiling import PipelineProfiler, max_rss_mb
+
+
+#########################
+# CONFIGURATION
+#########################
+
+SCALES = [1, 10, 100]
+YEARS = list(range(2000, 2024))
+
+
+#########################
+# STAGES
+#########################
+
+def stage_ingestion(paths, work_path, years):
+    """Yearly raw CSVs -> parquet store."""
+    build_schedule_store(paths['schedules'], os.path.join(work_path, 'schedules_store'), years=years, overwrite=True)
+    return scan_schedule_store(os.path.join(work_path, 'schedules_store')).select(pl.len()).collect().item()
+
+
+def stage_lifecycle(paths, work_path, years):
+    """Aggregation + lifecycle tagging of the enhanced dataset."""
+    df_airports_metrics = pl.read_csv(paths['airports_metrics'])
+    dfs = build_enhanced_datasets(
+        scan_schedule_store(os.path.join(work_path, 'schedules_store')),
+        df_airports_metrics,
+        census_windows={'full': (min(years), max(years))}
+    )
+    dfs['full'].write_parquet(os.path.join(work_path, 'scheduled_dataset_transatlantic_enhanced.parquet'))
+    return dfs['full'].height
+
+
+def stage_pair_build(paths, work_path, years):
+    """All EU <-> NA directional pairs with airport metrics (apt_combinaison.ipynb)."""
+    df = build_route_combinaison_enhanced(
+        pl.scan_csv(paths['airports_lookup']),
+        pl.scan_csv(paths['airports_metrics']),
+        pl.scan_csv(paths['airports_ratings']),
+        pl.scan_parquet(os.path.join(work_path, 'scheduled_dataset_transatlantic_enhanced.parquet')),
+    ).collect()
+    df.write_parquet(os.path.join(work_path, 'df_route_combinaison_enhanced.parquet'))
+    return df.height
+
+
+def stage_filtering(paths, work_path, years):
+    """Rule chain of filtering.ipynb with its attrition report."""
+    df_ratings = pl.read_csv(paths['airports_ratings'])
+    list_heli_aero = df_ratings.filter(d.GOOGLE_NAME.str.contains('Heliport|Aerodrome'))['APT_CODE'].to_list()
+
+    df_filtered, _ = apply_rules(
+        pl.scan_parquet(os.path.join(work_path, 'df_route_combinaison_enhanced.parquet')),
+        RULES_PERFO + [excluded_airports_rule('not heliport/aerodrome', list_heli_aero)] + RULES_APT_METRICS
+    )
+    return df_filtered.height
+
+
+def stage_plots(paths, work_path, years):
+    """Distribution and heatmap figures on the whole route table (figures serialized to JSON)."""
+    from utils_plot import facet_distribution_plot, plot_heatmap_by_group
+
+    df = pl.read_parquet(os.path.join(work_path, 'df_route_combinaison_enhanced.parquet'))
+
+    fig = facet_distribution_plot(df, category='HAS_EXISTED', value_vars=['APT_CITY_DRIVE_DIST_KM_A', 'APT_CITY_DRIVE_DIST_KM_B', 'DIST_GC_KM'],
+                                  dico_color={True: 'red', False: 'blue'}, prebinned=True)
+    fig.to_json()
+
+    fig = plot_heatmap_by_group(df, group_col='HAS_EXISTED', x_col='RATING_A', y_col='RATING_B', normalize=True, bins={'RATING_A': 8, 'RATING_B': 8})
+    fig.to_json()
+
+    return df.height
+
+
+STAGES = {
+    'ingestion': stage_ingestion,
+    'lifecycle': stage_lifecycle,
+    'pair_build': stage_pair_build,
+    'filtering': stage_filtering,
+    'plots': stage_plots,
+}
+
+
+#########################
+# RUNNER
+#########################
+
+def _run_stage(name, paths, work_path, years, profile_path=None):
+    """Run one stage (in the child process) and measure it, with the profile of its steps if `profile_path`."""
+    rss_start = max_rss_mb()
+    start = time.perf_counter()
+    if profile_path is None:
+        nb_rows = STAGES[name](paths, work_path, years)
+    else:
+        with PipelineProfiler(os.path.basename(profile_path)) as profiler:
+            nb_rows = STAGES[name](paths, work_path, years)
+        profiler.write_json(profile_path + '.json')
+        profiler.write_html(profile_path + '.html')
+    seconds = time.perf_counter() - start
+
+    return {'STAGE': name, 'SECONDS': seconds, 'PEAK_RSS_MB': max_rss_mb(), 'DELTA_RSS_MB': max_rss_mb() - rss_start, 'NB_ROWS_OUT': nb_rows}
+
+
+def run_benchmark(scales=SCALES, years=YEARS, work_path='atslab_bench', stages=None, seed=0, profile_dir=None):
+    """
+    Generate (or reuse) the synthetic data of each scale and time every stage in its own process.
+
+    Parameters:
+        scales (list[float]): Scales of today's data. Default to [1, 10, 100].
+        years (list[int]): Years of schedules. Default to 2000 ... 2023.
+        work_path (str): Folder of the synthetic data and of the stage outputs. Default to "atslab_bench".
+        stages (list[str]): Stages to run, in order. Default to None (all, see STAGES).
+        seed (int): Random seed of the synthetic data. Default to 0.
+        profile_dir (str): Folder of the per-step profiles of the stages. Default to None (no profile).
+
+    Returns:
+        pl.DataFrame: SCALE, STAGE, SECONDS, PEAK_RSS_MB, DELTA_RSS_MB, NB_ROWS_OUT.
+    """
+    stages = stages or list(STAGES)
+    results = []
+    if profile_dir is not None:
+        os.makedirs(profile_dir, exist_ok=True)
+
+    for scale in scales:
+        scale_path = os.path.join(work_path, f'x{scale}')
+        print(f"--- scale x{scale}: synthetic data")
+        paths = write_synthetic_dataset(os.path.join(scale_path, 'data'), scale=scale, years=years, seed=seed)
+
+        for name in stages:
+            profile_path = None if profile_dir is None else os.path.join(profile_dir, f'x{scale}_{name}')
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+                result = executor.submit(_run_stage, name, paths, scale_path, years, profile_path).result()
+            results.append({'SCALE': scale, **result})
+            print(f"x{scale} {name:<12} {result['SECONDS']:8.2f} s {result['PEAK_RSS_MB']:9.0f} MB peak  {result['NB_ROWS_OUT']:>12_} rows")
+
+    return pl.DataFrame(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the pipeline on synthetic data.")
+    parser.add_argument("--scales", type=float, nargs="+", default=SCALES, help="scales of today's data (e.g. 1 10 100)")
+    parser.add_argument("--years", type=int, nargs=2, default=[min(YEARS), max(YEARS)], metavar=("FIRST", "LAST"), help="years of schedules")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=None, help="stages to run (default: all)")
+    parser.add_argument("--work-dir", default="atslab_bench", help="folder of the synthetic data and outputs")
+    parser.add_argument("--output", default=None, help="CSV file of the results")
+    parser.add_argument("--profile-dir", default=None, help="folder of the per-step profiles (JSON/HTML) of the stages")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    scales = [int(s) if float(s).is_integer() else s for s in args.scales]
+    df_results = run_benchmark(scales, list(range(args.years[0], args.years[1] + 1)), args.work_dir, args.stages, args.seed, args.profile_dir)
+
+    with pl.Config(tbl_rows=-1):
+        print(df_results)
+    if args.output:
+        df_results.write_csv(args.output)
+
+
+if __name__ == "__main__":
+    main()
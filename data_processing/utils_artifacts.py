@@ -0,0 +1,508 @@
+import os
+import json
+import inspect
+import hashlib
+import polars as pl
+from polars import col as d
+
+import utils_cube
+import utils_geo
+import utils_routes
+import utils_scoring
+import utils_carriers
+import utils_network
+import utils_cities
+import utils_lifecycle
+import utils_ingestion
+from utils_ingestion import list_schedule_files, build_schedule_store, scan_schedule_store
+from utils_cities import build_cities_stat_dataset
+from utils_profiling import stage, checkpoint
+from utils_lifecycle import build_enhanced_datasets, FIRST_CENSUS_YEAR, LAST_CENSUS_YEAR, LAST_YEAR_WO_COVID, REGION_ID_US, REGION_ID_EUR
+
+
+#########################
+# CONFIGURATION
+#########################
+
+## Root folder of the data (the `folder_path` of the notebooks), can be set with the ATSLAB_DATA_ROOT environment variable
+DATA_ROOT = os.environ.get('ATSLAB_DATA_ROOT', '/home/sara/Desktop/ATSLab/data/')
+
+## Folder (in the data root) of the typed parquet copies, of the schedule store and of the manifest
+CACHE_DIR = '.artifacts'
+
+## Source tables: name -> file, relative to the data root (or absolute)
+SOURCES = {
+    'airports_lookup': 'df_airports_lookup_modif.csv',
+    'airports_metrics': 'df_airports_metrics_modif.csv',
+    'cities_metrics': 'df_cities_metrics_modif.csv',
+    'fleet_lookup': 'df_fleet_lookup_modif.csv',
+    'airline_mapping': 'df_airline_mapping.csv',
+    'airports_ratings': '../data_scrapping/csv_output/20250819_output_airport_ratings.csv',
+}
+
+## Folder of the yearly raw schedule CSVs, relative to the data root (or absolute)
+SCHEDULES_DIR = 'schedules'
+
+## Typed columns of the source tables (the other dtypes are inferred)
+SOURCE_SCHEMAS = {
+    'airports_metrics': {'CLOSING_YEAR': pl.Int64, 'OPENING_YEAR': pl.Int64, 'REGION_ID': pl.Int64, 'ELEV_FT': pl.Float64},
+}
+
+## artifacts registered with `register_artifact` (name -> definition)
+ARTIFACTS = {}
+
+## lazy frames already opened in this session (path -> (fingerprint, LazyFrame))
+_MEMO = {}
+
+
+#########################
+# PATHS AND HASHES
+#########################
+
+def set_data_root(path: str):
+    """
+    Change the data root of the session (instead of the hardcoded `folder_path` of the notebooks).
+    """
+    global DATA_ROOT
+    DATA_ROOT = path
+    _MEMO.clear()
+
+
+def data_path(file_name: str) -> str:
+    """Absolute path of a file of the data root."""
+    return os.path.normpath(os.path.join(DATA_ROOT, file_name))
+
+
+def cache_path(file_name: str) -> str:
+    """Absolute path of a file of the artifact cache (created if needed)."""
+    path = data_path(os.path.join(CACHE_DIR, file_name))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def _read_manifest() -> dict:
+    """Manifest of the cache: content hashes of the files and build keys of the artifacts."""
+    path = cache_path('manifest.json')
+    if not os.path.exists(path):
+        return {'files': {}, 'artifacts': {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_manifest(manifest: dict):
+    path = cache_path('manifest.json')
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(path + '.tmp', path)
+
+
+def content_hash(path: str, manifest: dict = None) -> str:
+    """
+    SHA-256 of the content of a file, or of all the files of a folder.
+
+    Files are only read again when their size or modification time changed since the last hash
+    (hashes are kept in the manifest), so checking a big unchanged input is instant.
+    """
+    if os.path.isdir(path):
+        h = hashlib.sha256()
+        for name in sorted(os.listdir(path)):
+            if not name.startswith('.'):
+                h.update(name.encode())
+                h.update(content_hash(os.path.join(path, name), manifest).encode())
+        return h.hexdigest()
+
+    own_manifest = manifest is None
+    manifest = _read_manifest() if own_manifest else manifest
+
+    stat = os.stat(path)
+    fingerprint = [stat.st_size, stat.st_mtime_ns]
+    cached = manifest['files'].get(path)
+    if cached is not None and cached['fingerprint'] == fingerprint:
+        return cached['hash']
+
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    manifest['files'][path] = {'fingerprint': fingerprint, 'hash': h.hexdigest()}
+
+    if own_manifest:
+        _write_manifest(manifest)
+
+    return h.hexdigest()
+
+
+def code_hash(objects: list) -> str:
+    """SHA-256 of the source code of functions/modules (an artifact is rebuilt when its code changes)."""
+    h = hashlib.sha256()
+    for obj in objects:
+        h.update(inspect.getsource(obj).encode())
+    return h.hexdigest()
+
+
+def _scan_memo(path: str) -> pl.LazyFrame:
+    """`pl.scan_parquet` memoized for the session (reopened only if the file changed)."""
+    stat = os.stat(path)
+    fingerprint = (stat.st_size, stat.st_mtime_ns)
+    memo = _MEMO.get(path)
+    if memo is None or memo[0] != fingerprint:
+        memo = (fingerprint, pl.scan_parquet(path))
+        _MEMO[path] = memo
+    return memo[1]
+
+
+#########################
+# SOURCES
+#########################
+
+def load_source(name: str) -> pl.LazyFrame:
+    """
+    Lazy frame of a source table (SOURCES), from its typed parquet copy.
+
+    The CSV is converted to parquet (with SOURCE_SCHEMAS dtypes) the first time and again only when its
+    content changes; the following calls only scan the parquet file.
+
+    Example:
+        >>> df_airports_metrics_modif = load_source('airports_metrics').collect()
+    """
+    csv_path = data_path(SOURCES[name])
+    parquet_path = cache_path(f'{name}.parquet')
+
+    manifest = _read_manifest()
+    csv_hash = content_hash(csv_path, manifest)
+
+    if manifest['artifacts'].get(name) != csv_hash or not os.path.exists(parquet_path):
+        (
+            pl.scan_csv(csv_path, schema_overrides=SOURCE_SCHEMAS.get(name), infer_schema_length=10_000)
+            .sink_parquet(parquet_path + '.tmp')
+        )
+        os.replace(parquet_path + '.tmp', parquet_path)
+        manifest['artifacts'][name] = csv_hash
+        print(f"{name}: parquet copy updated")
+
+    _write_manifest(manifest)
+
+    return _scan_memo(parquet_path)
+
+
+#########################
+# DERIVATION GRAPH
+#########################
+
+def register_artifact(name: str, file_name: str, inputs: list[str], code: list = None):
+    """
+    Decorator declaring a derived dataset: its parquet file, its inputs and the code it depends on.
+
+    The decorated function receives the inputs (LazyFrames, in the order of `inputs`) and returns the dataset.
+    An input is a source name (SOURCES), another artifact name or 'schedules' (the parsed schedule store).
+
+    Parameters:
+        name (str): Name of the artifact.
+        file_name (str): Parquet file of the artifact, relative to the data root.
+        inputs (list[str]): Names of the inputs.
+        code (list): Modules/functions used by the build (their source is part of the build key). Default to None.
+    """
+    def decorator(build):
+        ARTIFACTS[name] = {'file_name': file_name, 'inputs': inputs, 'build': build, 'code': [build, *(code or [])]}
+        return build
+    return decorator
+
+
+def _input_hash(name: str, manifest: dict) -> str:
+    """Content hash of an input (source, artifact or schedule folder)."""
+    if name == 'schedules':
+        return content_hash(data_path(SCHEDULES_DIR), manifest)
+    if name in SOURCES:
+        return content_hash(data_path(SOURCES[name]), manifest)
+    return content_hash(data_path(ARTIFACTS[name]['file_name']), manifest)
+
+
+def load_schedules() -> pl.LazyFrame:
+    """
+    Lazy frame of all the schedules, from the parquet store of the cache.
+
+    Only the yearly CSVs that are new or whose content changed are converted again.
+    """
+    folder_path = data_path(SCHEDULES_DIR)
+    store_path = cache_path('schedules_store')
+
+    manifest = _read_manifest()
+    converted = manifest.setdefault('schedule_store', {})
+    file_hashes = {year: content_hash(path, manifest) for year, path in list_schedule_files(folder_path).items()}
+    changed = [year for year, file_hash in file_hashes.items() if converted.get(str(year)) != file_hash]
+
+    if changed:
+        build_schedule_store(folder_path, store_path, years=changed, overwrite=True)
+        converted.update({str(year): file_hashes[year] for year in changed})
+    _write_manifest(manifest)
+
+    return scan_schedule_store(store_path)
+
+
+def _load_input(name: str, force: bool) -> pl.LazyFrame:
+    if name == 'schedules':
+        return load_schedules()
+    if name in SOURCES:
+        return load_source(name)
+    return load(name, force=force)
+
+
+def build(name: str, force: bool = False) -> bool:
+    """
+    Build an artifact (and first its inputs) only if needed.
+
+    The build key of an artifact is the hash of its code and of the content of its inputs. The artifact is
+    rebuilt only when this key changed since its last build (or when its file is missing). Inside a
+    `utils_profiling.PipelineProfiler`, every build is a stage of the profile.
+
+    Parameters:
+        name (str): Name of the artifact.
+        force (bool): If True, rebuild it even if it is up to date (its inputs are still built only if needed). Default to False.
+
+    Returns:
+        bool: True if the artifact was rebuilt.
+    """
+    artifact = ARTIFACTS[name]
+    output_path = data_path(artifact['file_name'])
+
+    ## inputs first (up to date before their hashes are computed)
+    inputs = [_load_input(input_name, force=False) for input_name in artifact['inputs']]
+
+    manifest = _read_manifest()
+    key = hashlib.sha256(
+        (code_hash(artifact['code']) + ''.join(_input_hash(input_name, manifest) for input_name in artifact['inputs'])).encode()
+    ).hexdigest()
+    up_to_date = manifest['artifacts'].get(name) == key and os.path.exists(output_path)
+    _write_manifest(manifest)
+
+    if up_to_date and not force:
+        return False
+
+    print(f"{name}: building...")
+    with stage(name) as s:
+        df = s.done(artifact['build'](*inputs))
+        df.lazy().sink_parquet(output_path + '.tmp') if isinstance(df, pl.LazyFrame) else df.write_parquet(output_path + '.tmp')
+    os.replace(output_path + '.tmp', output_path)
+
+    manifest = _read_manifest()
+    manifest['artifacts'][name] = key
+    _write_manifest(manifest)
+    print(f"{name}: saved in {output_path}")
+
+    return True
+
+
+def load(name: str, force: bool = False) -> pl.LazyFrame:
+    """
+    Lazy frame of an artifact or a source, rebuilt first only if its inputs or code changed.
+
+    Example:
+        >>> df_scheduled = load('scheduled_enhanced').collect()
+        >>> df_route_combinaison_enhanced = load('route_combinaison_enhanced').collect()
+    """
+    if name in SOURCES:
+        return load_source(name)
+
+    build(name, force=force)
+    return _scan_memo(data_path(ARTIFACTS[name]['file_name']))
+
+
+def status() -> pl.DataFrame:
+    """
+    Up-to-date status of every registered artifact (without building anything).
+    """
+    manifest = _read_manifest()
+    rows = []
+    for name, artifact in ARTIFACTS.items():
+        output_path = data_path(artifact['file_name'])
+        try:
+            key = hashlib.sha256(
+                (code_hash(artifact['code']) + ''.join(_input_hash(input_name, manifest) for input_name in artifact['inputs'])).encode()
+            ).hexdigest()
+            up_to_date = manifest['artifacts'].get(name) == key and os.path.exists(output_path)
+        except FileNotFoundError: ## an input is missing (not built yet)
+            up_to_date = False
+        rows.append({'ARTIFACT': name, 'FILE': artifact['file_name'], 'INPUTS': ', '.join(artifact['inputs']), 'UP_TO_DATE': up_to_date})
+    _write_manifest(manifest)
+
+    return pl.DataFrame(rows)
+
+
+#########################
+# ARTIFACTS
+#########################
+
+@register_artifact('scheduled_enhanced', 'scheduled_dataset_transatlantic_enhanced.parquet',
+                   inputs=['schedules', 'airports_metrics', 'airport_dictionary'], code=[utils_ingestion, utils_lifecycle, utils_routes])
+def build_scheduled_enhanced(schedules, airports_metrics, airport_dictionary):
+    """Enhanced transatlantic dataset, full census (data_processing.ipynb)."""
+    window = {'full': (FIRST_CENSUS_YEAR, LAST_CENSUS_YEAR)}
+    return build_enhanced_datasets(schedules, airports_metrics.collect(), window, df_apt_dict=airport_dictionary.collect())['full']
+
+
+@register_artifact('scheduled_wo_covid_enhanced', 'scheduled_dataset_wo_covid_transatlantic_enhanced.parquet',
+                   inputs=['schedules', 'airports_metrics', 'airport_dictionary'], code=[utils_ingestion, utils_lifecycle, utils_routes])
+def build_scheduled_wo_covid_enhanced(schedules, airports_metrics, airport_dictionary):
+    """Enhanced transatlantic dataset, census without the covid years (data_processing.ipynb)."""
+    window = {'wo_covid': (FIRST_CENSUS_YEAR, LAST_YEAR_WO_COVID)}
+    return build_enhanced_datasets(schedules, airports_metrics.collect(), window, census_end=LAST_CENSUS_YEAR,
+                                   df_apt_dict=airport_dictionary.collect())['wo_covid']
+
+
+@register_artifact('route_month_patterns', 'df_route_month_patterns.parquet',
+                   inputs=['schedules'], code=[utils_ingestion, utils_lifecycle])
+def build_route_month_patterns(schedules):
+    """Months operated by every route and year, to join on YEAR, APT_CODE_A, APT_CODE_B (utils_lifecycle.month_patterns)."""
+    return utils_lifecycle.month_patterns(schedules)
+
+
+@register_artifact('route_cube', 'df_route_cube.parquet',
+                   inputs=['scheduled_enhanced'], code=[utils_cube])
+def build_route_cube(scheduled_enhanced):
+    """Aggregate cube of the route opening analyses, full census (route_opening_analysis.ipynb)."""
+    return utils_cube.build_route_cube(scheduled_enhanced)
+
+
+@register_artifact('route_cube_wo_covid', 'df_route_cube_wo_covid.parquet',
+                   inputs=['scheduled_wo_covid_enhanced'], code=[utils_cube])
+def build_route_cube_wo_covid(scheduled_wo_covid_enhanced):
+    """Aggregate cube of the route opening analyses, census without the covid years."""
+    return utils_cube.build_route_cube(scheduled_wo_covid_enhanced)
+
+
+@register_artifact('airport_dictionary', 'df_airport_dictionary.parquet',
+                   inputs=['airports_metrics'], code=[utils_routes])
+def build_airport_dictionary(airports_metrics):
+    """
+    APT_IDX <-> APT_CODE of the route ids of the enhanced datasets (decode with utils_routes.decode_route_ids).
+
+    The previous dictionary is extended, so the ids of the airports already known never change.
+    """
+    output_path = data_path(ARTIFACTS['airport_dictionary']['file_name'])
+    df_previous = pl.read_parquet(output_path) if os.path.exists(output_path) else None
+    return utils_routes.airport_dictionary(airports_metrics, df_apt_dict=df_previous)
+
+
+@register_artifact('carrier_dictionary', 'df_carrier_dictionary.parquet',
+                   inputs=['schedules', 'airline_mapping'], code=[utils_ingestion, utils_carriers])
+def build_carrier_dictionary(schedules, airline_mapping):
+    """AL_IDX <-> OPE_AL and GROUP_IDX <-> AL_GROUP of the carrier route table."""
+    return utils_carriers.carrier_dictionary(schedules, airline_mapping)
+
+
+@register_artifact('carrier_routes', 'df_carrier_routes.parquet',
+                   inputs=['schedules', 'airports_metrics', 'carrier_dictionary', 'airport_dictionary'], code=[utils_ingestion, utils_lifecycle, utils_routes, utils_carriers])
+def build_carrier_routes(schedules, airports_metrics, carrier_dictionary, airport_dictionary):
+    """Carrier x route x year fact table of the transatlantic market, full census (utils_carriers)."""
+    return utils_carriers.build_carrier_route_table(schedules, airports_metrics.collect(), carrier_dictionary.collect(),
+                                                    df_apt_dict=airport_dictionary.collect())
+
+
+@register_artifact('route_combinaison_enhanced', 'df_route_combinaison_enhanced.parquet',
+                   inputs=['airports_lookup', 'airports_metrics', 'airports_ratings', 'scheduled_enhanced'], code=[utils_geo])
+def build_route_combinaison_enhanced(airports_lookup, airports_metrics, airports_ratings, scheduled_enhanced):
+    """
+    Every EU <-> NA directional pair with the airport metrics, ratings and feasibility (apt_combinaison.ipynb).
+
+    The inputs can be LazyFrames (as given by `build`) or DataFrames; the result is always a LazyFrame.
+    """
+    airports_lookup, airports_metrics, airports_ratings, scheduled_enhanced = (
+        df.lazy() for df in (airports_lookup, airports_metrics, airports_ratings, scheduled_enhanced)
+    )
+
+    apt_cols = ['OPENING_YEAR', 'CLOSING_YEAR', 'TIME_ZONE_2016', 'IS_ISLAND', 'ELEV_FT', 'NB_RUNWAYS',
+                'LONGEST_RUNWAY_FT', 'APT_CITY_DRIVE_DIST_KM', 'APT_CITY_DRIVE_TIME_H']
+    route_cols = ['DIST_GC_KM', 'RUNWAY_M', 'TO_FEASIBLE', 'LDG_FEASIBLE', 'IS_FEASIBLE']
+
+    def suffixed(df, cols, suffix):
+        return df.select('APT_CODE', *cols).rename({col: f"{col}_{suffix}" for col in ['APT_CODE', *cols]})
+
+    ## distance and feasibility of the EU -> NA and NA -> EU pairs, from the route matrices of utils_geo
+    df_apt_geo = (
+        airports_metrics.select('APT_CODE', 'REGION_ID', 'ELEV_FT', 'LONGEST_RUNWAY_FT')
+        .join(airports_lookup.select('APT_CODE', 'LATITUDE', 'LONGITUDE').unique(subset='APT_CODE'), how = 'left', on = 'APT_CODE')
+        .collect()
+    )
+    df_eu = df_apt_geo.filter(d.REGION_ID == REGION_ID_EUR)
+    df_us = df_apt_geo.filter(d.REGION_ID == REGION_ID_US)
+
+    def route_pairs(df_a, df_b):
+        df_pairs = df_a.select(APT_CODE_A = d.APT_CODE).join(df_b.select(APT_CODE_B = d.APT_CODE), how="cross")
+        return utils_geo.gather_route_matrices(utils_geo.compute_route_matrices(df_a, df_b), df_pairs)
+
+    with stage('route matrices') as s:
+        df_apt_combinaison = s.done(pl.concat([route_pairs(df_eu, df_us), route_pairs(df_us, df_eu)]))
+
+    return (
+        df_apt_combinaison.lazy()
+        .join(scheduled_enhanced.select('APT_CODE_A', 'APT_CODE_B').unique().with_columns(HAS_EXISTED = True), how = 'left', on = ['APT_CODE_A', 'APT_CODE_B'])
+        .with_columns(d.HAS_EXISTED.fill_null(False))
+        .pipe(checkpoint, 'pairs')
+
+        ## add apt metrics and ratings
+        .join(suffixed(airports_metrics, apt_cols, 'A'), how = 'left', on = 'APT_CODE_A')
+        .join(suffixed(airports_metrics, apt_cols, 'B'), how = 'left', on = 'APT_CODE_B')
+        .join(suffixed(airports_ratings, ['RATING', 'NB_REVIEW'], 'A'), how = 'left', on = 'APT_CODE_A')
+        .join(suffixed(airports_ratings, ['RATING', 'NB_REVIEW'], 'B'), how = 'left', on = 'APT_CODE_B')
+        .pipe(checkpoint, 'airport metrics and ratings')
+
+        ## add indicators
+        .with_columns(ROUTE_DRIVE_DIST_KM = d.APT_CITY_DRIVE_DIST_KM_A + d.APT_CITY_DRIVE_DIST_KM_B,
+                      ROUTE_DRIVE_TIME_H = d.APT_CITY_DRIVE_TIME_H_A + d.APT_CITY_DRIVE_TIME_H_B,
+                      ROUTE_RATING = d.RATING_A + d.RATING_B,
+                      TIME_ZONE_DIFF = (d.TIME_ZONE_2016_A - d.TIME_ZONE_2016_B).abs(),
+                      ELEV_LOG_FT_A = d.ELEV_FT_A.log(),
+                      ELEV_LOG_FT_B = d.ELEV_FT_B.log(),
+                      NB_REVIEW_LOG_A = d.NB_REVIEW_A.log(),
+                      NB_REVIEW_LOG_B = d.NB_REVIEW_B.log())
+        .pipe(checkpoint, 'indicators')
+
+        ## latitude & longitude by airport (the distance and feasibility come from the route matrices)
+        .join(suffixed(airports_lookup.unique(subset='APT_CODE'), ['LATITUDE', 'LONGITUDE'], 'A'), how = 'left', on = 'APT_CODE_A')
+        .join(suffixed(airports_lookup.unique(subset='APT_CODE'), ['LATITUDE', 'LONGITUDE'], 'B'), how = 'left', on = 'APT_CODE_B')
+        .with_columns(DIST_GC_KM = d.DIST_GC_KM.cast(pl.Float64), RUNWAY_M = d.LONGEST_RUNWAY_FT_A * utils_geo.FT_TO_M)
+        .select(pl.exclude(route_cols), *route_cols)
+        .pipe(checkpoint, 'distance and feasibility')
+    )
+
+
+@register_artifact('airport_network_metrics', 'df_airport_network_metrics.parquet',
+                   inputs=['scheduled_enhanced', 'airport_dictionary'], code=[utils_network, utils_routes])
+def build_airport_network_metrics(scheduled_enhanced, airport_dictionary):
+    """Degree, strength and approximate betweenness of every airport and year (utils_network)."""
+    return utils_network.airport_network_metrics(scheduled_enhanced, airport_dictionary.collect().height)
+
+
+@register_artifact('pair_network_features', 'df_pair_network_features.parquet',
+                   inputs=['route_combinaison_enhanced', 'scheduled_enhanced', 'airport_dictionary'], code=[utils_network, utils_routes])
+def build_pair_network_features(route_combinaison_enhanced, scheduled_enhanced, airport_dictionary):
+    """Network position (direct route, one-stop itineraries, airport centrality) of every EU <-> NA pair, last year of the census."""
+    return utils_network.pair_network_features(route_combinaison_enhanced, scheduled_enhanced, airport_dictionary.collect())
+
+
+@register_artifact('airport_catchment', 'df_airport_catchment.parquet',
+                   inputs=['airports_metrics', 'scheduled_enhanced'], code=[utils_geo])
+def build_airport_catchment(airports_metrics, scheduled_enhanced):
+    """Number and traffic of the airports within 50, 100 and 200 km of every airport and year (utils_geo)."""
+    return utils_geo.airport_catchment(airports_metrics, scheduled_enhanced)
+
+
+@register_artifact('pair_catchment_features', 'df_pair_catchment_features.parquet',
+                   inputs=['route_combinaison_enhanced', 'airports_metrics', 'scheduled_enhanced'], code=[utils_geo])
+def build_pair_catchment_features(route_combinaison_enhanced, airports_metrics, scheduled_enhanced):
+    """Catchment and nearest competing airport of both ends of every EU <-> NA pair, last year of the census (utils_geo)."""
+    return utils_geo.pair_catchment_features(route_combinaison_enhanced, airports_metrics, scheduled_enhanced)
+
+
+@register_artifact('cities_metrics_preprocessed_for_stat', 'df_cities_metrics_preprocessed_for_stat.parquet',
+                   inputs=['scheduled_enhanced', 'cities_metrics', 'airports_lookup'], code=[utils_cities])
+def build_cities_metrics_preprocessed_for_stat(scheduled_enhanced, cities_metrics, airports_lookup):
+    """Routes with the cities metrics of both ends, 2010-2014 (cities_metrics_processing.ipynb)."""
+    return build_cities_stat_dataset(scheduled_enhanced, cities_metrics, airports_lookup)
+
+
+@register_artifact('route_opening_scores', 'df_route_opening_scores.parquet',
+                   inputs=['route_combinaison_enhanced', 'scheduled_enhanced', 'cities_metrics', 'airports_lookup'], code=[utils_scoring, utils_cities])
+def build_route_opening_scores(route_combinaison_enhanced, scheduled_enhanced, cities_metrics, airports_lookup):
+    """Never operated EU <-> NA pairs ranked by probability of opening (utils_scoring)."""
+    return utils_scoring.build_opening_scores(route_combinaison_enhanced, scheduled_enhanced, cities_metrics, airports_lookup)
@@ -0,0 +1,277 @@
+import polars as pl
+from polars import col as d
+
+from utils_routes import airport_dictionary, add_route_ids, decode_route_ids
+from utils_lifecycle import aggregate_schedules, add_market_columns, add_lifecycle_columns, FIRST_CENSUS_YEAR, LAST_CENSUS_YEAR
+
+
+#########################
+# CONFIGURATION
+#########################
+
+## dtype of a carrier id and of an airline group id
+AL_IDX_DTYPE = pl.UInt16
+GROUP_IDX_DTYPE = pl.UInt16
+
+## Group of the carriers missing from the airline mapping (as in route_opening_analysis.ipynb)
+UNKNOWN_GROUP = 'unknown'
+
+## Key of a carrier on a directional route
+CARRIER_ROUTE_COLS = ['AL_IDX', 'DIR_RTE_ID']
+
+## Carrier lifecycle columns (renamed from the route lifecycle columns of utils_lifecycle)
+CARRIER_EVENTS = {
+    'IS_OPENING': 'IS_ENTRY',
+    'IS_END': 'IS_EXIT',
+    'IS_REOPENING': 'IS_REENTRY',
+    'IS_PAUSE': 'IS_PAUSE',
+    'FIRST_EXISTING_YEAR': 'FIRST_CARRIER_YEAR',
+    'DURATION_FIRST_OPENING': 'DURATION_FIRST_ENTRY',
+}
+
+## Columns of the fact table
+CARRIER_ROUTE_FACT_COLS = [
+    'YEAR', 'AL_IDX', 'DIR_RTE_ID', 'UNDIR_RTE_ID', 'MKT_TYPE', 'DIRECTION',
+    'FLT', 'FLT_ARR', 'SEATS', 'SEATS_ARR', 'FLT_HOURS', 'FLT_HOURS_ARR',
+    *CARRIER_EVENTS.values(), 'IS_ROUTE_OPENING',
+]
+
+
+#########################
+# CARRIER DICTIONARY
+#########################
+
+def normalize_airline_mapping(df_airline_mapping: pl.DataFrame | pl.LazyFrame) -> pl.DataFrame:
+    """
+    Airline mapping with one row per OPE_AL and AL_GROUP.
+
+    Accepts the raw subsidiariesGlobal_2019.csv columns (Group, Subsidiary), the df_airline_mapping.csv
+    columns (AL_GROUP, OPE_AL) and the AL code column joined on in route_opening_analysis.ipynb.
+    A carrier listed in several groups keeps all of them, as the notebook join.
+
+    Returns:
+        pl.DataFrame: OPE_AL, AL_GROUP.
+    """
+    df = df_airline_mapping.lazy()
+    names = df.collect_schema().names()
+
+    if 'Group' in names:
+        df = df.rename({'Group': 'AL_GROUP'})
+    code_col = 'AL' if 'AL' in names else 'Subsidiary' if 'Subsidiary' in names else 'OPE_AL'
+
+    return (
+        df
+        .select(OPE_AL = d(code_col), AL_GROUP = d.AL_GROUP)
+        .drop_nulls('OPE_AL')
+        .unique(maintain_order=True)
+        .collect()
+    )
+
+
+def carrier_dictionary(carriers: pl.DataFrame | pl.LazyFrame, df_airline_mapping: pl.DataFrame | pl.LazyFrame) -> pl.DataFrame:
+    """
+    Carrier dictionary: one UInt16 AL_IDX per OPE_AL and one UInt16 GROUP_IDX per AL_GROUP, in alphabetical order.
+
+    The carriers are the ones of the schedules and of the airline mapping; the carriers without group get
+    the UNKNOWN_GROUP group. As for `utils_routes.airport_dictionary`, the ids only depend on the lists of codes.
+
+    The dictionary is also the carrier -> group bridge table: a carrier listed in several groups of the
+    airline mapping has one row per group. Join it on AL_IDX at group_by time (see `carrier_events`).
+
+    Parameters:
+        carriers (pl.DataFrame | pl.LazyFrame): Rows with an OPE_AL column (e.g. the schedules).
+        df_airline_mapping (pl.DataFrame | pl.LazyFrame): Airline mapping (df_airline_mapping.csv).
+
+    Returns:
+        pl.DataFrame: AL_IDX, OPE_AL, GROUP_IDX, AL_GROUP, one row per carrier and group.
+    """
+    df_mapping = normalize_airline_mapping(df_airline_mapping)
+
+    codes = (
+        pl.concat([carriers.lazy().select('OPE_AL'), df_mapping.lazy().select('OPE_AL')])
+        .drop_nulls()
+        .unique()
+        .sort('OPE_AL')
+        .collect()
+    )
+    if codes.height >= 2**16:
+        raise ValueError(f"{codes.height} carriers do not fit in {AL_IDX_DTYPE}")
+
+    df_dict = (
+        codes
+        .with_row_index('AL_IDX')
+        .join(df_mapping, how = 'left', on = 'OPE_AL')
+        .with_columns(AL_IDX = d.AL_IDX.cast(AL_IDX_DTYPE), AL_GROUP = d.AL_GROUP.fill_null(UNKNOWN_GROUP))
+    )
+    df_groups = (
+        df_dict.select('AL_GROUP').unique().sort('AL_GROUP')
+        .with_row_index('GROUP_IDX')
+        .with_columns(d.GROUP_IDX.cast(GROUP_IDX_DTYPE))
+    )
+
+    return df_dict.join(df_groups, how = 'left', on = 'AL_GROUP').select('AL_IDX', 'OPE_AL', 'GROUP_IDX', 'AL_GROUP').sort('AL_IDX', 'GROUP_IDX')
+
+
+def add_carrier_ids(df: pl.DataFrame | pl.LazyFrame, df_al_dict: pl.DataFrame) -> pl.LazyFrame:
+    """
+    Add the AL_IDX of the OPE_AL of every row (carriers missing from the dictionary get a null id).
+
+    The groups are not added: a carrier may belong to several of them (see `carrier_dictionary`).
+    """
+    df_codes = df_al_dict.select('OPE_AL', 'AL_IDX').unique(subset='OPE_AL')
+    mapping_al = dict(zip(df_codes['OPE_AL'].to_list(), df_codes['AL_IDX'].to_list()))
+
+    return df.lazy().with_columns(AL_IDX = d.OPE_AL.replace_strict(mapping_al, default=None, return_dtype=AL_IDX_DTYPE))
+
+
+#########################
+# FACT TABLE
+#########################
+
+def build_carrier_route_table(
+    schedules: pl.LazyFrame | pl.DataFrame,
+    df_airports_metrics: pl.DataFrame,
+    df_al_dict: pl.DataFrame,
+    first_year: int = FIRST_CENSUS_YEAR,
+    last_year: int = LAST_CENSUS_YEAR,
+    df_apt_dict: pl.DataFrame = None
+) -> pl.DataFrame:
+    """
+    Carrier x route x year fact table of the transatlantic market, with the carrier entries, exits and re-entries.
+
+    One row per YEAR, carrier and directional route of the enhanced dataset, keyed by integers only
+    (AL_IDX, DIR_RTE_ID, UNDIR_RTE_ID), with the FLT, SEATS and FLT_HOURS of the carrier on the route.
+    It replaces the LIST_OPE_AL list column of the enhanced dataset: the carriers of the opening routes are
+    a filter on IS_ROUTE_OPENING, and the airline groups a join of the carrier dictionary on AL_IDX before
+    a group_by on GROUP_IDX (see `carrier_events`).
+
+    The carrier lifecycle is the route lifecycle of `utils_lifecycle.add_lifecycle_columns` run on the
+    (AL_IDX, DIR_RTE_ID) key: IS_ENTRY (first year of the carrier on the route), IS_EXIT (last year),
+    IS_REENTRY (back after at least one year without flights), IS_PAUSE (last year before such a gap).
+
+    Parameters:
+        schedules (pl.LazyFrame | pl.DataFrame): Renamed schedules (e.g. `scan_schedule_store(...)`).
+        df_airports_metrics (pl.DataFrame): Airport metrics with APT_CODE and REGION_ID columns.
+        df_al_dict (pl.DataFrame): Dictionary of `carrier_dictionary`.
+        first_year (int): First year of the census. Default to 2000.
+        last_year (int): Last year of the census. Default to 2023.
+        df_apt_dict (pl.DataFrame): Persisted airport dictionary, to share the route ids of the enhanced dataset. Default to None.
+
+    Returns:
+        pl.DataFrame: CARRIER_ROUTE_FACT_COLS, sorted by AL_IDX, DIR_RTE_ID and YEAR.
+
+    Example:
+        >>> df_al_dict = carrier_dictionary(scan_schedule_store(store_path), df_airline_mapping)
+        >>> df_carrier_routes = build_carrier_route_table(scan_schedule_store(store_path), df_airports_metrics_modif, df_al_dict)
+    """
+    df_carrier_yearly = add_carrier_ids(
+        add_route_ids(
+            add_market_columns(aggregate_schedules(schedules, df_airports_metrics, by=['OPE_AL'])),
+            airport_dictionary(df_airports_metrics, df_apt_dict=df_apt_dict)
+        ),
+        df_al_dict
+    )
+
+    return (
+        add_lifecycle_columns(df_carrier_yearly, first_year, last_year, pair_cols=CARRIER_ROUTE_COLS)
+        .rename(CARRIER_EVENTS)
+
+        ## the route opens this year: first year of the route, whatever the carrier
+        .with_columns(IS_ROUTE_OPENING = (d.YEAR == d.YEAR.min().over('DIR_RTE_ID')) & (d.YEAR != first_year))
+
+        .select(CARRIER_ROUTE_FACT_COLS)
+        .collect()
+    )
+
+
+#########################
+# QUERIES
+#########################
+
+def carrier_events(
+    df_carrier_routes: pl.DataFrame | pl.LazyFrame,
+    df_al_dict: pl.DataFrame,
+    by: list[str] = ['YEAR', 'AL_GROUP'],
+    where: pl.Expr = None
+) -> pl.DataFrame:
+    """
+    Number of carrier entries, exits, re-entries and route openings by group.
+
+    The aggregation runs on the integer ids; AL_GROUP / OPE_AL in `by` are decoded after it. With AL_GROUP
+    in `by`, the carrier -> group bridge of `df_al_dict` is joined on AL_IDX before the group_by: a carrier
+    listed in several groups counts once in each of them, as the explode + join of route_opening_analysis.ipynb.
+
+    Parameters:
+        df_carrier_routes (pl.DataFrame | pl.LazyFrame): Fact table of `build_carrier_route_table`.
+        df_al_dict (pl.DataFrame): Dictionary of `carrier_dictionary`.
+        by (list[str]): Columns of the fact table, AL_GROUP or OPE_AL. Default to ['YEAR', 'AL_GROUP'].
+        where (pl.Expr): Filter on the fact table before the aggregation (e.g. `d.MKT_TYPE == 'INTER'`). Default to None.
+
+    Returns:
+        pl.DataFrame: `by` columns, NB_ROUTE_OPENING (routes opened, counted once per carrier of the route),
+                      NB_ENTRY, NB_EXIT, NB_REENTRY, NB_PAUSE, SEATS, SEATS_ENTRY.
+
+    Example:
+        >>> carrier_events(df_carrier_routes, df_al_dict, ['YEAR', 'AL_GROUP'], where = d.MKT_TYPE == 'INTER')
+    """
+    decode = {'AL_GROUP': 'GROUP_IDX', 'OPE_AL': 'AL_IDX'}
+    keys = [decode.get(col, col) for col in by]
+
+    df = df_carrier_routes.lazy()
+    if where is not None:
+        df = df.filter(where)
+    if 'AL_GROUP' in by:
+        df = df.join(df_al_dict.lazy().select('AL_IDX', 'GROUP_IDX'), how = 'left', on = 'AL_IDX')
+
+    df_events = (
+        df
+        .group_by(keys)
+        .agg(d.IS_ROUTE_OPENING.sum().alias('NB_ROUTE_OPENING'), d.IS_ENTRY.sum().alias('NB_ENTRY'), d.IS_EXIT.sum().alias('NB_EXIT'),
+             d.IS_REENTRY.sum().alias('NB_REENTRY'), d.IS_PAUSE.sum().alias('NB_PAUSE'), d.SEATS.sum(), d.SEATS.filter(d.IS_ENTRY).sum().alias('SEATS_ENTRY'))
+        .collect()
+    )
+
+    for col, idx in decode.items():
+        if col in by:
+            df_names = df_al_dict.select(idx, col).unique(subset=idx)
+            df_events = df_events.join(df_names, how = 'left', on = idx).drop(idx)
+
+    return df_events.select(*by, pl.exclude(by)).sort(by)
+
+
+def openings_by_group(df_carrier_routes: pl.DataFrame | pl.LazyFrame, df_al_dict: pl.DataFrame, where: pl.Expr = d.MKT_TYPE == 'INTER') -> pl.DataFrame:
+    """
+    Number of opened routes by YEAR and airline group, each route counted once per carrier (route_opening_analysis.ipynb).
+    A carrier listed in several groups of the airline mapping counts once per group, as the former explode + join.
+
+    Returns:
+        pl.DataFrame: YEAR, AL_GROUP, NB_RTE_OPEN sorted by YEAR and decreasing NB_RTE_OPEN.
+    """
+    return (
+        carrier_events(df_carrier_routes, df_al_dict, ['YEAR', 'AL_GROUP'], where)
+        .filter(d.NB_ROUTE_OPENING > 0)
+        .select('YEAR', 'AL_GROUP', NB_RTE_OPEN = d.NB_ROUTE_OPENING.cast(pl.UInt32))
+        .sort(['YEAR', 'NB_RTE_OPEN'], descending = [False, True])
+    )
+
+
+def route_carriers(df_carrier_routes: pl.DataFrame | pl.LazyFrame, df_al_dict: pl.DataFrame, df_apt_dict: pl.DataFrame, where: pl.Expr = None) -> pl.DataFrame:
+    """
+    Carriers of every YEAR and route with their codes (the former LIST_OPE_AL, one row per carrier).
+
+    Returns:
+        pl.DataFrame: YEAR, APT_CODE_A, APT_CODE_B, OPE_AL, LIST_AL_GROUP (groups of the carrier), SEATS.
+    """
+    df = df_carrier_routes.lazy()
+    if where is not None:
+        df = df.filter(where)
+
+    df_carriers = df_al_dict.group_by('AL_IDX').agg(d.OPE_AL.first(), d.AL_GROUP.sort().alias('LIST_AL_GROUP'))
+
+    return (
+        decode_route_ids(df.select('YEAR', 'DIR_RTE_ID', 'AL_IDX', 'SEATS'), df_apt_dict)
+        .join(df_carriers.lazy(), how = 'left', on = 'AL_IDX')
+        .select('YEAR', 'APT_CODE_A', 'APT_CODE_B', 'OPE_AL', 'LIST_AL_GROUP', 'SEATS')
+        .sort('YEAR', 'APT_CODE_A', 'APT_CODE_B', 'OPE_AL')
+        .collect()
+    )
@@ -0,0 +1,333 @@
+import polars as pl
+from polars import col as d
+
+from utils_lifecycle import REGION_ID_US, REGION_ID_EUR
+from utils_profiling import stage, checkpoint
+
+
+#########################
+# CONFIGURATION
+#########################
+
+## Years of the cities metrics table
+CITY_YEARS = [2010, 2011, 2012, 2013, 2014, 2015]
+
+## 2015 USD to 2019 USD
+USD15_TO_USD19 = 1.08
+
+## metric -> (wide column template of df_cities_metrics_modif, factor)
+CITY_METRICS = {
+    'POPU': ('POPU_{year}', 1.0),
+    'INC_LC': ('INC_{year}_LC', 1.0),
+    'INC_USD2019': ('INC_{year}_USD15', USD15_TO_USD19),
+}
+
+## static attributes of a metropolitan area
+CITY_FLAGS = ['IS_SPECIAL', 'IS_CAPITAL', 'IS_GLOBAL_HUB', 'IS_DOMESTIC_HUB']
+
+## airports of a metropolitan area
+APT_ID_COLS = [f'APT_ID_{i}' for i in range(1, 14)]
+
+## filling of the years without value (outside 2010-2015 or missing)
+FILL_METHODS = [None, 'nearest', 'interpolate', 'extrapolate']
+
+
+#########################
+# STORE
+#########################
+
+def cities_metrics_long(df_cities: pl.DataFrame | pl.LazyFrame) -> pl.DataFrame:
+    """
+    Normalized (METRO_ID, YEAR, METRIC, VALUE) table of the yearly cities metrics.
+
+    The wide POPU_<year> / INC_<year>_LC / INC_<year>_USD15 columns become one row per metric and year
+    (USD15 converted to USD19), and the yearly growth EVO_<metric> (growth from YEAR to YEAR + 1, in %)
+    is added as a metric of its own.
+
+    Parameters:
+        df_cities (pl.DataFrame | pl.LazyFrame): Cities metrics (df_cities_metrics_modif).
+
+    Returns:
+        pl.DataFrame: METRO_ID, YEAR (Int32), METRIC, VALUE (Float64), sorted.
+    """
+    df_cities = df_cities.lazy()
+    columns = df_cities.collect_schema().names()
+
+    df_long = pl.concat([
+        df_cities.select(
+            'METRO_ID',
+            YEAR = pl.lit(year, dtype=pl.Int32),
+            METRIC = pl.lit(metric),
+            VALUE = d(template.format(year=year)).cast(pl.Float64) * factor,
+        )
+        for metric, (template, factor) in CITY_METRICS.items()
+        for year in CITY_YEARS
+        if template.format(year=year) in columns
+    ])
+
+    ## growth from YEAR to YEAR + 1 (same as EVO_POPU_1011 ... in cities_metrics_processing.ipynb)
+    df_evo = (
+        df_long
+        .sort('METRO_ID', 'METRIC', 'YEAR')
+        .with_columns(VALUE = 100 * (d.VALUE.shift(-1) - d.VALUE).over('METRO_ID', 'METRIC') / d.VALUE,
+                      NEXT_YEAR = d.YEAR.shift(-1).over('METRO_ID', 'METRIC'))
+        .filter(d.NEXT_YEAR == d.YEAR + 1)
+        .select('METRO_ID', 'YEAR', pl.format('EVO_{}', d.METRIC).alias('METRIC'), 'VALUE')
+    )
+
+    return pl.concat([df_long, df_evo]).filter(d.VALUE.is_not_null()).sort('METRO_ID', 'METRIC', 'YEAR').collect()
+
+
+def airport_metro_index(df_cities: pl.DataFrame | pl.LazyFrame, region_ids: list[int] = None) -> pl.DataFrame:
+    """
+    Airport -> metropolitan area mapping, with the static attributes of the area.
+
+    Parameters:
+        df_cities (pl.DataFrame | pl.LazyFrame): Cities metrics (df_cities_metrics_modif).
+        region_ids (list[int]): Keep only the areas of these regions. Default to None (all).
+
+    Returns:
+        pl.DataFrame: APT_ID, METRO_ID and the CITY_FLAGS columns, one row per airport
+                      (an airport listed in several areas keeps the first one).
+    """
+    df_cities = df_cities.lazy()
+    if region_ids is not None:
+        df_cities = df_cities.filter(d.REGION_ID.is_in(region_ids))
+
+    columns = df_cities.collect_schema().names()
+    flags = [c for c in CITY_FLAGS if c in columns]
+
+    return (
+        df_cities
+        .with_columns([d(c).cast(pl.Int64, strict=False) for c in APT_ID_COLS if c in columns])
+        .unpivot(index=['METRO_ID', *flags], on=[c for c in APT_ID_COLS if c in columns], value_name='APT_ID')
+        .filter(d.APT_ID.is_not_null() & (d.APT_ID != 0)) ## empty slots are 0 in the raw table
+        .unique(subset='APT_ID', keep='first', maintain_order=True)
+        .select('APT_ID', 'METRO_ID', *flags)
+        .collect()
+    )
+
+
+def metro_metrics_by_year(
+    df_long: pl.DataFrame,
+    metrics: list[str] = None,
+    years: list[int] = None,
+    fill: str = None
+) -> pl.DataFrame:
+    """
+    Wide METRO_ID x YEAR table of the metrics, with optional filling of the years without value.
+
+    Parameters:
+        df_long (pl.DataFrame): Store of `cities_metrics_long`.
+        metrics (list[str]): Metrics to keep. Default to None (all).
+        years (list[int]): Years of the output. Default to None (the years of the store).
+        fill (str): How to fill the years without value:
+            - None: no filling (only the years of the store have values),
+            - 'nearest': value of the nearest year with a value,
+            - 'interpolate': linear interpolation between known years, nearest value outside,
+            - 'extrapolate': linear interpolation between known years, compound growth trend of the known years outside.
+            Default to None.
+
+    Returns:
+        pl.DataFrame: METRO_ID, YEAR and one column per metric.
+    """
+    if fill not in FILL_METHODS:
+        raise ValueError(f"fill must be one of {FILL_METHODS}")
+
+    metrics = metrics or df_long['METRIC'].unique(maintain_order=True).to_list()
+    years = years or sorted(df_long['YEAR'].unique().to_list())
+
+    ## dense METRO_ID x YEAR x METRIC grid, values of the store where they exist
+    df_grid = (
+        df_long.select('METRO_ID').unique()
+        .join(pl.DataFrame({'YEAR': sorted(set(years) | set(df_long['YEAR'].unique().to_list()))}, schema={'YEAR': pl.Int32}), how='cross')
+        .join(pl.DataFrame({'METRIC': metrics}), how='cross')
+        .join(df_long, on=['METRO_ID', 'YEAR', 'METRIC'], how='left')
+        .sort('METRO_ID', 'METRIC', 'YEAR')
+    )
+
+    over = ['METRO_ID', 'METRIC']
+    if fill == 'nearest':
+        df_grid = df_grid.with_columns(
+            PREV_YEAR = pl.when(d.VALUE.is_not_null()).then(d.YEAR).forward_fill().over(over),
+            NEXT_YEAR = pl.when(d.VALUE.is_not_null()).then(d.YEAR).backward_fill().over(over),
+            PREV = d.VALUE.forward_fill().over(over),
+            NEXT = d.VALUE.backward_fill().over(over),
+        ).with_columns(
+            VALUE = pl.when(d.NEXT_YEAR.is_null() | ((d.YEAR - d.PREV_YEAR) <= (d.NEXT_YEAR - d.YEAR))).then(d.PREV).otherwise(d.NEXT)
+        )
+
+    elif fill in ['interpolate', 'extrapolate']:
+        df_grid = df_grid.with_columns(
+            VALUE = d.VALUE.interpolate().over(over),
+            FIRST_YEAR = d.YEAR.filter(d.VALUE.is_not_null()).min().over(over),
+            LAST_YEAR = d.YEAR.filter(d.VALUE.is_not_null()).max().over(over),
+        ).with_columns(
+            FIRST = d.VALUE.filter(d.YEAR == d.FIRST_YEAR).first().over(over),
+            LAST = d.VALUE.filter(d.YEAR == d.LAST_YEAR).first().over(over),
+        )
+
+        if fill == 'interpolate':
+            outside = pl.when(d.YEAR < d.FIRST_YEAR).then(d.FIRST).otherwise(d.LAST)
+        else:
+            ## compound annual growth of the known years (growth metrics themselves are only carried)
+            span = (d.LAST_YEAR - d.FIRST_YEAR).cast(pl.Float64)
+            rate = pl.when((span > 0) & (d.FIRST > 0) & (d.LAST > 0) & ~d.METRIC.str.starts_with('EVO_')).then((d.LAST / d.FIRST) ** (1 / span)).otherwise(1.0)
+            outside = (
+                pl.when(d.YEAR < d.FIRST_YEAR).then(d.FIRST * rate ** (d.YEAR - d.FIRST_YEAR).cast(pl.Float64))
+                .otherwise(d.LAST * rate ** (d.YEAR - d.LAST_YEAR).cast(pl.Float64))
+            )
+
+        df_grid = df_grid.with_columns(VALUE = pl.when(d.VALUE.is_null()).then(outside).otherwise(d.VALUE))
+
+    return (
+        df_grid
+        .filter(d.YEAR.is_in(years))
+        .pivot(on='METRIC', index=['METRO_ID', 'YEAR'], values='VALUE')
+        .select('METRO_ID', 'YEAR', *metrics)
+        .sort('METRO_ID', 'YEAR')
+    )
+
+
+#########################
+# LOOKUP
+#########################
+
+def add_city_metrics(
+    df_routes: pl.DataFrame | pl.LazyFrame,
+    df_long: pl.DataFrame,
+    df_apt_metro: pl.DataFrame,
+    metrics: list[str] = None,
+    fill: str = None,
+    year_col: str = 'YEAR',
+    sides: list[str] = ['A', 'B']
+) -> pl.DataFrame | pl.LazyFrame:
+    """
+    Add the cities metrics of the current year and the area attributes of both ends of each route.
+
+    Replaces the `pl.when(d.YEAR == 2010)...` chains of cities_metrics_processing.ipynb: the metro x year
+    table is built once (with the filling of the years outside 2010-2015 if asked), then each route end
+    gets all its metrics with one join on (APT_ID, YEAR).
+
+    Parameters:
+        df_routes (pl.DataFrame | pl.LazyFrame): Routes with APT_ID_A, APT_ID_B (one per side) and YEAR.
+        df_long (pl.DataFrame): Store of `cities_metrics_long`.
+        df_apt_metro (pl.DataFrame): Mapping of `airport_metro_index`.
+        metrics (list[str]): Metrics to add (e.g. ['POPU', 'EVO_POPU', 'INC_LC']). Default to None (all).
+        fill (str): Filling of the years without value, see `metro_metrics_by_year`. Default to None.
+        year_col (str): Year column of the routes. Default to 'YEAR'.
+        sides (list[str]): Suffixes of the route ends. Default to ['A', 'B'].
+
+    Returns:
+        pl.DataFrame | pl.LazyFrame: Routes with METRO_ID_<side>, the CITY_FLAGS and the metrics of each side.
+
+    Example:
+        >>> df_long = cities_metrics_long(df_cities_metrics_modif)
+        >>> df_apt_metro = airport_metro_index(df_cities_metrics_modif, region_ids=[10, 13])
+        >>> df_scheduled = add_city_metrics(df_scheduled_with_apt_id, df_long, df_apt_metro, ['POPU', 'INC_LC'], fill='extrapolate')
+    """
+    years = None
+    if fill is not None:
+        years = df_routes.lazy().select(d(year_col).unique()).collect().to_series().drop_nulls().cast(pl.Int32).to_list()
+
+    df_metro_year = (
+        df_apt_metro
+        .join(metro_metrics_by_year(df_long, metrics, years, fill), on='METRO_ID', how='left')
+        .rename({'YEAR': year_col})
+    )
+    value_cols = [c for c in df_metro_year.columns if c not in ['APT_ID', year_col]]
+
+    is_lazy = isinstance(df_routes, pl.LazyFrame)
+    df_routes = df_routes.lazy().with_columns(d(year_col).cast(pl.Int32).alias('__YEAR'))
+    df_metro_year = df_metro_year.lazy().with_columns(d(year_col).cast(pl.Int32).alias('__YEAR')).drop(year_col)
+
+    for side in sides:
+        df_routes = df_routes.join(
+            df_metro_year.rename({'APT_ID': f'APT_ID_{side}', **{c: f'{c}_{side}' for c in value_cols}}),
+            on=[f'APT_ID_{side}', '__YEAR'],
+            how='left'
+        )
+
+    df_routes = df_routes.drop('__YEAR')
+    return df_routes if is_lazy else df_routes.collect()
+
+
+def build_cities_stat_dataset(
+    df_scheduled: pl.DataFrame | pl.LazyFrame,
+    df_cities: pl.DataFrame | pl.LazyFrame,
+    df_airports_lookup: pl.DataFrame | pl.LazyFrame,
+    fill: str = None
+) -> pl.DataFrame:
+    """
+    df_cities_metrics_preprocessed_for_stat (cities_metrics_processing.ipynb), from the long format store.
+
+    Parameters:
+        df_scheduled (pl.DataFrame | pl.LazyFrame): Enhanced transatlantic schedules.
+        df_cities (pl.DataFrame | pl.LazyFrame): Cities metrics (df_cities_metrics_modif).
+        df_airports_lookup (pl.DataFrame | pl.LazyFrame): Airports lookup with APT_ID and APT_CODE.
+        fill (str): Filling of the years without value (see `add_city_metrics`). None keeps the notebook years
+                    (2010-2014: the last year of CITY_YEARS has no growth and is dropped). With a fill, every year
+                    of the routes is kept, the growth of the years past the last one with a value (2015 included)
+                    being filled like the other metrics. Default to None.
+
+    Returns:
+        pl.DataFrame: One row per route and year with the cities metrics of both ends.
+    """
+    metrics = ['POPU', 'EVO_POPU', 'INC_LC', 'EVO_INC_LC', 'INC_USD2019', 'EVO_INC_USD2019']
+    first_year, last_year = (min(CITY_YEARS), max(CITY_YEARS)) if fill is None else (None, None)
+
+    df_scheduled = df_scheduled.lazy()
+    df_apt_id = df_airports_lookup.lazy().select('APT_ID', 'APT_CODE')
+
+    df_opening_apt_pair = (
+        df_scheduled
+        .filter(d.YEAR.is_between(2010, 2014))
+        .filter(d.IS_OPENING)
+        .select('APT_CODE_A', 'APT_CODE_B')
+        .unique()
+        .with_columns(NEW_OPENING = True)
+    )
+
+    df_routes = (
+        df_scheduled
+        .filter(d.MKT_TYPE == 'INTER')
+        .join(df_apt_id.rename({'APT_ID':'APT_ID_A', 'APT_CODE':'APT_CODE_A'}), how = 'left', on = 'APT_CODE_A')
+        .join(df_apt_id.rename({'APT_ID':'APT_ID_B', 'APT_CODE':'APT_CODE_B'}), how = 'left', on = 'APT_CODE_B')
+    )
+    if first_year is not None:
+        df_routes = df_routes.filter(d.YEAR.is_between(first_year, last_year))
+
+    with stage('cities metrics long') as s:
+        df_long = s.done(cities_metrics_long(df_cities))
+        df_apt_metro = airport_metro_index(df_cities, region_ids=[REGION_ID_US, REGION_ID_EUR])
+
+    with stage('routes with cities metrics') as s:
+        df_stat = (
+            add_city_metrics(df_routes.pipe(checkpoint, 'routes'), df_long, df_apt_metro, metrics, fill=fill)
+            .pipe(checkpoint, 'add_city_metrics')
+            .filter(d.POPU_A.is_not_null() & d.POPU_B.is_not_null())
+            .filter((d.YEAR != max(CITY_YEARS)) if fill is None else pl.lit(True)) ## no growth for the last year
+
+            .with_columns(TAG_DURATION_OPENING = pl.when(d.IS_OPENING & (d.DURATION_FIRST_OPENING <= 3))
+                                                   .then(pl.lit('SHORT_OPENING'))
+                                                   .when(d.IS_OPENING & (d.DURATION_FIRST_OPENING > 3))
+                                                   .then(pl.lit('LONG_OPENING'))
+                                                   .otherwise(pl.lit('NO_OPENING')),
+                          POPU_LOG_A = d.POPU_A.log(),
+                          POPU_LOG_B = d.POPU_B.log(),
+                          INC_LC_LOG_A = d.INC_LC_A.log(),
+                          INC_LC_LOG_B = d.INC_LC_B.log())
+
+            .join(df_opening_apt_pair, how = 'left', on = ['APT_CODE_A', 'APT_CODE_B'])
+            .with_columns(TAG_NEW_OPENING = pl.when(d.IS_OPENING)
+                                              .then(pl.lit('NEW_OPENING'))
+                                              .when(d.NEW_OPENING)
+                                              .then(pl.lit('HAS_OPENED'))
+                                              .otherwise(pl.lit('OLD_2010')))
+
+            .select('YEAR', 'IS_OPENING', 'TAG_DURATION_OPENING', 'TAG_NEW_OPENING',
+                    *[f'{flag}_{side}' for side in ['A', 'B'] for flag in CITY_FLAGS],
+                    *[f'{metric}_{side}' for metric in metrics for side in ['A', 'B']],
+                    'POPU_LOG_A', 'POPU_LOG_B', 'INC_LC_LOG_A', 'INC_LC_LOG_B')
+        )
+        return s.done(df_stat.collect())
@@ -0,0 +1,220 @@
+import polars as pl
+from polars import col as d
+
+from utils_routes import airport_dictionary, add_route_ids, waterfall_bars, undirected_route_id, APT_IDX_BITS
+
+
+#########################
+# CONFIGURATION
+#########################
+
+## Dimensions of the cube
+CUBE_DIMS = [
+    'YEAR', 'MKT_TYPE', 'DIRECTION',
+    'IS_OPENING', 'IS_REOPENING', 'IS_PAUSE', 'IS_END', ## lifecycle state of the route this year
+    'DURATION_BUCKET', ## bucket of DURATION_FIRST_OPENING (see DURATION_BUCKETS)
+    'HAS_REVERSE', ## the route is also operated in the other direction this year
+]
+
+## Lower bounds (in years) of the buckets of DURATION_FIRST_OPENING: 1, 2, 3, 4-5, 6-10, 11+
+DURATION_BUCKETS = [1, 2, 3, 4, 6, 11]
+
+## Additive measures of the cube (NB_RTE: number of directional routes, one row per YEAR and route in df_enhanced)
+CUBE_MEASURES = ['NB_RTE', 'FLT', 'SEATS', 'FLT_HOURS']
+
+## Distinct-route sketch of every cell: the SKETCH_SIZE smallest hashes of its undirected route ids (k minimum values)
+SKETCH_COL = 'UNDIR_RTE_SKETCH'
+SKETCH_SIZE = 128
+
+## Hash of the route ids: two rounds of (x * a + b) mod p, a permutation of [0, p) that fits in UInt64 arithmetic
+SKETCH_PRIME = 4_294_967_291
+SKETCH_ROUNDS = [(1_103_515_245, 12_345), (2_147_483_629, 1_013_904_223)]
+
+## Exact set of the directional route ids of every cell (optional, see `build_route_cube`)
+ROUTE_SET_COL = 'LIST_DIR_RTE_ID'
+
+## Lifecycle states and their count column in df_enhanced
+STATE_COUNTS = {
+    'IS_OPENING': 'NB_OPENING_RTE',
+    'IS_REOPENING': 'NB_REOPENING_RTE',
+    'IS_END': 'NB_ENDING_RTE',
+    'IS_PAUSE': 'NB_PAUSE_RTE',
+}
+
+
+#########################
+# BUILD
+#########################
+
+def duration_bucket(duration: pl.Expr) -> pl.Expr:
+    """Lower bound of the bucket of DURATION_BUCKETS of a duration (the durations below the first bound are kept)."""
+    bucket = duration
+    for bound in DURATION_BUCKETS:
+        bucket = pl.when(duration >= bound).then(pl.lit(bound, dtype=pl.Int32)).otherwise(bucket)
+    return bucket.cast(pl.Int32)
+
+
+def route_hash(route_id: pl.Expr) -> pl.Expr:
+    """UInt32 hash of a route id for the distinct-route sketches (the same in every session and Polars version)."""
+    h = route_id.cast(pl.UInt64)
+    for a, b in SKETCH_ROUNDS:
+        h = (h * a + b) % SKETCH_PRIME
+    return h.cast(pl.UInt32)
+
+
+def build_route_cube(
+    df_enhanced: pl.DataFrame | pl.LazyFrame,
+    extra_dims: list[str] = None,
+    exact_routes: bool = False
+) -> pl.DataFrame:
+    """
+    Aggregate cube of the enhanced dataset for the route opening analyses (route_opening_analysis.ipynb).
+
+    One row per combination of CUBE_DIMS with the sums of CUBE_MEASURES. Every figure of the analysis is a
+    rollup of this table (see `rollup`), which is a few thousand rows instead of one row per YEAR and route.
+
+    NB_RTE counts the rows of the cell, i.e. directional routes within a YEAR (a route has one row per YEAR).
+    The cell also keeps a sketch of its undirected routes (SKETCH_COL, at most SKETCH_SIZE hashes), from which
+    `rollup` counts the distinct undirected routes of any combination of cells without growing with the dataset.
+
+    Parameters:
+        df_enhanced (pl.DataFrame | pl.LazyFrame): Enhanced dataset (scheduled_dataset_transatlantic_enhanced).
+        extra_dims (list[str]): Other columns of df_enhanced to add to the dimensions (e.g. ['FIRST_EXISTING_YEAR']).
+                                Every extra dimension multiplies the number of cells. Default to None.
+        exact_routes (bool): If True, also keep the set of the DIR_RTE_ID of every cell (ROUTE_SET_COL) so that
+                             `rollup` counts the distinct routes exactly. The cube then grows with df_enhanced. Default to False.
+
+    Returns:
+        pl.DataFrame: CUBE_DIMS, `extra_dims`, CUBE_MEASURES, SKETCH_COL (and ROUTE_SET_COL if `exact_routes`) columns.
+    """
+    df_enhanced = df_enhanced.lazy()
+
+    ## datasets built before the route ids
+    if 'UNDIR_RTE_ID' not in df_enhanced.collect_schema().names():
+        df_apt = df_enhanced.select(APT_CODE = pl.concat_list('APT_CODE_A', 'APT_CODE_B')).explode('APT_CODE')
+        df_enhanced = add_route_ids(df_enhanced, airport_dictionary(df_apt))
+
+    dims = CUBE_DIMS + (extra_dims or [])
+    route_sets = [d.DIR_RTE_ID.sort().alias(ROUTE_SET_COL)] if exact_routes else []
+
+    return (
+        df_enhanced
+        .with_columns(HAS_REVERSE = d.DIR_RTE_ID.n_unique().over('YEAR', 'UNDIR_RTE_ID') == 2,
+                      DURATION_BUCKET = duration_bucket(d.DURATION_FIRST_OPENING))
+        .group_by(dims)
+        .agg(pl.len().alias('NB_RTE'), d.FLT.sum(), d.SEATS.sum(), d.FLT_HOURS.sum(),
+             route_hash(d.UNDIR_RTE_ID).unique().sort().head(SKETCH_SIZE).alias(SKETCH_COL), *route_sets)
+        .sort(dims)
+        .collect()
+    )
+
+
+#########################
+# QUERIES
+#########################
+
+def rollup(cube: pl.DataFrame | pl.LazyFrame, by: list[str], where: pl.Expr = None) -> pl.DataFrame:
+    """
+    Sum of the measures of the cube by some of its dimensions.
+
+    The measures are sums: without YEAR in `by`, NB_RTE and the lifecycle counts are route-years (a route
+    open 3 years counts 3 times), not distinct routes. NB_UNDIR_RTE is the number of distinct undirected
+    routes of each group, for any `by` (including DIRECTION / HAS_REVERSE and rollups over several years).
+    It is merged from the sketches of the cells: exact up to SKETCH_SIZE routes, an estimate beyond
+    (relative error about 1/sqrt(SKETCH_SIZE)), and exact in every case if the cube has the route sets.
+
+    Parameters:
+        cube (pl.DataFrame | pl.LazyFrame): Cube of `build_route_cube`.
+        by (list[str]): Dimensions to keep (the others are summed over).
+        where (pl.Expr): Filter on the dimensions before the rollup (e.g. `d.MKT_TYPE == 'INTER'`). Default to None.
+
+    Returns:
+        pl.DataFrame: `by` columns, CUBE_MEASURES, NB_UNDIR_RTE and the number of routes of each lifecycle state
+                      (NB_OPENING_RTE, NB_REOPENING_RTE, NB_ENDING_RTE, NB_PAUSE_RTE), sorted by `by`.
+
+    Example:
+        >>> rollup(cube, ['YEAR', 'MKT_TYPE'])   ## SEATS, FLT and number of routes by year and market
+        >>> rollup(cube, ['YEAR', 'DIRECTION'], where=(d.MKT_TYPE == 'INTER') & ~d.HAS_REVERSE)   ## one-way routes
+    """
+    cube = cube.lazy()
+    if where is not None:
+        cube = cube.filter(where)
+
+    if ROUTE_SET_COL in cube.collect_schema().names():
+        ## the airport ids of a directional route id give its undirected id
+        dir_ids = d(ROUTE_SET_COL).explode()
+        nb_undir = undirected_route_id(dir_ids // 2**APT_IDX_BITS, dir_ids % 2**APT_IDX_BITS).n_unique()
+    else:
+        nb_undir = d(SKETCH_COL).explode().unique().sort().head(SKETCH_SIZE).implode()
+
+    df_rollup = (
+        cube
+        .group_by(by)
+        .agg(
+            *[d(measure).sum() for measure in CUBE_MEASURES],
+            nb_undir.alias('NB_UNDIR_RTE'),
+            *[d.NB_RTE.filter(d(state)).sum().cast(pl.Int32).alias(count) for state, count in STATE_COUNTS.items()],
+        )
+    )
+
+    ## k minimum values estimate: (k - 1) / (k-th smallest hash / p), the number of hashes below k routes
+    if ROUTE_SET_COL not in cube.collect_schema().names():
+        sketch = d.NB_UNDIR_RTE
+        df_rollup = df_rollup.with_columns(
+            NB_UNDIR_RTE = pl.when(sketch.list.len() < SKETCH_SIZE)
+                           .then(sketch.list.len())
+                           .otherwise(((SKETCH_SIZE - 1) * SKETCH_PRIME / sketch.list.last().cast(pl.Float64)).round())
+                           .cast(pl.UInt32)
+        )
+
+    return df_rollup.sort(by).collect()
+
+
+def cube_waterfall(cube: pl.DataFrame | pl.LazyFrame, by: list[str] = ['YEAR', 'MKT_TYPE'], where: pl.Expr = None) -> pl.DataFrame:
+    """
+    Waterfall of the number of routes (same output as `utils_routes.route_waterfall` on the enhanced dataset).
+
+    Returns:
+        pl.DataFrame: `by` columns, RTE_TYPE, NB_RTE, ORDER, BASE.
+    """
+    return waterfall_bars(rollup(cube, by, where).rename({'NB_RTE': 'NB_DIR_RTE'}), by)
+
+
+def seats_by_state(cube: pl.DataFrame | pl.LazyFrame, by: list[str] = ['YEAR', 'MKT_TYPE'], where: pl.Expr = None) -> pl.DataFrame:
+    """
+    Seats of the opening, reopening, pause and end routes (pause and end counted negatively), and all the seats.
+
+    Returns:
+        pl.DataFrame: `by` columns, SEATS_OPENING, SEATS_REOPENING, SEATS_PAUSE, SEATS_END, SEATS.
+    """
+    cube = cube.lazy()
+    if where is not None:
+        cube = cube.filter(where)
+
+    return (
+        cube
+        .group_by(by)
+        .agg(d.SEATS.filter(d.IS_OPENING).sum().alias('SEATS_OPENING'), d.SEATS.filter(d.IS_REOPENING).sum().alias('SEATS_REOPENING'),
+             d.SEATS.filter(d.IS_PAUSE).sum().alias('SEATS_PAUSE'), d.SEATS.filter(d.IS_END).sum().alias('SEATS_END'), d.SEATS.sum())
+        .with_columns(SEATS_PAUSE = -d.SEATS_PAUSE, SEATS_END = -d.SEATS_END)
+        .sort(by)
+        .collect()
+    )
+
+
+def duration_distribution(cube: pl.DataFrame | pl.LazyFrame, by: list[str] = ['MKT_TYPE'], where: pl.Expr = None) -> pl.DataFrame:
+    """
+    Distribution and CDF of the duration of the first opening of the opened routes, by DURATION_BUCKET.
+
+    Returns:
+        pl.DataFrame: DURATION_BUCKET, `by` columns, COUNT, DISTRIBUTION, CDF.
+    """
+    where = d.IS_OPENING if where is None else d.IS_OPENING & where
+
+    return (
+        rollup(cube, ['DURATION_BUCKET', *by], where)
+        .select('DURATION_BUCKET', *by, COUNT = d.NB_RTE)
+        .with_columns(DISTRIBUTION = d.COUNT / d.COUNT.sum().over(by))
+        .sort(*by, 'DURATION_BUCKET')
+        .with_columns(CDF = d.DISTRIBUTION.cum_sum().over(by))
+    )
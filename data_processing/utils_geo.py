@@ -0,0 +1,532 @@
+import os
+import numpy as np
+import polars as pl
+from polars import col as d
+from scipy.spatial import cKDTree
+from typing import Iterator
+
+
+#########################
+# CONFIGURATION
+#########################
+
+## Earth radius used for every great circle distance of the project
+R_EARTH_KM = 6371.0
+
+## Minimum runway length (m) at sea level to take off / land, +7% per 1000 ft of elevation
+BASE_TO_M = 2800.0
+BASE_LDG_M = 1800.0
+ELEV_FACTOR_PER_1000FT = 0.07
+
+FT_TO_M = 0.3048
+
+## Radii (km) of the airport catchment features, and traffic column measuring the size of an airport
+CATCHMENT_RADII_KM = [50, 100, 200]
+CATCHMENT_SIZE = 'SEATS'
+
+
+#########################
+# HELPER FUNCTIONS
+#########################
+
+def lat_lon_to_xyz(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    """
+    Convert latitudes/longitudes (degrees) to 3D points on the unit sphere.
+
+    Parameters:
+        lat (np.ndarray): Latitudes in degrees.
+        lon (np.ndarray): Longitudes in degrees.
+
+    Returns:
+        np.ndarray: Array of shape (n, 3).
+    """
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def gc_km_to_chord(dist_km: float) -> float:
+    """
+    Convert a great circle distance (km) to the straight chord length on the unit sphere.
+    """
+    return 2 * np.sin(min(dist_km / R_EARTH_KM, np.pi) / 2)
+
+
+def chord_to_gc_km(chord: np.ndarray) -> np.ndarray:
+    """
+    Convert chord lengths on the unit sphere to great circle distances (km), same value as the haversine formula.
+    """
+    return 2 * R_EARTH_KM * np.arcsin(np.clip(chord / 2, 0, 1))
+
+
+def _select_airports(df_airports: pl.DataFrame, region_id: int | None) -> pl.DataFrame:
+    """
+    Airports of a region (all regions if None) with known coordinates.
+    """
+    df = df_airports.filter(d.LATITUDE.is_not_null() & d.LONGITUDE.is_not_null())
+    if region_id is not None:
+        df = df.filter(d.REGION_ID == region_id)
+
+    return df.select('APT_CODE', 'LATITUDE', 'LONGITUDE').unique(subset='APT_CODE', keep='first', maintain_order=True)
+
+
+def _pairs_within_band(
+    df_a: pl.DataFrame,
+    df_b: pl.DataFrame,
+    min_dist_km: float,
+    max_dist_km: float,
+    chunk_size: int
+) -> Iterator[pl.DataFrame]:
+    """
+    Yield the (A, B) pairs of two airport sets whose great circle distance is in [min_dist_km, max_dist_km].
+    """
+    codes_a = df_a['APT_CODE'].to_numpy()
+    codes_b = df_b['APT_CODE'].to_numpy()
+    xyz_a = lat_lon_to_xyz(df_a['LATITUDE'].to_numpy(), df_a['LONGITUDE'].to_numpy())
+    tree_b = cKDTree(lat_lon_to_xyz(df_b['LATITUDE'].to_numpy(), df_b['LONGITUDE'].to_numpy()))
+
+    max_chord = gc_km_to_chord(max_dist_km)
+
+    for start in range(0, len(codes_a), chunk_size):
+        ## all the pairs within the max distance, found with the tree (no full cross join)
+        tree_chunk = cKDTree(xyz_a[start:start + chunk_size])
+        pairs = tree_chunk.sparse_distance_matrix(tree_b, max_chord, output_type='ndarray')
+
+        ## exact great circle distance, then the lower bound of the band (and no A -> A pair)
+        dist_km = chord_to_gc_km(pairs['v'])
+        i, j = start + pairs['i'], pairs['j']
+        mask = (dist_km >= min_dist_km) & (dist_km <= max_dist_km) & (codes_a[i] != codes_b[j])
+
+        if mask.any():
+            yield pl.DataFrame({
+                'APT_CODE_A': codes_a[i[mask]],
+                'APT_CODE_B': codes_b[j[mask]],
+                'DIST_GC_KM': dist_km[mask],
+            })
+
+
+#########################
+# MAIN FUNCTIONS
+#########################
+
+def generate_candidate_pairs(
+    df_airports: pl.DataFrame,
+    min_dist_km: float,
+    max_dist_km: float,
+    region_a: int = None,
+    region_b: int = None,
+    both_directions: bool = True,
+    chunk_size: int = 5_000
+) -> Iterator[pl.DataFrame]:
+    """
+    Stream the directional airport pairs whose great circle distance is within a distance band.
+
+    A KD-tree over the airports (3D points on the unit sphere) only returns the pairs closer than
+    `max_dist_km`, so the full cross join of the two airport sets is never materialized. This replaces
+    the EU x US `how="cross"` joins of apt_combinaison.ipynb followed by the DIST_GC_KM filter of filtering.ipynb.
+    Airports without LATITUDE/LONGITUDE are skipped (their DIST_GC_KM would be null).
+
+    Parameters:
+        df_airports (pl.DataFrame): Airports with APT_CODE, REGION_ID, LATITUDE and LONGITUDE columns.
+        min_dist_km (float): Minimum great circle distance (km), included.
+        max_dist_km (float): Maximum great circle distance (km), included.
+        region_a (int): REGION_ID of the origin airports. Default to None (all regions).
+        region_b (int): REGION_ID of the destination airports. Default to None (all regions).
+        both_directions (bool): If True and the regions differ, also yield the region_b -> region_a pairs
+                                (without the pairs of the first pass when a region is None). Default to True.
+        chunk_size (int): Number of origin airports processed per chunk. Default to 5_000.
+
+    Yields:
+        pl.DataFrame: Chunks with APT_CODE_A, APT_CODE_B and DIST_GC_KM columns.
+
+    Example:
+        >>> for df_chunk in generate_candidate_pairs(df_airports, 7400, 8700, region_a=13, region_b=10):
+        ...     df_chunk.write_parquet(...)
+    """
+    df_a = _select_airports(df_airports, region_a)
+    df_b = _select_airports(df_airports, region_b)
+
+    yield from _pairs_within_band(df_a, df_b, min_dist_km, max_dist_km, chunk_size)
+
+    if both_directions and region_a != region_b:
+        ## with a region None, the sets overlap: a pair whose origin is in A and destination in B is already yielded
+        codes_a, codes_b = df_a['APT_CODE'], df_b['APT_CODE']
+        for df_chunk in _pairs_within_band(df_b, df_a, min_dist_km, max_dist_km, chunk_size):
+            df_chunk = df_chunk.filter(~(d.APT_CODE_A.is_in(codes_a) & d.APT_CODE_B.is_in(codes_b)))
+            if df_chunk.height:
+                yield df_chunk
+
+
+def build_candidate_pairs(
+    df_airports: pl.DataFrame,
+    min_dist_km: float,
+    max_dist_km: float,
+    region_a: int = None,
+    region_b: int = None,
+    both_directions: bool = True,
+    chunk_size: int = 5_000
+) -> pl.DataFrame:
+    """
+    Collect all the chunks of `generate_candidate_pairs` in one DataFrame (same parameters).
+
+    Returns:
+        pl.DataFrame: APT_CODE_A, APT_CODE_B and DIST_GC_KM of every pair within the distance band.
+    """
+    chunks = list(generate_candidate_pairs(df_airports, min_dist_km, max_dist_km, region_a, region_b, both_directions, chunk_size))
+    if not chunks:
+        return pl.DataFrame(schema={'APT_CODE_A': pl.Utf8, 'APT_CODE_B': pl.Utf8, 'DIST_GC_KM': pl.Float64})
+
+    return pl.concat(chunks)
+
+
+#########################
+# ROUTE MATRICES
+#########################
+
+def _empty_matrix(shape: tuple[int, int], dtype, mmap_dir: str | None, name: str) -> np.ndarray:
+    """
+    Allocate a matrix in memory, or as a .npy memory-mapped file in `mmap_dir`.
+    """
+    if mmap_dir is None:
+        return np.empty(shape, dtype=dtype)
+
+    os.makedirs(mmap_dir, exist_ok=True)
+    return np.lib.format.open_memmap(os.path.join(mmap_dir, f"{name}.npy"), mode='w+', dtype=dtype, shape=shape)
+
+
+def haversine_matrix(
+    lat_a: np.ndarray,
+    lon_a: np.ndarray,
+    lat_b: np.ndarray,
+    lon_b: np.ndarray,
+    block_size: int = 2_048,
+    out: np.ndarray = None
+) -> np.ndarray:
+    """
+    Great circle distance (km) between every airport of set A and every airport of set B.
+
+    The matrix is filled by blocks of `block_size` origins, so the float64 intermediates never
+    exceed block_size x len(B) values, whatever the size of A.
+
+    Parameters:
+        lat_a, lon_a (np.ndarray): Coordinates (degrees) of the origin airports.
+        lat_b, lon_b (np.ndarray): Coordinates (degrees) of the destination airports.
+        block_size (int): Number of origins computed at once. Default to 2_048.
+        out (np.ndarray): Preallocated float32 array of shape (len(A), len(B)), e.g. a memmap. Default to None.
+
+    Returns:
+        np.ndarray: float32 matrix of shape (len(A), len(B)), NaN when a coordinate is missing.
+    """
+    lat_a, lon_a = np.radians(np.asarray(lat_a, dtype=np.float64)), np.radians(np.asarray(lon_a, dtype=np.float64))
+    lat_b, lon_b = np.radians(np.asarray(lat_b, dtype=np.float64)), np.radians(np.asarray(lon_b, dtype=np.float64))
+
+    if out is None:
+        out = np.empty((len(lat_a), len(lat_b)), dtype=np.float32)
+
+    cos_lat_b = np.cos(lat_b)
+    for start in range(0, len(lat_a), block_size):
+        stop = start + block_size
+        dlat = lat_b[None, :] - lat_a[start:stop, None]
+        dlon = lon_b[None, :] - lon_a[start:stop, None]
+        a = np.sin(dlat / 2)**2 + np.cos(lat_a[start:stop, None]) * cos_lat_b[None, :] * np.sin(dlon / 2)**2
+        out[start:stop] = 2 * R_EARTH_KM * np.arcsin(np.sqrt(a))
+
+    return out
+
+
+def runway_required_m(elev_ft: np.ndarray, base_m: float) -> np.ndarray:
+    """
+    Runway length (m) needed at a given elevation (ft): base length + 7% per 1000 ft.
+    """
+    return base_m * (1 + ELEV_FACTOR_PER_1000FT * (np.asarray(elev_ft, dtype=np.float64) / 1000.0))
+
+
+def compute_route_matrices(
+    df_airports_a: pl.DataFrame,
+    df_airports_b: pl.DataFrame,
+    block_size: int = 2_048,
+    mmap_dir: str = None
+) -> dict:
+    """
+    Compute once the distance and runway feasibility of every (A, B) airport combination.
+
+    Same rules as apt_combinaison.ipynb: RUNWAY_M is the longest runway of the origin airport A,
+    TO_FEASIBLE compares it to the take off length needed at ELEV_FT_A, LDG_FEASIBLE to the landing
+    length needed at ELEV_FT_B. TO_FEASIBLE only depends on A, so it is kept as a vector.
+    Missing values give NaN distances and False feasibility.
+
+    Parameters:
+        df_airports_a (pl.DataFrame): Origin airports with APT_CODE, LATITUDE, LONGITUDE, ELEV_FT and LONGEST_RUNWAY_FT.
+        df_airports_b (pl.DataFrame): Destination airports with APT_CODE, LATITUDE, LONGITUDE and ELEV_FT.
+        block_size (int): Number of origins computed at once. Default to 2_048.
+        mmap_dir (str): If given, the matrices are memory-mapped .npy files in this folder. Default to None (in memory).
+
+    Returns:
+        dict: {
+            'APT_CODE_A': np.ndarray (n_a,), 'APT_CODE_B': np.ndarray (n_b,),
+            'DIST_GC_KM': float32 (n_a, n_b), 'TO_FEASIBLE': bool (n_a,),
+            'LDG_FEASIBLE': bool (n_a, n_b), 'IS_FEASIBLE': bool (n_a, n_b)
+        }
+
+    Example:
+        >>> matrices = compute_route_matrices(df_eu, df_us, mmap_dir='matrices_eu_us')
+        >>> df_pairs = gather_route_matrices(matrices, df_apt_combinaison)
+    """
+    n_a, n_b = len(df_airports_a), len(df_airports_b)
+
+    dist = haversine_matrix(
+        df_airports_a['LATITUDE'].to_numpy(), df_airports_a['LONGITUDE'].to_numpy(),
+        df_airports_b['LATITUDE'].to_numpy(), df_airports_b['LONGITUDE'].to_numpy(),
+        block_size=block_size,
+        out=_empty_matrix((n_a, n_b), np.float32, mmap_dir, 'DIST_GC_KM'),
+    )
+
+    runway_m_a = df_airports_a['LONGEST_RUNWAY_FT'].cast(pl.Float64).to_numpy() * FT_TO_M
+    to_feasible = runway_m_a >= runway_required_m(df_airports_a['ELEV_FT'].cast(pl.Float64).to_numpy(), BASE_TO_M)
+    ldg_required_b = runway_required_m(df_airports_b['ELEV_FT'].cast(pl.Float64).to_numpy(), BASE_LDG_M)
+
+    ldg_feasible = _empty_matrix((n_a, n_b), np.bool_, mmap_dir, 'LDG_FEASIBLE')
+    is_feasible = _empty_matrix((n_a, n_b), np.bool_, mmap_dir, 'IS_FEASIBLE')
+    for start in range(0, n_a, block_size):
+        stop = start + block_size
+        np.greater_equal(runway_m_a[start:stop, None], ldg_required_b[None, :], out=ldg_feasible[start:stop])
+        np.logical_and(ldg_feasible[start:stop], to_feasible[start:stop, None], out=is_feasible[start:stop])
+
+    return {
+        'APT_CODE_A': df_airports_a['APT_CODE'].to_numpy(),
+        'APT_CODE_B': df_airports_b['APT_CODE'].to_numpy(),
+        'DIST_GC_KM': dist,
+        'TO_FEASIBLE': to_feasible,
+        'LDG_FEASIBLE': ldg_feasible,
+        'IS_FEASIBLE': is_feasible,
+    }
+
+
+def gather_route_matrices(matrices: dict, df_pairs: pl.DataFrame) -> pl.DataFrame:
+    """
+    Add DIST_GC_KM, TO_FEASIBLE, LDG_FEASIBLE and IS_FEASIBLE to a pair table by indexing the route matrices.
+
+    Parameters:
+        matrices (dict): Output of `compute_route_matrices`.
+        df_pairs (pl.DataFrame): Pairs with APT_CODE_A and APT_CODE_B columns.
+
+    Returns:
+        pl.DataFrame: `df_pairs` with the 4 columns added (null when an airport is not in the matrices
+                      or a coordinate is missing).
+    """
+    df_idx = (
+        df_pairs
+        .select('APT_CODE_A', 'APT_CODE_B')
+        .join(pl.DataFrame({'APT_CODE_A': matrices['APT_CODE_A'], 'IDX_A': np.arange(len(matrices['APT_CODE_A']))}).unique(subset='APT_CODE_A'), on='APT_CODE_A', how='left', maintain_order='left')
+        .join(pl.DataFrame({'APT_CODE_B': matrices['APT_CODE_B'], 'IDX_B': np.arange(len(matrices['APT_CODE_B']))}).unique(subset='APT_CODE_B'), on='APT_CODE_B', how='left', maintain_order='left')
+    )
+
+    found = (df_idx['IDX_A'].is_not_null() & df_idx['IDX_B'].is_not_null()).to_numpy()
+    idx_a = df_idx['IDX_A'].fill_null(0).to_numpy()
+    idx_b = df_idx['IDX_B'].fill_null(0).to_numpy()
+
+    def gather(values: np.ndarray) -> pl.Series:
+        return pl.Series(values).scatter(np.flatnonzero(~found), None) if (~found).any() else pl.Series(values)
+
+    return df_pairs.with_columns(
+        gather(matrices['DIST_GC_KM'][idx_a, idx_b]).fill_nan(None).alias('DIST_GC_KM'),
+        gather(matrices['TO_FEASIBLE'][idx_a]).alias('TO_FEASIBLE'),
+        gather(matrices['LDG_FEASIBLE'][idx_a, idx_b]).alias('LDG_FEASIBLE'),
+        gather(matrices['IS_FEASIBLE'][idx_a, idx_b]).alias('IS_FEASIBLE'),
+    )
+
+
+#########################
+# CATCHMENT
+#########################
+
+def airport_neighbours(df_airports: pl.DataFrame | pl.LazyFrame, max_dist_km: float, chunk_size: int = 5_000) -> pl.DataFrame:
+    """
+    Every (airport, neighbour) couple closer than `max_dist_km`, found with the KD-tree of `_pairs_within_band`.
+
+    Computed once for the largest radius: any smaller radius is a filter on NEIGHBOUR_DIST_KM.
+
+    Parameters:
+        df_airports (pl.DataFrame | pl.LazyFrame): Airports with APT_CODE, LATITUDE and LONGITUDE columns.
+        max_dist_km (float): Maximum great circle distance (km), included.
+        chunk_size (int): Number of airports processed per chunk. Default to 5_000.
+
+    Returns:
+        pl.DataFrame: APT_CODE, NEIGHBOUR_APT_CODE and NEIGHBOUR_DIST_KM, both directions, no airport with itself.
+    """
+    df = _select_airports(df_airports.lazy().collect(), None)
+    chunks = list(_pairs_within_band(df, df, 0, max_dist_km, chunk_size))
+    if not chunks:
+        return pl.DataFrame(schema={'APT_CODE': pl.Utf8, 'NEIGHBOUR_APT_CODE': pl.Utf8, 'NEIGHBOUR_DIST_KM': pl.Float64})
+
+    return pl.concat(chunks).rename({'APT_CODE_A': 'APT_CODE', 'APT_CODE_B': 'NEIGHBOUR_APT_CODE', 'DIST_GC_KM': 'NEIGHBOUR_DIST_KM'})
+
+
+def catchment_cols(radii_km: list[int] = CATCHMENT_RADII_KM, size: str = CATCHMENT_SIZE) -> list[str]:
+    """
+    Names of the `airport_catchment` columns: NB_APT, NB_SERVED_APT and size of the neighbours, for every radius.
+    """
+    return [col for r in radii_km for col in (f'NB_APT_{r}KM', f'NB_SERVED_APT_{r}KM', f'{size}_{r}KM')]
+
+
+def airport_traffic(df_scheduled: pl.DataFrame | pl.LazyFrame, size: str = CATCHMENT_SIZE) -> pl.LazyFrame:
+    """
+    Yearly traffic of every airport of the dataset, departures + arrivals.
+    """
+    df_scheduled = df_scheduled.lazy()
+    return (
+        pl.concat([
+            df_scheduled.select('YEAR', APT_CODE = d.APT_CODE_A, SIZE = pl.col(size)),
+            df_scheduled.select('YEAR', APT_CODE = d.APT_CODE_B, SIZE = pl.col(size)),
+        ])
+        .group_by('YEAR', 'APT_CODE')
+        .agg(d.SIZE.sum())
+    )
+
+
+def airport_catchment(
+    df_airports: pl.DataFrame | pl.LazyFrame,
+    df_scheduled: pl.DataFrame | pl.LazyFrame,
+    radii_km: list[int] = CATCHMENT_RADII_KM,
+    size: str = CATCHMENT_SIZE,
+    df_neighbours: pl.DataFrame = None
+) -> pl.DataFrame:
+    """
+    Local competition around every airport and year: number and size of the other airports within each radius.
+
+    The neighbours are queried once in the KD-tree for the largest radius, then joined to the yearly traffic,
+    and all the radii are aggregated in the same group_by (no loop on the airports, the years or the radii).
+    An airport is "served" in a year when it has traffic in the dataset (e.g. transatlantic routes).
+
+    Parameters:
+        df_airports (pl.DataFrame | pl.LazyFrame): Airports with APT_CODE, LATITUDE and LONGITUDE (e.g. df_airports_metrics_modif).
+        df_scheduled (pl.DataFrame | pl.LazyFrame): Enhanced dataset.
+        radii_km (list[int]): Catchment radii (km). Default to [50, 100, 200].
+        size (str): Traffic column measuring the size of an airport, SEATS or FLT. Default to 'SEATS'.
+        df_neighbours (pl.DataFrame): Output of `airport_neighbours` for a radius >= max(radii_km), to reuse it. Default to None.
+
+    Returns:
+        pl.DataFrame: YEAR, APT_CODE and `catchment_cols(radii_km, size)` for every airport with coordinates and every
+                      year of the dataset (0 when no neighbour).
+
+    Example:
+        >>> df_catchment = airport_catchment(df_airports_metrics, df_scheduled, radii_km=[25, 75])
+        >>> df_catchment.filter(d.APT_CODE == 'JFK')
+    """
+    if df_neighbours is None:
+        df_neighbours = airport_neighbours(df_airports, max(radii_km))
+
+    df_traffic = airport_traffic(df_scheduled, size)
+    df_keys = (
+        _select_airports(df_airports.lazy().collect(), None).lazy().select('APT_CODE')
+        .join(df_traffic.select('YEAR').unique(), how='cross')
+    )
+    cols = catchment_cols(radii_km, size)
+
+    df_catchment = (
+        df_keys
+        .join(df_neighbours.lazy(), on='APT_CODE', how='inner')
+        .join(df_traffic.rename({'APT_CODE': 'NEIGHBOUR_APT_CODE'}), on=['YEAR', 'NEIGHBOUR_APT_CODE'], how='left')
+        .group_by('YEAR', 'APT_CODE')
+        .agg([
+            agg
+            for r in radii_km
+            for agg in (
+                (d.NEIGHBOUR_DIST_KM <= r).sum().alias(f'NB_APT_{r}KM'),
+                ((d.NEIGHBOUR_DIST_KM <= r) & d.SIZE.is_not_null()).sum().alias(f'NB_SERVED_APT_{r}KM'),
+                d.SIZE.filter(d.NEIGHBOUR_DIST_KM <= r).sum().alias(f'{size}_{r}KM'),
+            )
+        ])
+    )
+
+    return (
+        df_keys
+        .join(df_catchment, on=['YEAR', 'APT_CODE'], how='left')
+        .with_columns(pl.col(cols).fill_null(0))
+        .with_columns(pl.col('^NB_.*KM$').cast(pl.UInt32))
+        .select('YEAR', 'APT_CODE', *cols)
+        .sort('YEAR', 'APT_CODE')
+        .collect()
+    )
+
+
+def _competing_airports(df_routes: pl.LazyFrame, df_neighbours: pl.DataFrame, end: str, radii_km: list[int]) -> pl.LazyFrame:
+    """
+    For every (YEAR, APT_CODE_A, APT_CODE_B), the nearest neighbour of the `end` airport that operates the route
+    with the other end, and the number of such airports within each radius.
+
+    Built from the operated routes (a few thousands per year) joined to the neighbours of their `end` airport,
+    so the candidate pairs never need to be crossed with the neighbours.
+    """
+    other = 'B' if end == 'A' else 'A'
+    return (
+        df_routes
+        .rename({f'APT_CODE_{end}': 'NEIGHBOUR_APT_CODE'})
+        .join(df_neighbours.lazy().rename({'APT_CODE': f'APT_CODE_{end}'}), on='NEIGHBOUR_APT_CODE', how='inner')
+        .group_by('YEAR', f'APT_CODE_{end}', f'APT_CODE_{other}')
+        .agg(
+            d.NEIGHBOUR_APT_CODE.sort_by('NEIGHBOUR_DIST_KM').first().alias(f'COMP_APT_CODE_{end}'),
+            d.NEIGHBOUR_DIST_KM.min().alias(f'COMP_DIST_KM_{end}'),
+            *[(d.NEIGHBOUR_DIST_KM <= r).sum().cast(pl.UInt32).alias(f'NB_COMP_APT_{r}KM_{end}') for r in radii_km],
+        )
+    )
+
+
+def pair_catchment_features(
+    df_pairs: pl.DataFrame | pl.LazyFrame,
+    df_airports: pl.DataFrame | pl.LazyFrame,
+    df_scheduled: pl.DataFrame | pl.LazyFrame,
+    radii_km: list[int] = CATCHMENT_RADII_KM,
+    years: list[int] = None,
+    size: str = CATCHMENT_SIZE
+) -> pl.DataFrame:
+    """
+    Catchment and competing airport features of both ends of every pair (e.g. the 283k EU <-> NA pairs of
+    df_route_combinaison_enhanced) for some years.
+
+    For the A end: the `airport_catchment` columns of A, and the nearest other airport within max(radii_km) of A
+    that already operates the route to B this year (COMP_APT_CODE_A, COMP_DIST_KM_A), with the number of such
+    airports within each radius (NB_COMP_APT_{r}KM_A), e.g. a London-area pair when LHR already flies to B.
+    Same for the B end with the airports around B flying from A. The KD-tree is queried once for all the radii and years.
+
+    Parameters:
+        df_pairs (pl.DataFrame | pl.LazyFrame): Pairs with APT_CODE_A and APT_CODE_B.
+        df_airports (pl.DataFrame | pl.LazyFrame): Airports with APT_CODE, LATITUDE and LONGITUDE (e.g. df_airports_metrics_modif).
+        df_scheduled (pl.DataFrame | pl.LazyFrame): Enhanced dataset.
+        radii_km (list[int]): Catchment radii (km), the largest one bounds the competing airports. Default to [50, 100, 200].
+        years (list[int]): Years of the features. Default to None (last year of the dataset only, 283k rows per year).
+        size (str): Traffic column measuring the size of an airport, SEATS or FLT. Default to 'SEATS'.
+
+    Returns:
+        pl.DataFrame: YEAR, APT_CODE_A, APT_CODE_B, the catchment columns with _A and _B (null for the airports without
+                      coordinates), COMP_APT_CODE and COMP_DIST_KM with _A and _B (null when no competing airport)
+                      and the NB_COMP_APT columns with _A and _B.
+
+    Example:
+        >>> df_catchment = pair_catchment_features(df_route_combinaison_enhanced, df_airports_metrics, df_scheduled, radii_km=[50, 150])
+        >>> df_route_combinaison_enhanced.join(df_catchment, on=['APT_CODE_A', 'APT_CODE_B'], how='left')
+    """
+    df_scheduled = df_scheduled.lazy()
+    if years is None:
+        years = [df_scheduled.select(d.YEAR.max()).collect().item()]
+
+    df_neighbours = airport_neighbours(df_airports, max(radii_km))
+    df_catchment = airport_catchment(df_airports, df_scheduled.filter(d.YEAR.is_in(years)), radii_km, size, df_neighbours).lazy()
+    df_routes = df_scheduled.filter(d.YEAR.is_in(years)).select('YEAR', 'APT_CODE_A', 'APT_CODE_B').unique()
+
+    def suffixed(df, suffix):
+        return df.rename({col: f'{col}_{suffix}' for col in ['APT_CODE', *catchment_cols(radii_km, size)]})
+
+    nb_comp_cols = [f'NB_COMP_APT_{r}KM_{end}' for end in ['A', 'B'] for r in radii_km]
+    return (
+        df_pairs.lazy().select('APT_CODE_A', 'APT_CODE_B')
+        .join(pl.LazyFrame({'YEAR': years}, schema={'YEAR': df_scheduled.collect_schema()['YEAR']}), how='cross')
+        .join(suffixed(df_catchment, 'A'), on=['YEAR', 'APT_CODE_A'], how='left')
+        .join(suffixed(df_catchment, 'B'), on=['YEAR', 'APT_CODE_B'], how='left')
+        .join(_competing_airports(df_routes, df_neighbours, 'A', radii_km), on=['YEAR', 'APT_CODE_A', 'APT_CODE_B'], how='left')
+        .join(_competing_airports(df_routes, df_neighbours, 'B', radii_km), on=['YEAR', 'APT_CODE_A', 'APT_CODE_B'], how='left')
+        .with_columns(pl.col(nb_comp_cols).fill_null(0))
+        .select('YEAR', pl.exclude('YEAR'))
+        .collect()
+    )
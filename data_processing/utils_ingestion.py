@@ -0,0 +1,207 @@
+import os
+import glob
+import polars as pl
+from polars import col as d
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+#########################
+# CONFIGURATION
+#########################
+
+## Pattern of the yearly schedule files (the year is the 5th "_" separated token of the filename)
+SCHEDULE_FILE_PATTERN = 'schedules_processed_carrier_hours_*_incsmall_novia_allairports.csv'
+
+## Shared schema of the raw yearly schedule files (every year is cast to it)
+RAW_SCHEDULE_SCHEMA = {
+    'OriginAirport': pl.Utf8,
+    'DestinationAirport': pl.Utf8,
+    'TimeBin': pl.Utf8,
+    'Equip': pl.Utf8,
+    'Carrier': pl.Utf8,
+    'EquipSACode': pl.Int64,
+    'Departures': pl.Float64,
+    'Arrivals': pl.Float64,
+    'DepartureSeats': pl.Float64,
+    'ArrivalSeats': pl.Float64,
+    'DepartureFlightHours': pl.Float64,
+    'ArrivalFlightHours': pl.Float64,
+}
+
+## Renaming of the raw columns (same as in data_processing.ipynb)
+SCHEDULE_RENAME = {
+    'OriginAirport': 'APT_CODE_A',
+    'DestinationAirport': 'APT_CODE_B',
+    'TimeBin': 'TIME_BIN',
+    'Equip': 'AC_TYPE',
+    'Carrier': 'OPE_AL',
+    'EquipSACode': 'AIM_SIZE_CAT',
+    'Departures': 'FLT_DEP',
+    'Arrivals': 'FLT_ARR',
+    'DepartureSeats': 'SEATS_DEP',
+    'ArrivalSeats': 'SEATS_ARR',
+    'DepartureFlightHours': 'FLT_HOURS_DEP',
+    'ArrivalFlightHours': 'FLT_HOURS_ARR',
+}
+
+
+#########################
+# HELPER FUNCTIONS
+#########################
+
+def list_schedule_files(folder_path: str, pattern: str = SCHEDULE_FILE_PATTERN) -> dict[int, str]:
+    """
+    List the yearly schedule CSV files of a folder.
+
+    Parameters:
+        folder_path (str): Folder containing the yearly schedule CSV files.
+        pattern (str): Glob pattern of the files. Default to SCHEDULE_FILE_PATTERN.
+
+    Returns:
+        dict[int, str]: Mapping YEAR -> file path, sorted by year.
+    """
+    files = {}
+    for file_path in glob.glob(os.path.join(folder_path, pattern)):
+        filename = os.path.basename(file_path)
+        year = int(filename.split('_')[4])
+        files[year] = file_path
+
+    return dict(sorted(files.items()))
+
+
+def scan_schedule_file(file_path: str) -> pl.LazyFrame:
+    """
+    Lazily scan one yearly schedule CSV and align it on RAW_SCHEDULE_SCHEMA.
+
+    Column drift between years is fixed automatically: extra columns (e.g. `EquipATIBin`
+    in 2019) are dropped and missing columns are added as nulls, so every year ends with
+    the same columns, in the same order and with the same dtypes.
+
+    Parameters:
+        file_path (str): Path of the yearly schedule CSV.
+
+    Returns:
+        pl.LazyFrame: Lazy frame with the renamed columns of SCHEDULE_RENAME.
+    """
+    ## only the header is read here, the file itself stays lazy
+    file_columns = pl.scan_csv(file_path, infer_schema_length=0).collect_schema().names()
+
+    lf = pl.scan_csv(
+        file_path,
+        schema_overrides={col: dtype for col, dtype in RAW_SCHEDULE_SCHEMA.items() if col in file_columns},
+    )
+
+    return lf.select([
+        (d(col) if col in file_columns else pl.lit(None)).cast(dtype).alias(SCHEDULE_RENAME[col])
+        for col, dtype in RAW_SCHEDULE_SCHEMA.items()
+    ])
+
+
+def partition_path(store_path: str, year: int) -> str:
+    """
+    Path of the parquet file holding one YEAR partition of the schedule store.
+    """
+    return os.path.join(store_path, f'YEAR={year}', '0.parquet')
+
+
+def convert_schedule_file(file_path: str, year: int, store_path: str) -> str:
+    """
+    Stream one yearly schedule CSV into its YEAR partition of the parquet store.
+
+    The conversion uses the streaming engine (`sink_parquet`), so the raw CSV is never
+    fully loaded in memory.
+
+    Parameters:
+        file_path (str): Path of the yearly schedule CSV.
+        year (int): Year of the file (written as the hive partition, not as a column).
+        store_path (str): Root folder of the parquet store.
+
+    Returns:
+        str: Path of the written parquet file.
+    """
+    output_path = partition_path(store_path, year)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+    ## write in a temporary file first so that an interrupted run never leaves a half-written partition
+    tmp_path = output_path + '.tmp'
+    scan_schedule_file(file_path).sink_parquet(tmp_path)
+    os.replace(tmp_path, output_path)
+
+    return output_path
+
+
+#########################
+# MAIN FUNCTIONS
+#########################
+
+def build_schedule_store(
+    folder_path: str,
+    store_path: str,
+    years: list[int] = None,
+    max_workers: int = None,
+    overwrite: bool = False
+) -> list[int]:
+    """
+    Convert the yearly schedule CSVs into a hive-partitioned (by YEAR) parquet store.
+
+    Files are converted in parallel. Threads are enough here: Polars releases the GIL
+    while scanning/writing, so each conversion runs on its own core(s).
+    Years already present in the store are skipped unless `overwrite` is True.
+
+    Parameters:
+        folder_path (str): Folder containing the yearly schedule CSV files.
+        store_path (str): Root folder of the parquet store (created if needed).
+        years (list[int]): Years to convert. Default to None (all years found).
+        max_workers (int): Number of files converted at the same time. Default to None (os.cpu_count()).
+        overwrite (bool): If True, rewrite the partitions already in the store. Default to False.
+
+    Returns:
+        list[int]: Sorted list of the years converted during this call.
+
+    Example:
+        >>> build_schedule_store(folder_path, 'schedules_store')
+        >>> df = scan_schedule_store('schedules_store', years=[2018, 2019]).collect()
+    """
+    files = list_schedule_files(folder_path)
+    if years is not None:
+        files = {year: path for year, path in files.items() if year in years}
+
+    if not overwrite:
+        files = {year: path for year, path in files.items() if not os.path.exists(partition_path(store_path, year))}
+
+    converted = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(convert_schedule_file, path, year, store_path): year for year, path in files.items()}
+        for future in as_completed(futures):
+            future.result()
+            converted.append(futures[future])
+            print(f"{futures[future]} converted")
+
+    return sorted(converted)
+
+
+def scan_schedule_store(store_path: str, years: list[int] = None) -> pl.LazyFrame:
+    """
+    Lazily scan the parquet schedule store.
+
+    Filtering on YEAR is pushed down to the hive partitions, so only the files of the
+    requested years are read.
+
+    Parameters:
+        store_path (str): Root folder of the parquet store.
+        years (list[int]): Years to read. Default to None (all years).
+
+    Returns:
+        pl.LazyFrame: Lazy frame with YEAR followed by the renamed schedule columns
+                      (same layout as `schedules_final_df` in data_processing.ipynb).
+    """
+    lf = pl.scan_parquet(
+        os.path.join(store_path, '**', '*.parquet'),
+        hive_partitioning=True,
+        hive_schema={'YEAR': pl.Int32},
+    )
+
+    if years is not None:
+        lf = lf.filter(d.YEAR.is_in(years))
+
+    return lf.select(['YEAR', *SCHEDULE_RENAME.values()])
@@ -0,0 +1,473 @@
+import os
+import polars as pl
+from polars import col as d
+
+from utils_routes import airport_dictionary, dataset_airport_dictionary, check_airport_dictionary, add_route_ids
+from utils_profiling import stage, checkpoint
+
+
+#########################
+# CONFIGURATION
+#########################
+
+## Key of a directional route
+PAIR_COLS = ['APT_CODE_A', 'APT_CODE_B']
+
+## Census window of the schedule data (first and last year available)
+FIRST_CENSUS_YEAR = 2000
+LAST_CENSUS_YEAR = 2023
+
+## Last year before covid (used for the "without covid" variant)
+LAST_YEAR_WO_COVID = 2019
+
+## REGION_ID of North America and Europe
+REGION_ID_US = 10
+REGION_ID_EUR = 13
+
+## Columns computed by add_lifecycle_columns (they depend on the whole history of a route)
+LIFECYCLE_COLS = [
+    'NB_EXISTING_YEAR', 'FIRST_EXISTING_YEAR', 'LAST_EXISTING_YEAR',
+    'IS_OPENING', 'IS_END', 'IS_REOPENING', 'IS_PAUSE',
+    'RUN_ID', 'CONSEC_YEAR_OPEN_DURATION', 'TOTAL_BREAKS', 'DURATION_FIRST_OPENING',
+    'NB_OPENING_RTE', 'NB_SHORT_OPENING_RTE', 'NB_LONG_OPENING_RTE', 'NB_ENDING_RTE', 'NB_REOPENING_RTE', 'NB_PAUSE_RTE',
+]
+
+## Format of the TIME_BIN of the raw schedules (one bin per month)
+TIME_BIN_FORMAT = '%Y-%m'
+
+## Bit of each month in MONTH_MASK (bit 0 = January), and masks of the IATA summer (April-October) and winter seasons
+MONTH_MASK_DTYPE = pl.UInt16
+MONTH_BITS = {month: 1 << (month - 1) for month in range(1, 13)}
+SUMMER_MASK = sum(MONTH_BITS[month] for month in range(4, 11))
+WINTER_MASK = sum(MONTH_BITS.values()) - SUMMER_MASK
+
+## Columns computed by month_patterns (they only depend on the schedules of the year)
+MONTH_PATTERN_COLS = ['MONTH_MASK', 'NB_MONTHS_OPERATED', 'FIRST_MONTH', 'LAST_MONTH', 'SEASON_TYPE', 'IS_SEASONAL']
+
+
+#########################
+# PIPELINE STEPS
+#########################
+
+def aggregate_schedules(schedules: pl.LazyFrame | pl.DataFrame, df_airports_metrics: pl.DataFrame, by: list[str] = []) -> pl.LazyFrame:
+    """
+    Aggregate the raw schedules to one row per YEAR and directional airport pair, and add the REGION_ID of both ends.
+
+    The carriers of a pair are not kept as a list column: they are in the carrier x route x year table of utils_carriers.
+
+    Parameters:
+        schedules (pl.LazyFrame | pl.DataFrame): Renamed schedules (e.g. `scan_schedule_store(...)` or `schedules_final_df`).
+        df_airports_metrics (pl.DataFrame): Airport metrics with APT_CODE and REGION_ID columns.
+        by (list[str]): Extra grouping columns (e.g. ['OPE_AL']). Default to [].
+
+    Returns:
+        pl.LazyFrame: YEAR x `by` x APT_CODE_A x APT_CODE_B rows with FLT, SEATS, FLT_HOURS (+ _ARR), NB_OPE_AL, REGION_ID_A/B.
+    """
+    df_region = df_airports_metrics.lazy().select('APT_CODE', 'REGION_ID').unique()
+
+    return (
+        schedules.lazy()
+
+        .filter(d.APT_CODE_A != d.APT_CODE_B) ## filter out when the airport A and airport B are the same
+
+        .group_by(['YEAR', *by, *PAIR_COLS])
+        .agg(d.FLT_DEP.sum().alias('FLT'), d.FLT_ARR.sum(), d.SEATS_DEP.sum().alias('SEATS'), d.SEATS_ARR.sum(), d.FLT_HOURS_DEP.sum().alias('FLT_HOURS'), d.FLT_HOURS_ARR.sum(), d.OPE_AL.unique().count().alias('NB_OPE_AL'))
+
+        ## add the REGION ID
+        .join(df_region.rename({'APT_CODE':'APT_CODE_A', 'REGION_ID':'REGION_ID_A'}), how = 'left', on = ['APT_CODE_A'])
+        .join(df_region.rename({'APT_CODE':'APT_CODE_B', 'REGION_ID':'REGION_ID_B'}), how = 'left', on = ['APT_CODE_B'])
+    )
+
+
+def add_lifecycle_columns(
+    df: pl.LazyFrame | pl.DataFrame,
+    first_year: int = FIRST_CENSUS_YEAR,
+    last_year: int = LAST_CENSUS_YEAR,
+    pair_cols: list[str] = PAIR_COLS,
+    end_year: int = None
+) -> pl.LazyFrame:
+    """
+    Tag the lifecycle of every route (opening, end, reopening, pause, consecutive runs) with native window expressions.
+
+    The rows are sorted by (pair, YEAR) once, then every tag is derived from the previous/next
+    existing year of the same pair, so there is no Python call per row (it replaces the
+    `consecutive_sequences` / `find_sequence_length` helpers of data_processing.ipynb).
+
+    A run is a sequence of consecutive existing years of a route. For the year 2005 of a route
+    existing in [2003, 2004, 2005, 2008, 2009]: RUN_ID = 0, CONSEC_YEAR_OPEN_DURATION = 3,
+    TOTAL_BREAKS = 1 and DURATION_FIRST_OPENING = 3.
+
+    Parameters:
+        df (pl.LazyFrame | pl.DataFrame): One row per YEAR and pair (e.g. output of `aggregate_schedules`).
+        first_year (int): First year of the census, a route existing this year is not an opening. Default to 2000.
+        last_year (int): Last year of the rows kept. Default to 2023.
+        pair_cols (list[str]): Columns identifying a route. Default to ['APT_CODE_A', 'APT_CODE_B'].
+        end_year (int): A route existing this year is not an end. Default to None (`last_year`). As in
+                        data_processing.ipynb, the wo_covid dataset keeps the end of the full census (2023),
+                        so its routes operated in 2019 are tagged IS_END.
+
+    Returns:
+        pl.LazyFrame: Input rows within [first_year, last_year] with the columns
+                      NB_EXISTING_YEAR, FIRST_EXISTING_YEAR, LAST_EXISTING_YEAR,
+                      IS_OPENING, IS_END, IS_REOPENING, IS_PAUSE,
+                      RUN_ID, CONSEC_YEAR_OPEN_DURATION, TOTAL_BREAKS, DURATION_FIRST_OPENING,
+                      NB_OPENING_RTE, NB_SHORT_OPENING_RTE, NB_LONG_OPENING_RTE, NB_ENDING_RTE, NB_REOPENING_RTE, NB_PAUSE_RTE.
+    """
+    if end_year is None:
+        end_year = last_year
+
+    prev_year = d.YEAR.shift(1).over(pair_cols)
+    next_year = d.YEAR.shift(-1).over(pair_cols)
+
+    return (
+        df.lazy()
+        .filter(d.YEAR.is_between(first_year, last_year))
+        .sort([*pair_cols, 'YEAR'])
+
+        ## existing years of the pair and gap with the previous/next existing year
+        .with_columns(
+            NB_EXISTING_YEAR = d.YEAR.count().over(pair_cols).cast(pl.UInt32),
+            FIRST_EXISTING_YEAR = d.YEAR.min().over(pair_cols),
+            LAST_EXISTING_YEAR = d.YEAR.max().over(pair_cols),
+            GAP_PREV = (d.YEAR - prev_year),
+            GAP_NEXT = (next_year - d.YEAR),
+        )
+
+        ## add tag to know when the route open, end, reopen, break
+        .with_columns(
+            IS_OPENING = (d.FIRST_EXISTING_YEAR == d.YEAR) & (d.YEAR != first_year),
+            IS_END = (d.LAST_EXISTING_YEAR == d.YEAR) & (d.YEAR != end_year),
+            IS_REOPENING = d.GAP_PREV.fill_null(1) > 1,
+            IS_PAUSE = d.GAP_NEXT.fill_null(1) > 1,
+            ## a new run starts on the first existing year and after each gap
+            RUN_ID = (d.GAP_PREV.fill_null(2) > 1).cast(pl.Int32).cum_sum().over(pair_cols) - 1,
+        )
+
+        ## length of the current run, number of breaks and length of the first run
+        .with_columns(
+            CONSEC_YEAR_OPEN_DURATION = d.YEAR.count().over([*pair_cols, 'RUN_ID']).cast(pl.Int32),
+            TOTAL_BREAKS = d.RUN_ID.max().over(pair_cols).cast(pl.UInt32),
+            DURATION_FIRST_OPENING = (d.RUN_ID == 0).sum().over(pair_cols).cast(pl.Int32),
+        )
+
+        ## add columns of 1 to sum when grouping in the future
+        .with_columns(
+            NB_OPENING_RTE = d.IS_OPENING.cast(pl.Int32),
+            NB_SHORT_OPENING_RTE = (d.IS_OPENING & (d.DURATION_FIRST_OPENING <= 3)).cast(pl.Int32),
+            NB_LONG_OPENING_RTE = (d.IS_OPENING & (d.DURATION_FIRST_OPENING > 3)).cast(pl.Int32),
+            NB_ENDING_RTE = d.IS_END.cast(pl.Int32),
+            NB_REOPENING_RTE = d.IS_REOPENING.cast(pl.Int32),
+            NB_PAUSE_RTE = d.IS_PAUSE.cast(pl.Int32),
+        )
+        .drop('GAP_PREV', 'GAP_NEXT')
+    )
+
+
+def add_market_columns(df: pl.LazyFrame | pl.DataFrame) -> pl.LazyFrame:
+    """
+    Keep the transatlantic market (North America / Europe) and tag the MKT_TYPE and DIRECTION of every route.
+
+    Parameters:
+        df (pl.LazyFrame | pl.DataFrame): Rows with REGION_ID_A and REGION_ID_B columns.
+
+    Returns:
+        pl.LazyFrame: Filtered rows with MKT_TYPE (INTRA_US, INTRA_EUR, INTER) and DIRECTION (US_to_EUR, EUR_to_US or MKT_TYPE).
+    """
+    return (
+        df.lazy()
+        .filter(d.REGION_ID_A.is_in([REGION_ID_US, REGION_ID_EUR]))
+        .filter(d.REGION_ID_B.is_in([REGION_ID_US, REGION_ID_EUR]))
+
+        ## add tag for futur plot
+        .with_columns(MKT_TYPE = pl.when((d.REGION_ID_A == d.REGION_ID_B) & (d.REGION_ID_A == REGION_ID_US))
+                                   .then(pl.lit('INTRA_US'))
+                                   .when((d.REGION_ID_A == d.REGION_ID_B) & (d.REGION_ID_A == REGION_ID_EUR))
+                                   .then(pl.lit('INTRA_EUR'))
+                                   .otherwise(pl.lit('INTER'))
+        )
+
+        ## the direction (to be more precise on the INTER)
+        .with_columns(DIRECTION = pl.when((d.REGION_ID_A == REGION_ID_US) & (d.REGION_ID_B == REGION_ID_EUR))
+                                    .then(pl.lit('US_to_EUR'))
+                                    .when((d.REGION_ID_A == REGION_ID_EUR) & (d.REGION_ID_B == REGION_ID_US))
+                                    .then(pl.lit('EUR_to_US'))
+                                    .otherwise(d.MKT_TYPE)
+        )
+    )
+
+
+#########################
+# SUB-ANNUAL PATTERNS
+#########################
+
+def month_patterns(schedules: pl.LazyFrame | pl.DataFrame, time_bin_format: str = TIME_BIN_FORMAT) -> pl.DataFrame:
+    """
+    Months operated by every route and year, from the TIME_BIN of the raw schedules.
+
+    A route exists a YEAR in the enhanced dataset as soon as it has one schedule row, so a summer-only
+    service looks like a year-round one. The months are kept as a UInt16 bitmask (bit 0 = January):
+    `MONTH_MASK & MONTH_BITS[7] > 0` is "operated in July", `MONTH_MASK & WINTER_MASK == 0` is "only in summer".
+
+    The schedules are first reduced to one row per YEAR, pair and month with the streaming engine, so the
+    raw rows of all the years never have to be in memory at once (the output is at most 12 rows per route and year).
+
+    SEASON_TYPE is YEAR_ROUND (12 months), SUMMER (only April-October), WINTER (only November-March) or PARTIAL.
+    The opening and ending years of a route are often SUMMER/WINTER/PARTIAL only because they are incomplete.
+
+    Parameters:
+        schedules (pl.LazyFrame | pl.DataFrame): Renamed schedules with a TIME_BIN column (e.g. `scan_schedule_store(...)`).
+        time_bin_format (str): Format of TIME_BIN. Default to '%Y-%m'. A ValueError is raised if a non-null TIME_BIN is
+                               not in this format (the rows with a null TIME_BIN are ignored).
+
+    Returns:
+        pl.DataFrame: YEAR, APT_CODE_A, APT_CODE_B and MONTH_PATTERN_COLS (MONTH_MASK, NB_MONTHS_OPERATED,
+                      FIRST_MONTH, LAST_MONTH, SEASON_TYPE, IS_SEASONAL).
+
+    Example:
+        >>> df_months = month_patterns(scan_schedule_store(store_path))
+        >>> df_months.filter(d.MONTH_MASK & MONTH_BITS[1] > 0)   ## routes operated in January
+    """
+    month = pl.concat_str(d.TIME_BIN, pl.lit('-01')).str.to_date(time_bin_format + '-%d', strict=False).dt.month()
+
+    df_months = (
+        schedules.lazy()
+        .filter(d.APT_CODE_A != d.APT_CODE_B)
+        .select('YEAR', *PAIR_COLS, MONTH = month, TIME_BIN_ERROR = pl.when(month.is_null()).then(d.TIME_BIN))
+        .unique()
+        .collect(engine='streaming')
+    )
+
+    ## a wrong format would silently give no month at all
+    errors = df_months['TIME_BIN_ERROR'].drop_nulls().unique()
+    if errors.len():
+        raise ValueError(f"{errors.len()} TIME_BIN values do not match the format {time_bin_format!r}, e.g. {errors.sort().head(3).to_list()}")
+    df_months = df_months.drop_nulls('MONTH').drop('TIME_BIN_ERROR')
+
+    return (
+        df_months.lazy()
+        .group_by(['YEAR', *PAIR_COLS])
+        .agg(MONTH_MASK = d.MONTH.replace_strict(MONTH_BITS, return_dtype=MONTH_MASK_DTYPE).sum().cast(MONTH_MASK_DTYPE),
+             NB_MONTHS_OPERATED = pl.len().cast(pl.UInt8),
+             FIRST_MONTH = d.MONTH.min().cast(pl.UInt8),
+             LAST_MONTH = d.MONTH.max().cast(pl.UInt8))
+        .with_columns(SEASON_TYPE = pl.when(d.NB_MONTHS_OPERATED == 12).then(pl.lit('YEAR_ROUND'))
+                                      .when(d.MONTH_MASK & WINTER_MASK == 0).then(pl.lit('SUMMER'))
+                                      .when(d.MONTH_MASK & SUMMER_MASK == 0).then(pl.lit('WINTER'))
+                                      .otherwise(pl.lit('PARTIAL')))
+        .with_columns(IS_SEASONAL = d.SEASON_TYPE.is_in(['SUMMER', 'WINTER']))
+        .sort(['YEAR', *PAIR_COLS])
+        .collect()
+    )
+
+
+def add_month_patterns(df: pl.LazyFrame | pl.DataFrame, df_months: pl.DataFrame) -> pl.LazyFrame:
+    """
+    Add the MONTH_PATTERN_COLS of `month_patterns` to yearly rows (e.g. an existing enhanced dataset).
+
+    Returns:
+        pl.LazyFrame: Input rows with MONTH_PATTERN_COLS (null when the TIME_BIN of the year could not be read).
+    """
+    return df.lazy().join(df_months.lazy(), how = 'left', on = ['YEAR', *PAIR_COLS])
+
+
+#########################
+# MAIN FUNCTION
+#########################
+
+def build_enhanced_datasets(
+    schedules: pl.LazyFrame | pl.DataFrame,
+    df_airports_metrics: pl.DataFrame,
+    census_windows: dict[str, tuple[int, int]] = None,
+    time_bins: bool = False,
+    census_end: int = None,
+    df_apt_dict: pl.DataFrame = None
+) -> dict[str, pl.DataFrame]:
+    """
+    Build the enhanced transatlantic schedule datasets for several census windows from one code path.
+
+    The yearly aggregation, the market filter and the integer route keys (APT_IDX_A/B, DIR_RTE_ID,
+    UNDIR_RTE_ID, see utils_routes) are computed once, then the lifecycle tagging is applied for each
+    census window (e.g. with and without covid years).
+
+    With `time_bins`, the months operated by every route and year are added (MONTH_PATTERN_COLS, see `month_patterns`).
+
+    Parameters:
+        schedules (pl.LazyFrame | pl.DataFrame): Renamed schedules (e.g. `scan_schedule_store(...)`).
+        df_airports_metrics (pl.DataFrame): Airport metrics with APT_CODE and REGION_ID columns.
+        census_windows (dict[str, tuple[int, int]]): Name -> (first_year, last_year) of each dataset.
+                       Default to None: {'full': (2000, 2023), 'wo_covid': (2000, 2019)}.
+        time_bins (bool): If True, add the sub-annual MONTH_PATTERN_COLS. Default to False.
+        census_end (int): Year without IS_END in every dataset. Default to None (last year of the widest window,
+                          2023 for the default windows: the wo_covid dataset tags its 2019 routes IS_END, as in
+                          data_processing.ipynb).
+        df_apt_dict (pl.DataFrame): Persisted airport dictionary of the route ids, extended with the new airports
+                                    (see utils_routes.airport_dictionary). Default to None (new dictionary).
+
+    Returns:
+        dict[str, pl.DataFrame]: Name -> enhanced dataset.
+
+    Example:
+        >>> dfs = build_enhanced_datasets(scan_schedule_store(store_path), df_airports_metrics_modif)
+        >>> dfs['full'].write_parquet("scheduled_dataset_transatlantic_enhanced.parquet")
+        >>> dfs['wo_covid'].write_parquet("scheduled_dataset_wo_covid_transatlantic_enhanced.parquet")
+    """
+    if census_windows is None:
+        census_windows = {
+            'full': (FIRST_CENSUS_YEAR, LAST_CENSUS_YEAR),
+            'wo_covid': (FIRST_CENSUS_YEAR, LAST_YEAR_WO_COVID),
+        }
+    if census_end is None:
+        census_end = max(last_year for _, last_year in census_windows.values())
+
+    ## shared part, materialized once for all the census windows
+    with stage('yearly aggregation') as s:
+        df_yearly = s.done(
+            aggregate_schedules(schedules, df_airports_metrics)
+            .pipe(checkpoint, 'aggregate_schedules')
+            .pipe(add_market_columns)
+            .pipe(checkpoint, 'add_market_columns')
+            .pipe(add_route_ids, airport_dictionary(df_airports_metrics, df_apt_dict=df_apt_dict))
+            .collect()
+        )
+    if time_bins:
+        with stage('month patterns', df_yearly) as s:
+            df_yearly = s.done(add_month_patterns(df_yearly, month_patterns(schedules)).collect())
+
+    ## the lifecycle windows run on one integer key (same tags as on the pair of codes)
+    names = list(census_windows)
+    with stage('lifecycle', df_yearly) as s:
+        dfs = pl.collect_all([
+            add_lifecycle_columns(df_yearly, first_year, last_year, pair_cols=['DIR_RTE_ID'], end_year=census_end)
+            for first_year, last_year in census_windows.values()
+        ])
+        s.done(dfs) ## every census window
+
+    return dict(zip(names, dfs))
+
+
+def update_enhanced_dataset(
+    df_enhanced: pl.DataFrame,
+    new_schedules: pl.LazyFrame | pl.DataFrame,
+    df_airports_metrics: pl.DataFrame,
+    first_year: int = FIRST_CENSUS_YEAR,
+    df_apt_dict: pl.DataFrame = None
+) -> pl.DataFrame:
+    """
+    Add one new year of schedules to an enhanced dataset without rebuilding every year.
+
+    When the census is extended from `last_year` to `last_year + 1`, the lifecycle columns can only change for:
+        - the routes operated in the new year (their LAST_EXISTING_YEAR, NB_EXISTING_YEAR, runs, and the
+          IS_END/IS_PAUSE of their previous last year all move),
+        - the routes operated in the previous last year (IS_END was masked because it was the census end).
+    Every other route has all its years strictly before the previous last year and not in the new year, so
+    its whole history, and then all its lifecycle columns, are unchanged. Only the routes of these two sets
+    are re-tagged (with their full history), the others are kept as they are. The result is equal, row for
+    row and in the same order, to `build_enhanced_datasets` run over all the years with the same dictionary.
+
+    The route ids of the new year use the airport dictionary of the dataset, extended with the new airports
+    after the existing ids, so the ids of the years already in the dataset never change.
+
+    The MONTH_PATTERN_COLS (if the dataset has them) only depend on the schedules of their year, so they are
+    only computed for the new year.
+
+    Parameters:
+        df_enhanced (pl.DataFrame): Existing enhanced dataset (e.g. scheduled_dataset_transatlantic_enhanced.parquet).
+        new_schedules (pl.LazyFrame | pl.DataFrame): Renamed schedules of the new year only, with a YEAR column.
+        df_airports_metrics (pl.DataFrame): Airport metrics with APT_CODE and REGION_ID columns.
+        first_year (int): First year of the census. Default to 2000.
+        df_apt_dict (pl.DataFrame): Persisted airport dictionary of the dataset (df_airport_dictionary.parquet).
+                                    Default to None (recovered from the route ids of `df_enhanced`).
+
+    Returns:
+        pl.DataFrame: Enhanced dataset including the new year.
+
+    Example:
+        >>> df_enhanced = pl.read_parquet("scheduled_dataset_transatlantic_enhanced.parquet")
+        >>> df_new = update_enhanced_dataset(df_enhanced, scan_schedule_store(store_path, years=[2024]), df_airports_metrics_modif)
+    """
+    old_last_year = df_enhanced['YEAR'].max()
+
+    ## ids of the dataset kept, new airports numbered after them (datasets built before the route ids have none)
+    has_ids = 'DIR_RTE_ID' in df_enhanced.columns
+    if df_apt_dict is None and has_ids:
+        df_apt_dict = dataset_airport_dictionary(df_enhanced)
+    elif has_ids:
+        check_airport_dictionary(df_apt_dict, df_enhanced)
+
+    df_new_year = add_route_ids(
+        add_market_columns(aggregate_schedules(new_schedules, df_airports_metrics)),
+        airport_dictionary(df_airports_metrics, df_apt_dict=df_apt_dict)
+    ).collect()
+    if 'MONTH_MASK' in df_enhanced.columns:
+        df_new_year = add_month_patterns(df_new_year, month_patterns(new_schedules)).collect()
+    new_years = df_new_year['YEAR'].unique().to_list()
+    if new_years != [old_last_year + 1]:
+        raise ValueError(f"new_schedules must only contain the year {old_last_year + 1}, got {sorted(new_years)}")
+
+    ## routes whose lifecycle columns can change
+    df_touched_pairs = pl.concat([
+        df_new_year.select(PAIR_COLS),
+        df_enhanced.filter(d.YEAR == old_last_year).select(PAIR_COLS),
+    ]).unique()
+
+    df_untouched = df_enhanced.join(df_touched_pairs, on=PAIR_COLS, how='anti')
+
+    df_retagged = add_lifecycle_columns(
+        pl.concat([
+            df_enhanced.join(df_touched_pairs, on=PAIR_COLS, how='semi').drop(LIFECYCLE_COLS),
+            df_new_year.select([col for col in df_enhanced.columns if col not in LIFECYCLE_COLS]),
+        ]),
+        first_year=first_year,
+        last_year=old_last_year + 1,
+    ).collect()
+
+    return (
+        pl.concat([df_untouched, df_retagged.select(df_enhanced.columns)])
+        .sort(['DIR_RTE_ID', 'YEAR'] if has_ids else [*PAIR_COLS, 'YEAR'])
+    )
+
+
+def update_enhanced_parquet(
+    enhanced_path: str,
+    schedule_file: str,
+    year: int,
+    df_airports_metrics: pl.DataFrame,
+    output_path: str = None,
+    first_year: int = FIRST_CENSUS_YEAR,
+    cube_path: str = None,
+    dict_path: str = None
+) -> pl.DataFrame:
+    """
+    Add one new yearly schedule CSV to an enhanced parquet file (see `update_enhanced_dataset`).
+
+    Parameters:
+        enhanced_path (str): Path of the existing enhanced parquet.
+        schedule_file (str): Path of the new yearly schedule CSV.
+        year (int): Year of the new schedule file.
+        df_airports_metrics (pl.DataFrame): Airport metrics with APT_CODE and REGION_ID columns.
+        output_path (str): Where to write the updated parquet. Default to None (overwrite `enhanced_path`).
+        first_year (int): First year of the census. Default to 2000.
+        cube_path (str): Where to write the aggregate cube of the updated dataset (see utils_cube). Default to None (no cube).
+        dict_path (str): Persisted airport dictionary (df_airport_dictionary.parquet), read if it exists and
+                         written back with the new airports. Default to None (dictionary of the dataset, not written).
+
+    Returns:
+        pl.DataFrame: Enhanced dataset including the new year.
+    """
+    from utils_ingestion import scan_schedule_file
+
+    new_schedules = scan_schedule_file(schedule_file).with_columns(YEAR = pl.lit(year, dtype=pl.Int32))
+    df_enhanced = pl.read_parquet(enhanced_path)
+    df_apt_dict = pl.read_parquet(dict_path) if dict_path is not None and os.path.exists(dict_path) else None
+    df_updated = update_enhanced_dataset(df_enhanced, new_schedules, df_airports_metrics, first_year=first_year, df_apt_dict=df_apt_dict)
+
+    df_updated.write_parquet(output_path or enhanced_path)
+    if dict_path is not None:
+        if df_apt_dict is None and 'DIR_RTE_ID' in df_enhanced.columns:
+            df_apt_dict = dataset_airport_dictionary(df_enhanced)
+        airport_dictionary(df_airports_metrics, df_apt_dict=df_apt_dict).write_parquet(dict_path)
+    if cube_path is not None:
+        from utils_cube import build_route_cube
+        build_route_cube(df_updated).write_parquet(cube_path)
+
+    return df_updated
@@ -0,0 +1,360 @@
+import numpy as np
+import polars as pl
+from polars import col as d
+import scipy.sparse as sp
+from typing import Iterator
+
+from utils_routes import airport_dictionary, add_route_ids
+
+
+#########################
+# CONFIGURATION
+#########################
+
+## Measures that can weight the edges of the network (columns of the enhanced dataset)
+NETWORK_WEIGHTS = ['SEATS', 'FLT']
+
+## Number of BFS sources sampled for the approximate betweenness (exact when >= the number of airports with a route)
+N_PIVOTS = 128
+
+## Sources solved together in one batch of sparse products (memory: n_airports x batch floats)
+PIVOT_BATCH = 64
+
+## Metrics of every airport and year (see `airport_network_metrics`)
+AIRPORT_NETWORK_COLS = ['OUT_DEGREE', 'IN_DEGREE', 'OUT_STRENGTH', 'IN_STRENGTH', 'BETWEENNESS']
+
+## Features of every pair and year (see `pair_network_features`), the airport metrics are added with _A and _B
+PAIR_NETWORK_COLS = ['IS_DIRECT', 'NB_ONE_STOP']
+
+
+#########################
+# YEARLY DIFFS
+#########################
+
+def _with_route_ids(df_scheduled: pl.DataFrame | pl.LazyFrame) -> pl.LazyFrame:
+    """Enhanced dataset with the airport ids (datasets built before the route ids get them from their own codes)."""
+    df_scheduled = df_scheduled.lazy()
+    if 'APT_IDX_A' not in df_scheduled.collect_schema().names():
+        df_apt = df_scheduled.select(APT_CODE = pl.concat_list('APT_CODE_A', 'APT_CODE_B')).explode('APT_CODE')
+        df_scheduled = add_route_ids(df_scheduled, airport_dictionary(df_apt))
+    return df_scheduled
+
+
+def yearly_edge_diffs(df_scheduled: pl.DataFrame | pl.LazyFrame, weight: str = 'SEATS', years: list[int] = None) -> pl.DataFrame:
+    """
+    Changes of the route network from one year to the next, in one pass on the enhanced dataset.
+
+    For every year, the edges (directional routes) that appear, disappear or change weight compared with the
+    previous year of `years` (the whole network for the first one). Applying the diffs in order rebuilds the
+    network of every year, and only the routes that changed are touched.
+
+    Parameters:
+        df_scheduled (pl.DataFrame | pl.LazyFrame): Enhanced dataset (one row per YEAR and directional route).
+        weight (str): Weight of the edges, SEATS or FLT. Default to 'SEATS'.
+        years (list[int]): Years of the network. Default to None (all the years of the dataset).
+
+    Returns:
+        pl.DataFrame: YEAR, APT_IDX_A, APT_IDX_B, DELTA_EDGE (+1 new route, -1 stopped route, 0 same route),
+                      DELTA_WEIGHT, sorted by YEAR.
+    """
+    if weight not in NETWORK_WEIGHTS:
+        raise ValueError(f"weight must be one of {NETWORK_WEIGHTS}, got {weight}")
+
+    df_edges = _with_route_ids(df_scheduled).select('YEAR', 'APT_IDX_A', 'APT_IDX_B', WEIGHT = d(weight).cast(pl.Float64))
+    if years is None:
+        years = df_edges.select(d.YEAR.unique().sort()).collect()['YEAR'].to_list()
+    years = sorted(years)
+
+    ## position of the year in `years`: the previous network of a year is the one of the previous position
+    df_edges = (
+        df_edges
+        .filter(d.YEAR.is_in(years))
+        .with_columns(STEP = d.YEAR.replace_strict({year: i for i, year in enumerate(years)}, return_dtype=pl.Int32))
+    )
+    df_prev = df_edges.select((d.STEP + 1).alias('STEP'), 'APT_IDX_A', 'APT_IDX_B', WEIGHT_PREV = d.WEIGHT)
+
+    return (
+        df_edges
+        .join(df_prev, how = 'full', on = ['STEP', 'APT_IDX_A', 'APT_IDX_B'], coalesce = True)
+        .filter(d.STEP < len(years))
+        .with_columns(YEAR = d.STEP.replace_strict(dict(enumerate(years)), return_dtype=pl.Int32),
+                      DELTA_EDGE = d.WEIGHT.is_not_null().cast(pl.Int32) - d.WEIGHT_PREV.is_not_null().cast(pl.Int32),
+                      DELTA_WEIGHT = d.WEIGHT.fill_null(0) - d.WEIGHT_PREV.fill_null(0))
+        .filter((d.DELTA_EDGE != 0) | (d.DELTA_WEIGHT != 0))
+        .select('YEAR', 'APT_IDX_A', 'APT_IDX_B', 'DELTA_EDGE', 'DELTA_WEIGHT')
+        .sort('YEAR', 'APT_IDX_A', 'APT_IDX_B')
+        .collect()
+    )
+
+
+#########################
+# NETWORK
+#########################
+
+def _sparse(rows: np.ndarray, cols: np.ndarray, values: np.ndarray, n: int, dtype) -> sp.csr_matrix:
+    return sp.csr_matrix((values.astype(dtype), (rows.astype(np.int64), cols.astype(np.int64))), shape=(n, n))
+
+
+class RouteNetwork:
+    """
+    Directed airport network of one year, advanced from year to year with the diffs of `yearly_edge_diffs`.
+
+    Keeps three n x n CSR matrices indexed by APT_IDX:
+        - weights: SEATS (or FLT) of every route A -> B,
+        - edges: 1 if the route A -> B is operated,
+        - one_stop: number of airports C with A -> C and C -> B operated (edges @ edges).
+    The one-stop matrix is updated with the change D of the edges only:
+    (E + D) @ (E + D) = E @ E + E @ D + D @ E + D @ D, which touches only the rows and columns of the changed routes.
+
+    Parameters:
+        n_airports (int): Number of airports (size of the airport dictionary).
+
+    Example:
+        >>> network = RouteNetwork(df_apt_dict.height)
+        >>> for year, df_diff in df_diffs.group_by('YEAR', maintain_order=True):
+        ...     network.apply_diff(df_diff)
+    """
+    def __init__(self, n_airports: int):
+        self.n = n_airports
+        self.weights = sp.csr_matrix((n_airports, n_airports), dtype=np.float64)
+        self.edges = sp.csr_matrix((n_airports, n_airports), dtype=np.int32)
+        self.one_stop = sp.csr_matrix((n_airports, n_airports), dtype=np.int32)
+
+    def apply_diff(self, df_diff: pl.DataFrame):
+        """Move the network to the next year (df_diff: rows of `yearly_edge_diffs` of this year)."""
+        rows, cols = df_diff['APT_IDX_A'].to_numpy(), df_diff['APT_IDX_B'].to_numpy()
+        delta_edges = _sparse(rows, cols, df_diff['DELTA_EDGE'].to_numpy(), self.n, np.int32)
+        delta_edges.eliminate_zeros()
+
+        self.one_stop = self.one_stop + self.edges @ delta_edges + delta_edges @ self.edges + delta_edges @ delta_edges
+        self.one_stop.eliminate_zeros()
+        self.edges = self.edges + delta_edges
+        self.edges.eliminate_zeros()
+        self.weights = self.weights + _sparse(rows, cols, df_diff['DELTA_WEIGHT'].to_numpy(), self.n, np.float64)
+        self.weights.data[np.abs(self.weights.data) < 1e-9] = 0
+        self.weights.eliminate_zeros()
+
+    def airport_metrics(self, n_pivots: int = N_PIVOTS, seed: int = 0) -> dict[str, np.ndarray]:
+        """
+        Degree, strength and approximate betweenness of every airport (arrays indexed by APT_IDX).
+
+        Returns:
+            dict[str, np.ndarray]: AIRPORT_NETWORK_COLS -> array of n_airports values.
+        """
+        return {
+            'OUT_DEGREE': np.asarray(self.edges.sum(axis=1)).ravel(),
+            'IN_DEGREE': np.asarray(self.edges.sum(axis=0)).ravel(),
+            'OUT_STRENGTH': np.asarray(self.weights.sum(axis=1)).ravel(),
+            'IN_STRENGTH': np.asarray(self.weights.sum(axis=0)).ravel(),
+            'BETWEENNESS': approximate_betweenness(self.edges, n_pivots, seed),
+        }
+
+    def pair_features(self, apt_idx_a: np.ndarray, apt_idx_b: np.ndarray) -> dict[str, np.ndarray]:
+        """
+        IS_DIRECT and NB_ONE_STOP (number of one-stop itineraries) of the pairs A -> B (vectorized gather).
+        """
+        return {
+            'IS_DIRECT': np.asarray(self.edges[apt_idx_a, apt_idx_b]).ravel() > 0,
+            'NB_ONE_STOP': np.asarray(self.one_stop[apt_idx_a, apt_idx_b]).ravel(),
+        }
+
+
+def iter_networks(df_scheduled: pl.DataFrame | pl.LazyFrame, n_airports: int, weight: str = 'SEATS', years: list[int] = None) -> Iterator[tuple[int, RouteNetwork]]:
+    """
+    Network of every year, built incrementally (the same RouteNetwork object is advanced and yielded each year).
+
+    Example:
+        >>> for year, network in iter_networks(df_scheduled, df_apt_dict.height):
+        ...     print(year, network.edges.nnz)
+    """
+    df_diffs = yearly_edge_diffs(df_scheduled, weight, years)
+    if years is None:
+        years = df_scheduled.lazy().select(d.YEAR.unique().sort()).collect()['YEAR'].to_list()
+
+    diffs = {year: df for (year,), df in df_diffs.partition_by('YEAR', as_dict=True).items()}
+    network = RouteNetwork(n_airports)
+    for year in sorted(years):
+        if year in diffs:
+            network.apply_diff(diffs[year])
+        yield year, network
+
+
+#########################
+# BETWEENNESS
+#########################
+
+def approximate_betweenness(edges: sp.csr_matrix, n_pivots: int = N_PIVOTS, seed: int = 0, batch: int = PIVOT_BATCH) -> np.ndarray:
+    """
+    Betweenness of every node of a directed unweighted graph, estimated from a sample of BFS sources (Brandes).
+
+    The BFS of a batch of sources runs level by level as sparse matrix products (one column per source):
+    the number of shortest paths is pushed forward with edges.T @ frontier, the dependencies are pulled
+    back with edges @ coefficients. The sources are sampled among the nodes with an outgoing edge (the
+    others have no path to contribute) and the sum over the sample is scaled by nb_candidates / n_pivots;
+    with n_pivots >= nb_candidates every candidate is a source and the result is the exact betweenness
+    (number of shortest s -> t paths through the node, summed over the ordered pairs, without normalization).
+
+    Parameters:
+        edges (sp.csr_matrix): n x n adjacency (nonzero = edge).
+        n_pivots (int): Number of sampled sources. Default to 128.
+        seed (int): Random seed of the sample. Default to 0.
+        batch (int): Sources per batch. Default to 64.
+
+    Returns:
+        np.ndarray: Betweenness of every node.
+    """
+    n = edges.shape[0]
+    adjacency = (edges != 0).astype(np.float64).tocsr()
+    adjacency_t = adjacency.T.tocsr()
+
+    candidates = np.flatnonzero(np.diff(adjacency.indptr) > 0)
+    sources = candidates if n_pivots >= len(candidates) else np.random.default_rng(seed).choice(candidates, n_pivots, replace=False)
+    betweenness = np.zeros(n)
+    if len(sources) == 0:
+        return betweenness
+
+    for start in range(0, len(sources), batch):
+        batch_sources = sources[start:start + batch]
+        k = len(batch_sources)
+        columns = np.arange(k)
+
+        ## forward: depth and number of shortest paths from every source
+        sigma = np.zeros((n, k))
+        depth = np.full((n, k), -1, dtype=np.int32)
+        sigma[batch_sources, columns] = 1
+        depth[batch_sources, columns] = 0
+        frontier = sigma.copy()
+        level = 0
+        while True:
+            reached = adjacency_t @ frontier
+            new = (depth < 0) & (reached > 0)
+            if not new.any():
+                break
+            level += 1
+            depth[new] = level
+            sigma[new] = reached[new]
+            frontier = np.where(new, reached, 0)
+
+        ## backward: dependency of the sources on every node, from the deepest level
+        delta = np.zeros((n, k))
+        for current in range(level - 1, 0, -1):
+            coefficients = np.where(depth == current + 1, (1 + delta) / np.where(sigma > 0, sigma, 1), 0)
+            pulled = adjacency @ coefficients
+            at_level = depth == current
+            delta[at_level] = sigma[at_level] * pulled[at_level]
+
+        betweenness += delta.sum(axis=1)
+
+    return betweenness * len(candidates) / len(sources)
+
+
+#########################
+# MAIN FUNCTIONS
+#########################
+
+def airport_network_metrics(
+    df_scheduled: pl.DataFrame | pl.LazyFrame,
+    n_airports: int,
+    weight: str = 'SEATS',
+    years: list[int] = None,
+    n_pivots: int = N_PIVOTS,
+    seed: int = 0
+) -> pl.DataFrame:
+    """
+    Degree, strength (sum of SEATS or FLT) and approximate betweenness of every airport and year.
+
+    Parameters:
+        df_scheduled (pl.DataFrame | pl.LazyFrame): Enhanced dataset.
+        n_airports (int): Number of airports of the dictionary (df_apt_dict.height).
+        weight (str): Weight of the strength, SEATS or FLT. Default to 'SEATS'.
+        years (list[int]): Years. Default to None (all the years of the dataset).
+        n_pivots (int): Sources of the approximate betweenness. Default to 128.
+        seed (int): Random seed of the betweenness sample. Default to 0.
+
+    Returns:
+        pl.DataFrame: YEAR, APT_IDX and AIRPORT_NETWORK_COLS, for the airports with at least one route this year.
+    """
+    dfs = []
+    for year, network in iter_networks(df_scheduled, n_airports, weight, years):
+        metrics = network.airport_metrics(n_pivots, seed)
+        dfs.append(
+            pl.DataFrame({'APT_IDX': np.arange(n_airports), **metrics})
+            .filter((d.OUT_DEGREE + d.IN_DEGREE) > 0)
+            .select(pl.lit(year, dtype=pl.Int32).alias('YEAR'), d.APT_IDX.cast(pl.UInt16), pl.exclude('APT_IDX'))
+        )
+
+    return (
+        pl.concat(dfs)
+        .with_columns(d.OUT_DEGREE.cast(pl.UInt32), d.IN_DEGREE.cast(pl.UInt32))
+    )
+
+
+def pair_network_features(
+    df_pairs: pl.DataFrame | pl.LazyFrame,
+    df_scheduled: pl.DataFrame | pl.LazyFrame,
+    df_apt_dict: pl.DataFrame,
+    years: list[int] = None,
+    weight: str = 'SEATS',
+    n_pivots: int = N_PIVOTS,
+    seed: int = 0
+) -> pl.DataFrame:
+    """
+    Network position of every pair (e.g. the 283k EU <-> NA pairs of df_route_combinaison_enhanced) for some years.
+
+    The pairs are turned into APT_IDX arrays once, then the features of every year are gathered from the
+    sparse matrices of the network (no loop on the pairs): IS_DIRECT (route operated this year), NB_ONE_STOP
+    (number of airports C with A -> C and C -> B operated), and the AIRPORT_NETWORK_COLS of both ends.
+    The networks are built incrementally over all the years of the dataset, the features are kept for `years`.
+
+    Parameters:
+        df_pairs (pl.DataFrame | pl.LazyFrame): Pairs with APT_CODE_A and APT_CODE_B.
+        df_scheduled (pl.DataFrame | pl.LazyFrame): Enhanced dataset.
+        df_apt_dict (pl.DataFrame): Airport dictionary of the route ids of the enhanced dataset (utils_routes.airport_dictionary).
+        years (list[int]): Years of the features. Default to None (last year of the dataset only, 283k rows per year).
+        weight (str): Weight of the strength, SEATS or FLT. Default to 'SEATS'.
+        n_pivots (int): Sources of the approximate betweenness. Default to 128.
+        seed (int): Random seed of the betweenness sample. Default to 0.
+
+    Returns:
+        pl.DataFrame: YEAR, APT_CODE_A, APT_CODE_B, PAIR_NETWORK_COLS and AIRPORT_NETWORK_COLS with _A and _B
+                      (null for the airports missing from the dictionary).
+
+    Example:
+        >>> df_network = pair_network_features(df_route_combinaison_enhanced, df_scheduled, df_apt_dict, years=[2019])
+        >>> df_route_combinaison_enhanced.join(df_network, on=['APT_CODE_A', 'APT_CODE_B'], how='left')
+    """
+    df_pairs = add_route_ids(df_pairs.lazy().select('APT_CODE_A', 'APT_CODE_B'), df_apt_dict).select('APT_CODE_A', 'APT_CODE_B', 'APT_IDX_A', 'APT_IDX_B').collect()
+    dataset_years = df_scheduled.lazy().select(d.YEAR.unique()).collect()['YEAR'].to_list()
+    if years is None:
+        years = [max(dataset_years)]
+    missing_years = sorted(set(years) - set(dataset_years))
+    if missing_years:
+        raise ValueError(f"Years {missing_years} are not in the dataset ({min(dataset_years)}-{max(dataset_years)})")
+
+    ## pairs with an airport missing from the dictionary get null features
+    known = (df_pairs['APT_IDX_A'].is_not_null() & df_pairs['APT_IDX_B'].is_not_null()).to_numpy()
+    apt_idx_a = df_pairs['APT_IDX_A'].fill_null(0).to_numpy().astype(np.int64)
+    apt_idx_b = df_pairs['APT_IDX_B'].fill_null(0).to_numpy().astype(np.int64)
+    df_keys = df_pairs.select('APT_CODE_A', 'APT_CODE_B')
+
+    dfs = []
+    for year, network in iter_networks(df_scheduled, df_apt_dict.height, weight):
+        if year not in years:
+            continue
+
+        metrics = network.airport_metrics(n_pivots, seed)
+        features = {
+            **network.pair_features(apt_idx_a, apt_idx_b),
+            **{f'{col}_A': values[apt_idx_a] for col, values in metrics.items()},
+            **{f'{col}_B': values[apt_idx_b] for col, values in metrics.items()},
+        }
+        dfs.append(
+            pl.concat([df_keys, pl.DataFrame(features)], how='horizontal')
+            .with_columns(pl.when(pl.Series(known)).then(pl.exclude('APT_CODE_A', 'APT_CODE_B')).name.keep())
+            .select(pl.lit(year, dtype=pl.Int32).alias('YEAR'), pl.all())
+        )
+
+    return (
+        pl.concat(dfs)
+        .with_columns(d.NB_ONE_STOP.cast(pl.UInt32), pl.col('^.*_DEGREE_[AB]$').cast(pl.UInt32))
+    )
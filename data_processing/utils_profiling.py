@@ -0,0 +1,378 @@
+import os
+import sys
+import json
+import time
+import html
+import resource
+import platform
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+import polars as pl
+from polars import col as d
+
+
+#########################
+# CONFIGURATION
+#########################
+
+## Columns of a profiling report (one row per stage). ROWS_OUT and SIZE_MB are null for a stage returning a
+## LazyFrame (counting would run the query); PEAK_RSS_DELTA_MB is the peak RSS of the stage minus its RSS at start
+REPORT_COLS = [
+    'RUN', 'STAGE', 'PARENT', 'DEPTH', 'KIND', 'SECONDS', 'ROWS_IN', 'ROWS_OUT',
+    'SIZE_MB', 'RSS_MB', 'PEAK_RSS_MB', 'PEAK_RSS_DELTA_MB', 'PLAN',
+]
+
+## Interval of the RSS sampling during a stage, in seconds
+RSS_SAMPLING_INTERVAL = 0.01
+
+## profilers entered with `with PipelineProfiler(...)` (the last one receives the stages)
+_ACTIVE = []
+
+
+#########################
+# MEMORY
+#########################
+
+def max_rss_mb() -> float:
+    """Peak resident memory of the current process, in MB (ru_maxrss is in KB on Linux, in bytes on macOS)."""
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss / 1024**2 if sys.platform == 'darwin' else max_rss / 1024
+
+
+def rss_mb() -> float | None:
+    """Current resident memory of the process, in MB (None when /proc is not available)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024**2
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class RssSampler:
+    """
+    Peak RSS of the process while a stage runs, sampled from /proc/self/statm by a background thread.
+
+    ru_maxrss is the high-water mark of the whole process: a stage using less memory than an earlier one
+    would show no increase. Without /proc, the sampler falls back to the increase of ru_maxrss.
+    """
+    def __init__(self, interval: float = RSS_SAMPLING_INTERVAL):
+        self.interval = interval
+        self.start_rss = rss_mb()
+        self.peak_rss = self.start_rss
+        self.start_max_rss = max_rss_mb()
+        self._stop = threading.Event()
+        self._thread = None
+        if self.start_rss is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        rss = rss_mb()
+        if rss is not None and rss > self.peak_rss:
+            self.peak_rss = rss
+
+    def stop(self) -> float:
+        """Stop the sampling and return the peak RSS of the stage minus the RSS at its start, in MB."""
+        if self._thread is None:
+            return max_rss_mb() - self.start_max_rss
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        return self.peak_rss - self.start_rss
+
+
+def _height(df) -> int | None:
+    """Number of rows of a DataFrame, summed over a list of DataFrames (None for a LazyFrame: counting would run the query)."""
+    if isinstance(df, (list, tuple)):
+        heights = [_height(df_i) for df_i in df]
+        return None if not heights or None in heights else sum(heights)
+    return df.height if isinstance(df, pl.DataFrame) else None
+
+
+def _size_mb(df) -> float | None:
+    if isinstance(df, (list, tuple)):
+        sizes = [_size_mb(df_i) for df_i in df]
+        return None if not sizes or None in sizes else sum(sizes)
+    return df.estimated_size('mb') if isinstance(df, pl.DataFrame) else None
+
+
+#########################
+# PROFILER
+#########################
+
+class Stage:
+    """
+    Measure of one stage, filled by `PipelineProfiler.stage` (call `done(df_out)` with the output of the stage).
+    """
+    def __init__(self, name: str, df_in=None):
+        self.name = name
+        self.rows_in = _height(df_in)
+        self.df_out = None
+
+    def done(self, df_out):
+        """
+        Output of the stage (its rows and size are recorded; a LazyFrame is not collected, its ROWS_OUT is null).
+
+        A stage with several outputs passes them as a list: their rows and sizes are summed.
+        """
+        self.df_out = df_out
+        return df_out
+
+
+class PipelineProfiler:
+    """
+    Per-stage profile of a pipeline: wall time, rows in and out, estimated frame size and memory of every stage.
+
+    The pipelines (utils_lifecycle, utils_cities, the artifacts of utils_artifacts...) declare their stages with
+    the module functions `stage` and `checkpoint`; they are recorded only while a profiler is entered with `with`,
+    otherwise they cost nothing. With a profiler, a stage costs a thread sampling the RSS of the process every
+    RSS_SAMPLING_INTERVAL seconds (a read of /proc/self/statm), so it can stay on in the production rebuilds.
+
+    A lazy chain is only executed at its `collect`, so its stages are the collects. `checkpoint(df, name)`
+    steps can be put in the chain (`.pipe(checkpoint, 'name')`): with `materialize=True` they collect the
+    intermediate frame to time and measure every step (slower, to find the step to blame; the row order of
+    the joins may change), otherwise they only record the lazy plan when `explain=True`.
+
+    Parameters:
+        name (str): Name of the run (e.g. 'rebuild x10'). Default to 'pipeline'.
+        explain (bool): If True, keep the optimized plan of the lazy stages. Default to False.
+        materialize (bool): If True, the checkpoints collect their frame. Default to False.
+
+    Example:
+        >>> with PipelineProfiler('rebuild', explain=True) as profiler:
+        ...     build('route_combinaison_enhanced', force=True)
+        >>> profiler.write_json('profile.json'); profiler.write_html('profile.html')
+    """
+    def __init__(self, name: str = 'pipeline', explain: bool = False, materialize: bool = False):
+        self.name = name
+        self.explain = explain
+        self.materialize = materialize
+        self.records = []
+        self.started_at = datetime.now().isoformat(timespec='seconds')
+        self._parents = []
+
+    def __enter__(self):
+        _ACTIVE.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        _ACTIVE.remove(self)
+        return False
+
+    def _record(self, name: str, kind: str, seconds: float, rows_in: int | None, df_out, peak_delta: float):
+        plan = None
+        if self.explain and isinstance(df_out, pl.LazyFrame):
+            plan = df_out.explain()
+
+        self.records.append({
+            'RUN': self.name,
+            'STAGE': name,
+            'PARENT': self._parents[-1] if self._parents else None,
+            'DEPTH': len(self._parents),
+            'KIND': kind,
+            'SECONDS': seconds,
+            'ROWS_IN': rows_in,
+            'ROWS_OUT': _height(df_out),
+            'SIZE_MB': _size_mb(df_out),
+            'RSS_MB': rss_mb(),
+            'PEAK_RSS_MB': max_rss_mb(),
+            'PEAK_RSS_DELTA_MB': peak_delta,
+            'PLAN': plan,
+        })
+
+    @contextmanager
+    def stage(self, name: str, df_in=None):
+        """
+        Context of a stage: its wall time and memory are measured, `done(df_out)` gives its output.
+
+        Example:
+            >>> with profiler.stage('yearly aggregation') as s:
+            ...     df_yearly = s.done(aggregate_schedules(schedules, df_airports_metrics).collect())
+        """
+        record = Stage(name, df_in)
+        sampler = RssSampler()
+        self._parents.append(name)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            seconds = time.perf_counter() - start
+            self._parents.pop()
+            self._record(name, 'stage', seconds, record.rows_in, record.df_out, sampler.stop())
+
+    def checkpoint(self, df: pl.DataFrame | pl.LazyFrame, name: str) -> pl.DataFrame | pl.LazyFrame:
+        """Step of a lazy chain (see the class docstring)."""
+        if isinstance(df, pl.LazyFrame) and self.materialize:
+            sampler = RssSampler()
+            start = time.perf_counter()
+            df_out = df.collect()
+            self._record(name, 'checkpoint', time.perf_counter() - start, None, df_out, sampler.stop())
+            return df_out.lazy()
+
+        if self.explain:
+            self._record(name, 'checkpoint', 0.0, None, df, 0.0)
+        return df
+
+    def report(self) -> pl.DataFrame:
+        """
+        Stages in their order of completion (a stage is completed after the stages it contains).
+
+        Returns:
+            pl.DataFrame: REPORT_COLS.
+        """
+        schema = {
+            'RUN': pl.Utf8, 'STAGE': pl.Utf8, 'PARENT': pl.Utf8, 'DEPTH': pl.Int32, 'KIND': pl.Utf8,
+            'SECONDS': pl.Float64, 'ROWS_IN': pl.Int64, 'ROWS_OUT': pl.Int64, 'SIZE_MB': pl.Float64,
+            'RSS_MB': pl.Float64, 'PEAK_RSS_MB': pl.Float64, 'PEAK_RSS_DELTA_MB': pl.Float64, 'PLAN': pl.Utf8,
+        }
+        return pl.DataFrame(self.records, schema=schema)
+
+    def to_dict(self) -> dict:
+        """Report with the context of the run (machine, versions, options)."""
+        return {
+            'run': self.name,
+            'started_at': self.started_at,
+            'python': platform.python_version(),
+            'polars': pl.__version__,
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'explain': self.explain,
+            'materialize': self.materialize,
+            'stages': self.report().to_dicts(),
+        }
+
+    def write_json(self, path: str):
+        """Write the report as JSON (read it back with `read_report`)."""
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+    def write_html(self, path: str):
+        """Write the report as a standalone HTML page (table of the stages with time and memory bars, plans in drop-downs)."""
+        df = self.report()
+        max_seconds = max(df['SECONDS'].max() or 0, 1e-9)
+        max_delta = max(df['PEAK_RSS_DELTA_MB'].max() or 0, 1e-9)
+
+        def fmt(value, digits=2):
+            if value is None:
+                return ''
+            return f"{value:_.{digits}f}" if isinstance(value, float) else f"{value:_}"
+
+        def bar(value, maximum, color):
+            width = 0 if value is None else max(100 * value / maximum, 0)
+            return f'<div style="background:{color};height:10px;width:{width:.1f}%"></div>'
+
+        rows = []
+        for r in df.iter_rows(named=True):
+            plan = f"<details><summary>plan</summary><pre>{html.escape(r['PLAN'])}</pre></details>" if r['PLAN'] else ''
+            rows.append(
+                f"<tr><td style=\"padding-left:{12 * r['DEPTH'] + 4}px\">{html.escape(r['STAGE'])}</td><td>{r['KIND']}</td>"
+                f"<td>{fmt(r['SECONDS'], 3)}{bar(r['SECONDS'], max_seconds, '#4c78a8')}</td>"
+                f"<td>{fmt(r['ROWS_IN'])}</td><td>{fmt(r['ROWS_OUT'])}</td><td>{fmt(r['SIZE_MB'])}</td>"
+                f"<td>{fmt(r['RSS_MB'], 0)}</td><td>{fmt(r['PEAK_RSS_MB'], 0)}</td>"
+                f"<td>{fmt(r['PEAK_RSS_DELTA_MB'], 0)}{bar(r['PEAK_RSS_DELTA_MB'], max_delta, '#e45756')}</td><td>{plan}</td></tr>"
+            )
+
+        header = ''.join(f"<th>{col}</th>" for col in ['STAGE', 'KIND', 'SECONDS', 'ROWS_IN', 'ROWS_OUT', 'SIZE_MB',
+                                                        'RSS_MB', 'PEAK_RSS_MB', 'PEAK_RSS_DELTA_MB', 'PLAN'])
+        context = self.to_dict()
+        page = (
+            f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>{html.escape(self.name)}</title>"
+            "<style>body{font-family:sans-serif}table{border-collapse:collapse}td,th{border:1px solid #ddd;padding:4px;"
+            "vertical-align:top;text-align:right}td:first-child{text-align:left}pre{text-align:left}</style></head><body>"
+            f"<h2>{html.escape(self.name)}</h2><p>{context['started_at']} - python {context['python']}, polars {context['polars']}, "
+            f"{context['cpu_count']} cpus - explain={self.explain}, materialize={self.materialize}</p>"
+            f"<table><tr>{header}</tr>{''.join(rows)}</table></body></html>"
+        )
+        with open(path, 'w') as f:
+            f.write(page)
+
+
+#########################
+# HOOKS OF THE PIPELINES
+#########################
+
+def active_profiler() -> PipelineProfiler | None:
+    """Profiler receiving the stages (the last one entered), None if no profiling."""
+    return _ACTIVE[-1] if _ACTIVE else None
+
+
+@contextmanager
+def stage(name: str, df_in=None):
+    """
+    Stage of a pipeline, recorded by the active profiler (or only run when no profiler is active).
+
+    Example:
+        >>> with stage('lifecycle') as s:
+        ...     df = s.done(add_lifecycle_columns(df_yearly).collect())
+    """
+    profiler = active_profiler()
+    if profiler is None:
+        yield Stage(name, None)
+        return
+
+    with profiler.stage(name, df_in) as record:
+        yield record
+
+
+def checkpoint(df: pl.DataFrame | pl.LazyFrame, name: str) -> pl.DataFrame | pl.LazyFrame:
+    """
+    Step of a lazy chain (`.pipe(checkpoint, 'name')`), see `PipelineProfiler`. Returns the frame unchanged without profiler.
+    """
+    profiler = active_profiler()
+    return df if profiler is None else profiler.checkpoint(df, name)
+
+
+#########################
+# REPORTS
+#########################
+
+def read_report(path: str) -> pl.DataFrame:
+    """
+    Stages of a JSON report of `PipelineProfiler.write_json`, with the context of its run.
+
+    Returns:
+        pl.DataFrame: REPORT_COLS and STARTED_AT.
+    """
+    with open(path) as f:
+        report = json.load(f)
+
+    df = pl.DataFrame(report['stages'], schema=PipelineProfiler().report().schema)
+    return df.with_columns(STARTED_AT = pl.lit(report['started_at']))
+
+
+def compare_reports(paths: list[str], measure: str = 'SECONDS') -> pl.DataFrame:
+    """
+    One measure of the stages of several runs side by side (e.g. two rebuilds, or the scales of a benchmark).
+
+    The stages are matched on their name and parent; a stage run several times in a run is summed.
+    The runs are named after their file (without extension).
+
+    Parameters:
+        paths (list[str]): JSON reports.
+        measure (str): Column of the report to compare (SECONDS, PEAK_RSS_DELTA_MB, ROWS_OUT...). Default to 'SECONDS'.
+
+    Returns:
+        pl.DataFrame: PARENT, STAGE and one column per run, in the stage order of the first run.
+
+    Example:
+        >>> compare_reports(['profile_x1.json', 'profile_x10.json'], 'PEAK_RSS_DELTA_MB')
+    """
+    df = pl.concat([
+        read_report(path).with_row_index('ORDER').with_columns(RUN = pl.lit(os.path.splitext(os.path.basename(path))[0]))
+        for path in paths
+    ])
+
+    return (
+        df
+        .group_by('RUN', 'PARENT', 'STAGE')
+        .agg(d(measure).sum(), d.ORDER.min())
+        .with_columns(ORDER = d.ORDER.min().over('PARENT', 'STAGE'))
+        .pivot(on='RUN', index=['ORDER', 'PARENT', 'STAGE'], values=measure)
+        .sort('ORDER')
+        .drop('ORDER')
+    )
@@ -0,0 +1,267 @@
+import polars as pl
+from polars import col as d
+
+
+#########################
+# CONFIGURATION
+#########################
+
+## dtype of an airport id and of a route id (route id = APT_IDX_A * 2**16 + APT_IDX_B)
+APT_IDX_DTYPE = pl.UInt16
+ROUTE_ID_DTYPE = pl.UInt32
+APT_IDX_BITS = 16
+
+## Key columns added to the enhanced dataset
+ROUTE_KEY_COLS = ['APT_IDX_A', 'APT_IDX_B', 'DIR_RTE_ID', 'UNDIR_RTE_ID']
+
+
+#########################
+# AIRPORT DICTIONARY
+#########################
+
+def airport_dictionary(
+    df_airports: pl.DataFrame | pl.LazyFrame,
+    code_col: str = 'APT_CODE',
+    df_apt_dict: pl.DataFrame = None
+) -> pl.DataFrame:
+    """
+    Airport dictionary: one UInt16 APT_IDX per APT_CODE.
+
+    A new dictionary gives the ids in the alphabetical order of the codes, so sorting on an id (or on a route id)
+    gives the same order as sorting on the codes. To keep the route ids of the datasets already built, pass the
+    persisted dictionary as `df_apt_dict`: its ids are kept and only the new codes get ids, after the existing
+    ones (alphabetical order among the new codes). The existing ids never move when airports are added.
+
+    Parameters:
+        df_airports (pl.DataFrame | pl.LazyFrame): Airports table (e.g. df_airports_metrics_modif).
+        code_col (str): Column of the airport codes. Default to 'APT_CODE'.
+        df_apt_dict (pl.DataFrame): Persisted dictionary to extend (e.g. df_airport_dictionary.parquet). Default to None.
+
+    Returns:
+        pl.DataFrame: APT_IDX (UInt16), APT_CODE, sorted by APT_IDX.
+    """
+    codes = (
+        df_airports.lazy()
+        .select(d(code_col).alias('APT_CODE'))
+        .drop_nulls()
+        .unique()
+        .sort('APT_CODE')
+        .collect()
+    )
+
+    if df_apt_dict is None:
+        df_apt_dict = pl.DataFrame(schema={'APT_IDX': APT_IDX_DTYPE, 'APT_CODE': pl.Utf8})
+    df_apt_dict = df_apt_dict.select(d.APT_IDX.cast(APT_IDX_DTYPE), 'APT_CODE').sort('APT_IDX')
+
+    ## new codes numbered after the last existing id
+    start = 0 if df_apt_dict.is_empty() else df_apt_dict['APT_IDX'].max() + 1
+    df_new = codes.join(df_apt_dict, on='APT_CODE', how='anti')
+    if start + df_new.height > 2**APT_IDX_BITS:
+        raise ValueError(f"{start + df_new.height} airports do not fit in {APT_IDX_DTYPE}")
+
+    return pl.concat([
+        df_apt_dict,
+        df_new.with_row_index('APT_IDX', offset=start).select(d.APT_IDX.cast(APT_IDX_DTYPE), 'APT_CODE'),
+    ])
+
+
+def dataset_airport_dictionary(df: pl.DataFrame | pl.LazyFrame) -> pl.DataFrame:
+    """
+    Airport dictionary used by a dataset with route ids, recovered from its APT_CODE_A/B and APT_IDX_A/B columns.
+    Raises a ValueError if a code has several ids or an id several codes in the dataset.
+
+    Returns:
+        pl.DataFrame: APT_IDX (UInt16), APT_CODE of the airports of the dataset, sorted by APT_IDX.
+    """
+    df = df.lazy()
+    df_apt_dict = (
+        pl.concat([
+            df.select(APT_IDX = d.APT_IDX_A, APT_CODE = d.APT_CODE_A),
+            df.select(APT_IDX = d.APT_IDX_B, APT_CODE = d.APT_CODE_B),
+        ])
+        .drop_nulls()
+        .unique()
+        .sort('APT_IDX')
+        .collect()
+    )
+    if df_apt_dict['APT_IDX'].is_duplicated().any() or df_apt_dict['APT_CODE'].is_duplicated().any():
+        raise ValueError("The airport ids of the dataset are not consistent (a code with several ids or an id with several codes)")
+
+    return df_apt_dict
+
+
+def check_airport_dictionary(df_apt_dict: pl.DataFrame, df: pl.DataFrame | pl.LazyFrame):
+    """
+    Raise a ValueError if the route ids of a dataset were not built with (a previous version of) this dictionary.
+    """
+    df_diff = (
+        dataset_airport_dictionary(df)
+        .join(df_apt_dict, on='APT_CODE', how='left', suffix='_DICT')
+        .filter(d.APT_IDX_DICT.is_null() | (d.APT_IDX != d.APT_IDX_DICT))
+    )
+    if df_diff.height:
+        raise ValueError(f"{df_diff.height} airports of the dataset have another id in the dictionary, e.g. {df_diff.head(3).rows()}")
+
+
+#########################
+# ROUTE KEYS
+#########################
+
+def route_id(apt_idx_a: pl.Expr, apt_idx_b: pl.Expr) -> pl.Expr:
+    """UInt32 id of the directional route A -> B."""
+    return apt_idx_a.cast(ROUTE_ID_DTYPE) * 2**APT_IDX_BITS + apt_idx_b.cast(ROUTE_ID_DTYPE)
+
+
+def undirected_route_id(apt_idx_a: pl.Expr, apt_idx_b: pl.Expr) -> pl.Expr:
+    """UInt32 id of the route A <-> B (the id of the direction with the smallest airport first)."""
+    return route_id(pl.min_horizontal(apt_idx_a, apt_idx_b), pl.max_horizontal(apt_idx_a, apt_idx_b))
+
+
+def add_route_ids(
+    df: pl.DataFrame | pl.LazyFrame,
+    df_apt_dict: pl.DataFrame,
+    code_cols: list[str] = ['APT_CODE_A', 'APT_CODE_B']
+) -> pl.LazyFrame:
+    """
+    Add the airport ids and the directional / undirected route ids of every row.
+
+    Replaces the `DIR_APT_PAIR_CODE` / `UNDIR_APT_PAIR_CODE` strings of route_opening_analysis.ipynb:
+    DIR_RTE_ID identifies A -> B, UNDIR_RTE_ID is the same for A -> B and B -> A.
+
+    Parameters:
+        df (pl.DataFrame | pl.LazyFrame): Rows with the airport codes of both ends.
+        df_apt_dict (pl.DataFrame): Dictionary of `airport_dictionary`.
+        code_cols (list[str]): Airport code columns of both ends. Default to ['APT_CODE_A', 'APT_CODE_B'].
+
+    Returns:
+        pl.LazyFrame: Input rows with APT_IDX_A, APT_IDX_B (UInt16), DIR_RTE_ID, UNDIR_RTE_ID (UInt32).
+    """
+    mapping = dict(zip(df_apt_dict['APT_CODE'].to_list(), df_apt_dict['APT_IDX'].to_list()))
+    code_a, code_b = code_cols
+
+    return (
+        df.lazy()
+        .with_columns(APT_IDX_A = d(code_a).replace_strict(mapping, default=None, return_dtype=APT_IDX_DTYPE),
+                      APT_IDX_B = d(code_b).replace_strict(mapping, default=None, return_dtype=APT_IDX_DTYPE))
+        .with_columns(DIR_RTE_ID = route_id(d.APT_IDX_A, d.APT_IDX_B),
+                      UNDIR_RTE_ID = undirected_route_id(d.APT_IDX_A, d.APT_IDX_B))
+    )
+
+
+def decode_route_ids(
+    df: pl.DataFrame | pl.LazyFrame,
+    df_apt_dict: pl.DataFrame,
+    id_col: str = 'DIR_RTE_ID',
+    code_cols: list[str] = ['APT_CODE_A', 'APT_CODE_B']
+) -> pl.DataFrame | pl.LazyFrame:
+    """
+    Add the airport codes of both ends of a route id (e.g. after an aggregation on DIR_RTE_ID or UNDIR_RTE_ID).
+
+    Parameters:
+        df (pl.DataFrame | pl.LazyFrame): Rows with a route id column.
+        df_apt_dict (pl.DataFrame): Dictionary of `airport_dictionary`.
+        id_col (str): Route id column. Default to 'DIR_RTE_ID'.
+        code_cols (list[str]): Names of the added code columns. Default to ['APT_CODE_A', 'APT_CODE_B'].
+
+    Returns:
+        pl.DataFrame | pl.LazyFrame: Input rows with the two code columns.
+
+    Example:
+        >>> df_top = df_scheduled.group_by('UNDIR_RTE_ID').agg(d.SEATS.sum()).top_k(10, by='SEATS')
+        >>> decode_route_ids(df_top, df_apt_dict, 'UNDIR_RTE_ID')
+    """
+    mapping = dict(zip(df_apt_dict['APT_IDX'].to_list(), df_apt_dict['APT_CODE'].to_list()))
+    code_a, code_b = code_cols
+
+    return df.with_columns(
+        (d(id_col) // 2**APT_IDX_BITS).replace_strict(mapping, default=None, return_dtype=pl.Utf8).alias(code_a),
+        (d(id_col) % 2**APT_IDX_BITS).replace_strict(mapping, default=None, return_dtype=pl.Utf8).alias(code_b),
+    )
+
+
+#########################
+# AGGREGATES ON ROUTE KEYS
+#########################
+
+def count_routes(df: pl.DataFrame | pl.LazyFrame, by: list[str] = ['YEAR', 'MKT_TYPE']) -> pl.DataFrame:
+    """
+    Number of distinct directional and undirected routes by group (route_opening_analysis.ipynb).
+
+    Returns:
+        pl.DataFrame: `by` columns, NB_DIR_APT_PAIR_CODE, NB_UNDIR_APT_PAIR_CODE.
+    """
+    return (
+        df.lazy()
+        .group_by(by)
+        .agg(d.DIR_RTE_ID.n_unique().alias('NB_DIR_APT_PAIR_CODE'), d.UNDIR_RTE_ID.n_unique().alias('NB_UNDIR_APT_PAIR_CODE'))
+        .sort(by)
+        .collect()
+    )
+
+
+def route_asymmetry(df: pl.DataFrame | pl.LazyFrame) -> pl.DataFrame:
+    """
+    Number of transatlantic routes operated in only one direction, by YEAR and DIRECTION (route_opening_analysis.ipynb).
+
+    Returns:
+        pl.DataFrame: YEAR, DIRECTION, NB_DIR_APT_PAIR_CODE.
+    """
+    return (
+        df.lazy()
+        .filter(d.MKT_TYPE == 'INTER')
+        .with_columns(COUNT = d.DIR_RTE_ID.n_unique().over('YEAR', 'UNDIR_RTE_ID'))
+        .with_columns(TAG = pl.when(d.COUNT == 2)
+                              .then(pl.lit('both direction'))
+                              .otherwise(d.DIRECTION))
+        .group_by('YEAR', 'TAG')
+        .agg(d.DIR_RTE_ID.n_unique().alias('NB_DIR_APT_PAIR_CODE'))
+        .sort('YEAR', 'TAG')
+        .filter(d.TAG != 'both direction')
+        .rename({'TAG': 'DIRECTION'})
+        .collect()
+    )
+
+
+def waterfall_bars(df_counts: pl.DataFrame | pl.LazyFrame, by: list[str] = ['YEAR', 'MKT_TYPE']) -> pl.DataFrame:
+    """
+    Bars of the waterfall from the route counts of each group (NB_DIR_RTE, NB_OPENING_RTE, NB_REOPENING_RTE, NB_ENDING_RTE, NB_PAUSE_RTE).
+
+    The reopenings and openings of a year are drawn on the previous year (they lead to the next bar).
+
+    Returns:
+        pl.DataFrame: `by` columns, RTE_TYPE, NB_RTE, ORDER, BASE (bottom of the bar).
+    """
+    order = {'NB_DIR_RTE': 0, 'NB_ENDING_RTE': 1, 'NB_PAUSE_RTE': 2, 'NB_REOPENING_RTE': 3, 'NB_OPENING_RTE': 4}
+    others = [c for c in by if c != 'YEAR']
+
+    return (
+        df_counts.lazy()
+        .select(*by, 'NB_DIR_RTE', 'NB_OPENING_RTE', 'NB_REOPENING_RTE', 'NB_ENDING_RTE', 'NB_PAUSE_RTE')
+        .with_columns(NB_ENDING_RTE = -d.NB_ENDING_RTE, NB_PAUSE_RTE = -d.NB_PAUSE_RTE)
+        .unpivot(index=by, variable_name='RTE_TYPE', value_name='NB_RTE')
+        .with_columns(ORDER = d.RTE_TYPE.replace_strict(order, return_dtype=pl.Int32))
+        .sort(*by, 'ORDER')
+        .with_columns(YEAR = pl.when(d.RTE_TYPE.is_in(['NB_REOPENING_RTE', 'NB_OPENING_RTE']))
+                               .then(d.YEAR - 1)
+                               .otherwise(d.YEAR))
+        .with_columns(BASE = d.NB_RTE.cum_sum().shift(1).over('YEAR', *others))
+        .with_columns(BASE = pl.when(d.RTE_TYPE == 'NB_DIR_RTE')
+                               .then(0)
+                               .otherwise(d.BASE))
+        .collect()
+    )
+
+
+def route_waterfall(df: pl.DataFrame | pl.LazyFrame, by: list[str] = ['YEAR', 'MKT_TYPE']) -> pl.DataFrame:
+    """
+    Waterfall of the number of routes: existing routes, then ends, pauses, reopenings and openings (route_opening_analysis.ipynb).
+
+    Returns:
+        pl.DataFrame: `by` columns, RTE_TYPE, NB_RTE, ORDER, BASE (bottom of the bar), see `waterfall_bars`.
+    """
+    return waterfall_bars(
+        df.lazy()
+        .group_by(by)
+        .agg(pl.len().alias('NB_DIR_RTE'), d.NB_OPENING_RTE.sum(), d.NB_REOPENING_RTE.sum(), d.NB_ENDING_RTE.sum(), d.NB_PAUSE_RTE.sum()),
+        by
+    )
@@ -0,0 +1,306 @@
+import os
+import numpy as np
+import polars as pl
+from polars import col as d
+from scipy import stats
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context
+
+from utils_cities import cities_metrics_long, airport_metro_index, add_city_metrics, CITY_YEARS
+
+
+#########################
+# CONFIGURATION
+#########################
+
+KEY_COLS = ['APT_CODE_A', 'APT_CODE_B']
+
+## Features of df_route_combinaison_enhanced
+ROUTE_FEATURE_COLS = [
+    'DIST_GC_KM', 'ROUTE_DRIVE_DIST_KM', 'ROUTE_DRIVE_TIME_H',
+    'RATING_A', 'RATING_B', 'NB_REVIEW_LOG_A', 'NB_REVIEW_LOG_B',
+    'ELEV_FT_A', 'ELEV_FT_B', 'NB_RUNWAYS_A', 'NB_RUNWAYS_B',
+    'TIME_ZONE_2016_A', 'TIME_ZONE_2016_B',
+]
+
+## Cities metrics of both ends (added by `add_city_features`)
+CITY_FEATURE_COLS = ['POPU_LOG_A', 'POPU_LOG_B', 'INC_USD2019_A', 'INC_USD2019_B']
+
+## Openings used as labels: pairs not existing before the first year, opened within the window
+TRAIN_WINDOW = (2010, 2019)
+
+## Rows scored at once by a worker
+CHUNK_SIZE = 250_000
+
+
+#########################
+# FEATURES AND LABELS
+#########################
+
+def add_city_features(
+    df_pairs: pl.DataFrame | pl.LazyFrame,
+    df_cities: pl.DataFrame | pl.LazyFrame,
+    df_airports_lookup: pl.DataFrame | pl.LazyFrame,
+    year: int = max(CITY_YEARS)
+) -> pl.LazyFrame:
+    """
+    Add the population (log) and the income (2019 USD) of the metropolitan area of both ends of each pair.
+
+    Parameters:
+        df_pairs (pl.DataFrame | pl.LazyFrame): Pairs with APT_CODE_A and APT_CODE_B (e.g. df_route_combinaison_enhanced).
+        df_cities (pl.DataFrame | pl.LazyFrame): Cities metrics (df_cities_metrics_modif).
+        df_airports_lookup (pl.DataFrame | pl.LazyFrame): Airports lookup with APT_ID and APT_CODE.
+        year (int): Year of the metrics (nearest known year outside 2010-2015). Default to 2015.
+
+    Returns:
+        pl.LazyFrame: Pairs with CITY_FEATURE_COLS (null for the airports outside a metropolitan area).
+    """
+    df_apt_id = df_airports_lookup.lazy().select('APT_ID', 'APT_CODE')
+    columns = df_pairs.lazy().collect_schema().names()
+
+    return (
+        add_city_metrics(
+            df_pairs.lazy()
+            .join(df_apt_id.rename({'APT_ID': 'APT_ID_A', 'APT_CODE': 'APT_CODE_A'}), how='left', on='APT_CODE_A')
+            .join(df_apt_id.rename({'APT_ID': 'APT_ID_B', 'APT_CODE': 'APT_CODE_B'}), how='left', on='APT_CODE_B')
+            .with_columns(YEAR = pl.lit(year, dtype=pl.Int32)),
+            cities_metrics_long(df_cities),
+            airport_metro_index(df_cities).select('APT_ID', 'METRO_ID'),
+            ['POPU', 'INC_USD2019'],
+            fill='nearest'
+        )
+        .with_columns(POPU_LOG_A = d.POPU_A.log(), POPU_LOG_B = d.POPU_B.log())
+        .select(*columns, *CITY_FEATURE_COLS)
+    )
+
+
+def add_opening_labels(
+    df_pairs: pl.DataFrame | pl.LazyFrame,
+    df_scheduled: pl.DataFrame | pl.LazyFrame,
+    window: tuple[int, int] = TRAIN_WINDOW
+) -> pl.LazyFrame:
+    """
+    Training rows: the pairs not operated before the window, with LABEL = opened within the window.
+
+    Parameters:
+        df_pairs (pl.DataFrame | pl.LazyFrame): Candidate pairs (e.g. df_route_combinaison_enhanced).
+        df_scheduled (pl.DataFrame | pl.LazyFrame): Enhanced dataset with FIRST_EXISTING_YEAR.
+        window (tuple[int, int]): (first, last) year of the openings. Default to (2010, 2019).
+
+    Returns:
+        pl.LazyFrame: Pairs with a LABEL column (Int8).
+    """
+    df_first_year = df_scheduled.lazy().group_by(KEY_COLS).agg(d.FIRST_EXISTING_YEAR.min())
+
+    return (
+        df_pairs.lazy()
+        .join(df_first_year, how='left', on=KEY_COLS)
+        .filter(d.FIRST_EXISTING_YEAR.is_null() | (d.FIRST_EXISTING_YEAR >= window[0]))
+        .with_columns(LABEL = d.FIRST_EXISTING_YEAR.is_between(window[0], window[1]).fill_null(False).cast(pl.Int8))
+        .drop('FIRST_EXISTING_YEAR')
+    )
+
+
+def feature_matrix(df: pl.DataFrame, feature_cols: list[str]) -> np.ndarray:
+    """Float32 (rows x features) matrix, missing and infinite values (e.g. log of 0) as NaN."""
+    X = df.select([d(c).cast(pl.Float32) for c in feature_cols]).to_numpy()
+    X[~np.isfinite(X)] = np.nan
+    return X
+
+
+def auc_score(y: np.ndarray, score: np.ndarray) -> float:
+    """Area under the ROC curve (probability that an opened pair scores above a non opened one)."""
+    ranks = stats.rankdata(score)
+    n1 = y.sum()
+    n0 = len(y) - n1
+    return (ranks[y == 1].sum() - n1 * (n1 + 1) / 2) / (n1 * n0)
+
+
+#########################
+# MODEL
+#########################
+
+class RouteOpeningModel:
+    """
+    Probability of opening of a pair from its features.
+
+    Missing values are replaced by the training medians and the features standardized; the default model
+    is an L2 regularized logistic regression fitted by Newton steps (IRLS), so scoring a chunk is one
+    float32 matrix-vector product. Any estimator with fit / predict_proba (e.g. scikit-learn) can be used
+    instead, on the same prepared features.
+
+    Parameters:
+        feature_cols (list[str]): Feature columns. Default to ROUTE_FEATURE_COLS + CITY_FEATURE_COLS.
+        l2 (float): L2 penalty of the logistic regression. Default to 1.0.
+        max_iter (int): Maximum number of Newton steps. Default to 50.
+        estimator: Estimator used instead of the logistic regression. Default to None.
+
+    Example:
+        >>> model = RouteOpeningModel().fit(df_train)
+        >>> auc_score(df_valid['LABEL'].to_numpy(), model.predict_proba(df_valid))
+    """
+
+    def __init__(self, feature_cols=None, l2=1.0, max_iter=50, estimator=None):
+        self.feature_cols = feature_cols or ROUTE_FEATURE_COLS + CITY_FEATURE_COLS
+        self.l2 = l2
+        self.max_iter = max_iter
+        self.estimator = estimator
+
+    def _prepare(self, X):
+        """Imputed and standardized features."""
+        X = np.where(np.isnan(X), self.medians_, X)
+        return (X - self.means_) / self.stds_
+
+    def fit(self, df, label_col='LABEL'):
+        X = feature_matrix(df, self.feature_cols).astype(np.float64)
+        y = df[label_col].to_numpy().astype(np.float64)
+
+        self.medians_ = np.nan_to_num(np.nanmedian(X, axis=0))
+        X = np.where(np.isnan(X), self.medians_, X)
+        self.means_, self.stds_ = X.mean(axis=0), X.std(axis=0)
+        self.stds_[self.stds_ == 0] = 1.0
+        X = (X - self.means_) / self.stds_
+
+        if self.estimator is not None:
+            self.estimator.fit(X.astype(np.float32), y)
+        else:
+            ## Newton steps of the penalized log-likelihood (no penalty on the intercept)
+            X1 = np.hstack([np.ones((len(X), 1)), X])
+            penalty = np.full(X1.shape[1], self.l2)
+            penalty[0] = 0.0
+            beta = np.zeros(X1.shape[1])
+            for _ in range(self.max_iter):
+                p = 1 / (1 + np.exp(-(X1 @ beta)))
+                gradient = X1.T @ (y - p) - penalty * beta
+                hessian = (X1 * (p * (1 - p))[:, None]).T @ X1 + np.diag(penalty)
+                step = np.linalg.solve(hessian, gradient)
+                beta += step
+                if np.abs(step).max() < 1e-6:
+                    break
+            self.intercept_, self.coef_ = np.float32(beta[0]), beta[1:].astype(np.float32)
+
+        ## float32 for the scoring
+        self.medians_, self.means_, self.stds_ = (a.astype(np.float32) for a in (self.medians_, self.means_, self.stds_))
+        return self
+
+    def predict_proba(self, df):
+        """Probability of opening of every row (float32)."""
+        X = self._prepare(feature_matrix(df, self.feature_cols))
+        if self.estimator is not None:
+            return self.estimator.predict_proba(X)[:, 1].astype(np.float32)
+        return 1 / (1 + np.exp(-(X @ self.coef_ + self.intercept_)))
+
+    def coefficients(self):
+        """Standardized coefficients of the logistic regression, by decreasing absolute value."""
+        return pl.DataFrame({'FEATURE': self.feature_cols, 'COEF': self.coef_}).sort(d.COEF.abs(), descending=True)
+
+
+#########################
+# SCORING
+#########################
+
+_WORKER_MODEL = None
+
+
+def _init_worker(model):
+    global _WORKER_MODEL
+    _WORKER_MODEL = model
+
+
+def _score_chunk(df, model):
+    return df.select(KEY_COLS).with_columns(SCORE = pl.Series(model.predict_proba(df), dtype=pl.Float32))
+
+
+def _score_parquet_chunk(args):
+    """Read and score one slice of a parquet file (in a worker process)."""
+    path, offset, length = args
+    df = pl.scan_parquet(path).slice(offset, length).select(*KEY_COLS, *_WORKER_MODEL.feature_cols).collect()
+    return _score_chunk(df, _WORKER_MODEL)
+
+
+def score_candidates(
+    source: str | pl.DataFrame | pl.LazyFrame,
+    model: RouteOpeningModel,
+    chunk_size: int = CHUNK_SIZE,
+    max_workers: int = None,
+    output_path: str = None
+) -> pl.DataFrame:
+    """
+    Score candidate pairs by chunks on several cores.
+
+    A parquet path is read by slices in worker processes (each one reads only its own rows, so the candidate
+    set never has to fit in memory at once); a frame is cut in slices scored in threads (the scoring is
+    numpy work that releases the GIL). The worker processes are spawned: a script scoring a path must call
+    this function under `if __name__ == '__main__':`.
+
+    Parameters:
+        source (str | pl.DataFrame | pl.LazyFrame): Parquet file of candidates, or candidates, with KEY_COLS and the model features.
+        model (RouteOpeningModel): Fitted model.
+        chunk_size (int): Rows per chunk. Default to 250_000.
+        max_workers (int): Number of workers. Default to None (all cores).
+        output_path (str): Parquet file to write the scores to. Default to None.
+
+    Returns:
+        pl.DataFrame: APT_CODE_A, APT_CODE_B, SCORE, RANK (1 = most likely opening), sorted by RANK.
+    """
+    max_workers = max_workers or os.cpu_count()
+
+    if isinstance(source, str):
+        nb_rows = pl.scan_parquet(source).select(pl.len()).collect().item()
+        tasks = [(source, offset, chunk_size) for offset in range(0, nb_rows, chunk_size)]
+        ## spawn: a forked child of a process running Polars threads can deadlock
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=get_context('spawn'), initializer=_init_worker, initargs=(model,)) as executor:
+            dfs = list(executor.map(_score_parquet_chunk, tasks))
+    else:
+        df = source.lazy().select(*KEY_COLS, *model.feature_cols).collect()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            dfs = list(executor.map(lambda offset: _score_chunk(df.slice(offset, chunk_size), model), range(0, df.height, chunk_size)))
+
+    df_scores = (
+        pl.concat(dfs)
+        .sort('SCORE', descending=True)
+        .with_columns(RANK = pl.int_range(1, pl.len() + 1, dtype=pl.UInt32))
+    )
+    if output_path is not None:
+        df_scores.write_parquet(output_path)
+
+    return df_scores
+
+
+#########################
+# MAIN FUNCTION
+#########################
+
+def build_opening_scores(
+    df_route_combinaison: pl.DataFrame | pl.LazyFrame,
+    df_scheduled: pl.DataFrame | pl.LazyFrame,
+    df_cities: pl.DataFrame | pl.LazyFrame,
+    df_airports_lookup: pl.DataFrame | pl.LazyFrame,
+    window: tuple[int, int] = TRAIN_WINDOW,
+    model: RouteOpeningModel = None,
+    max_workers: int = None
+) -> pl.DataFrame:
+    """
+    Rank the never operated pairs of df_route_combinaison_enhanced (HAS_EXISTED == False) by probability of opening.
+
+    The model is trained on the openings of the window (see `add_opening_labels`) and scores every pair
+    that never existed.
+
+    Parameters:
+        df_route_combinaison (pl.DataFrame | pl.LazyFrame): df_route_combinaison_enhanced.
+        df_scheduled (pl.DataFrame | pl.LazyFrame): Enhanced dataset.
+        df_cities (pl.DataFrame | pl.LazyFrame): Cities metrics (df_cities_metrics_modif).
+        df_airports_lookup (pl.DataFrame | pl.LazyFrame): Airports lookup with APT_ID and APT_CODE.
+        window (tuple[int, int]): Years of the openings used as labels. Default to (2010, 2019).
+        model (RouteOpeningModel): Model to fit. Default to None (logistic regression on all the features).
+        max_workers (int): Number of scoring workers. Default to None (all cores).
+
+    Returns:
+        pl.DataFrame: APT_CODE_A, APT_CODE_B, SCORE, RANK of the never operated pairs.
+    """
+    model = model or RouteOpeningModel()
+    df_pairs = add_city_features(df_route_combinaison, df_cities, df_airports_lookup).collect()
+
+    model.fit(add_opening_labels(df_pairs, df_scheduled, window).collect())
+
+    return score_candidates(df_pairs.filter(~d.HAS_EXISTED), model, max_workers=max_workers)
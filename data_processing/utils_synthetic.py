@@ -0,0 +1,454 @@
+import os
+import numpy as np
+import polars as pl
+from polars import col as d
+
+from utils_ingestion import RAW_SCHEDULE_SCHEMA, SCHEDULE_FILE_PATTERN
+
+
+#########################
+# CONFIGURATION
+#########################
+
+## Size of today's data (scale 1). The airport counts give the 283_404 EU <-> NA directional pairs of apt_combinaison.ipynb
+N_AIRPORTS_EU = 418
+N_AIRPORTS_US = 339
+N_AIRPORTS_OTHER = 3200
+N_ROUTES = 60_000 ## directional airport pairs that exist at least one year
+SCHEDULE_ROWS_PER_YEAR = 300_000
+
+FIRST_YEAR = 2000
+LAST_YEAR = 2023
+
+REGION_ID_US = 10
+REGION_ID_EUR = 13
+OTHER_REGION_IDS = [1, 2, 3, 4, 5, 6, 7, 8, 9, 11, 12]
+
+## rough bounding boxes (lat min, lat max, lon min, lon max) of the regions
+REGION_BOXES = {
+    REGION_ID_US: (25.0, 60.0, -125.0, -65.0),
+    REGION_ID_EUR: (36.0, 65.0, -10.0, 30.0),
+}
+
+SHARE_TRANSATLANTIC_ROUTES = 0.05
+N_CARRIERS = 400
+N_AL_GROUPS = 40 ## groups of the airline mapping, 80% of the carriers have one
+N_AC_TYPES = 120
+TIME_BINS_PER_YEAR = 12 ## TimeBin generated as "YYYY-MM"
+N_CITY_AIRPORTS = 13 ## APT_ID_1 ... APT_ID_13 of the cities metrics table
+
+
+#########################
+# HELPER FUNCTIONS
+#########################
+
+def _codes(n: int, length: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    `n` distinct random upper-case codes (IATA like codes, longer ones when 3 letters are not enough).
+    """
+    while 26**length < 2 * n:
+        length += 1
+
+    codes = set()
+    while len(codes) < n:
+        codes.update("".join(c) for c in rng.choice(list("ABCDEFGHIJKLMNOPQRSTUVWXYZ"), size=(n, length)))
+
+    return np.array(sorted(codes)[:n])[rng.permutation(n)]
+
+
+def scaled_sizes(scale: float) -> dict[str, int]:
+    """
+    Table sizes at a given scale of today's data.
+
+    Schedules and routes grow linearly with `scale`; airports grow with sqrt(scale),
+    so that the number of candidate airport pairs also grows linearly.
+    """
+    return {
+        'N_AIRPORTS_EU': int(round(N_AIRPORTS_EU * np.sqrt(scale))),
+        'N_AIRPORTS_US': int(round(N_AIRPORTS_US * np.sqrt(scale))),
+        'N_AIRPORTS_OTHER': int(round(N_AIRPORTS_OTHER * np.sqrt(scale))),
+        'N_ROUTES': int(round(N_ROUTES * scale)),
+        'SCHEDULE_ROWS_PER_YEAR': int(round(SCHEDULE_ROWS_PER_YEAR * scale)),
+    }
+
+
+#########################
+# LOOKUP TABLES
+#########################
+
+def generate_airports(scale: float = 1, seed: int = 0) -> tuple[pl.DataFrame, pl.DataFrame]:
+    """
+    Synthetic airport lookup and airport metrics tables (renamed columns, as the *_modif.csv files).
+
+    Parameters:
+        scale (float): Scale of today's data. Default to 1.
+        seed (int): Random seed. Default to 0.
+
+    Returns:
+        tuple[pl.DataFrame, pl.DataFrame]: df_airports_lookup_modif, df_airports_metrics_modif.
+    """
+    rng = np.random.default_rng(seed)
+    sizes = scaled_sizes(scale)
+
+    n_eu, n_us, n_other = sizes['N_AIRPORTS_EU'], sizes['N_AIRPORTS_US'], sizes['N_AIRPORTS_OTHER']
+    n = n_eu + n_us + n_other
+
+    region_id = np.concatenate([
+        np.full(n_eu, REGION_ID_EUR),
+        np.full(n_us, REGION_ID_US),
+        rng.choice(OTHER_REGION_IDS, n_other),
+    ])
+
+    ## coordinates: inside the region box for EU/US, anywhere else for the other regions
+    lat = rng.uniform(-50, 70, n)
+    lon = rng.uniform(-180, 180, n)
+    for region, (lat_min, lat_max, lon_min, lon_max) in REGION_BOXES.items():
+        mask = region_id == region
+        lat[mask] = rng.uniform(lat_min, lat_max, mask.sum())
+        lon[mask] = rng.uniform(lon_min, lon_max, mask.sum())
+
+    country_code = np.where(region_id == REGION_ID_US, "US", np.where(region_id == REGION_ID_EUR, rng.choice(["FR", "DE", "GB", "IT", "ES", "NL", "PT", "IE"], n), "ZZ"))
+    codes = _codes(n, 3, rng)
+    elev_ft = np.round(rng.lognormal(5.5, 1.2, n) * rng.choice([1, 1, 1, 1, 1, 1, 1, 1, 1, -0.05], n))
+    is_closed = pl.Series(rng.random(n) < 0.02) ## ~2% of airports closed at some point
+
+    df_airports_lookup = pl.DataFrame({
+        'APT_ID': np.arange(1, n + 1),
+        'APT_CODE': codes,
+        'APT_NAME': [f"{code} International" for code in codes],
+        'APT_CITY_NAME': codes,
+        'APT_CITY_FULL_NAME': [f"City of {code}" for code in codes],
+        'APT_COUNTRY_CODE': country_code,
+        'APT_COUNTRY_NAME': country_code,
+        'APT_REGION': region_id,
+        'LATITUDE': lat,
+        'LONGITUDE': lon,
+    })
+
+    drive_dist_km = rng.gamma(2.0, 12.0, n)
+    df_airports_metrics = pl.DataFrame({
+        'APT_CODE': codes,
+        'APT_ICAO_CODE': ["K" + code if region == REGION_ID_US else "E" + code for code, region in zip(codes, region_id)],
+        'APT_COUNTRY_CODE': country_code,
+        'LATITUDE': lat,
+        'LONGITUDE': lon,
+        'TIME_ZONE_2016': np.round(lon / 15),
+        'REGION_ID': region_id,
+        'IS_ISLAND': (rng.random(n) < 0.08).astype(np.int64),
+        'ELEV_FT': elev_ft,
+        'NB_RUNWAYS': rng.choice([1, 1, 1, 2, 2, 3, 4], n),
+        'LONGEST_RUNWAY_FT': np.round(rng.normal(9000, 2000, n).clip(3000, 16000)),
+        'OPENING_YEAR': rng.integers(1920, 2000, n),
+        'BUILDING_YEAR': rng.integers(1910, 1990, n),
+        'CLOSING_YEAR': rng.integers(FIRST_YEAR, LAST_YEAR + 1, n),
+        'APT_CITY_GC_DIST_KM': drive_dist_km * 0.75,
+        'APT_CITY_DRIVE_DIST_KM': drive_dist_km,
+        'APT_CITY_DRIVE_TIME_H': drive_dist_km / rng.uniform(40, 80, n),
+    }).with_columns(CLOSING_YEAR = pl.when(is_closed).then(d.CLOSING_YEAR))
+
+    return df_airports_lookup, df_airports_metrics
+
+
+def generate_ratings(df_airports: pl.DataFrame, seed: int = 0) -> pl.DataFrame:
+    """
+    Synthetic Google ratings table (same columns as the preprocessed airport_ratings output).
+
+    Parameters:
+        df_airports (pl.DataFrame): Airports with an APT_CODE column.
+        seed (int): Random seed. Default to 0.
+
+    Returns:
+        pl.DataFrame: APT_CODE, APT_NAME, GOOGLE_NAME, RATING, NB_REVIEW.
+    """
+    rng = np.random.default_rng(seed + 1)
+    n = df_airports.height
+    codes = df_airports['APT_CODE'].to_numpy()
+
+    kind = rng.choice(["International Airport", "Airport", "Regional Airport", "Heliport", "Aerodrome"], n, p=[0.3, 0.4, 0.2, 0.05, 0.05])
+    found = rng.random(n) < 0.95
+
+    ## airports not found on Google have null name, rating and reviews
+    return pl.DataFrame({
+        'APT_CODE': codes,
+        'APT_NAME': [f"{code} International" for code in codes],
+        'GOOGLE_NAME': [f"{code} {k}" for code, k in zip(codes, kind)],
+        'RATING': np.round(rng.normal(3.9, 0.4, n).clip(1, 5), 1),
+        'NB_REVIEW': np.round(rng.lognormal(6, 2, n)).astype(np.int64) + 1,
+    }).with_columns(pl.when(pl.Series(found)).then(pl.exclude('APT_CODE', 'APT_NAME')).name.keep())
+
+
+def generate_airline_mapping(seed: int = 0) -> pl.DataFrame:
+    """
+    Synthetic airline mapping (same columns as df_airline_mapping.csv): the group of most of the carriers.
+
+    Parameters:
+        seed (int): Random seed. Default to 0.
+
+    Returns:
+        pl.DataFrame: AL_GROUP, OPE_AL.
+    """
+    rng = np.random.default_rng(seed + 4)
+    carriers = np.array([f"C{i:03d}" for i in range(N_CARRIERS)])
+    mapped = rng.random(N_CARRIERS) < 0.8
+
+    ## a few large groups and many small ones
+    group = rng.zipf(1.6, N_CARRIERS) % N_AL_GROUPS
+
+    return pl.DataFrame({
+        'AL_GROUP': [f"Group {g:02d}" for g in group[mapped]],
+        'OPE_AL': carriers[mapped],
+    })
+
+
+def generate_cities(df_airports_lookup: pl.DataFrame, seed: int = 0) -> pl.DataFrame:
+    """
+    Synthetic cities metrics table (renamed columns, as df_cities_metrics_modif.csv).
+
+    Each airport belongs to one metro area; a metro area lists its airports in APT_ID_1 ... APT_ID_13 (0 for the empty slots).
+
+    Parameters:
+        df_airports_lookup (pl.DataFrame): Airports lookup with APT_ID, APT_COUNTRY_CODE, APT_REGION, LATITUDE, LONGITUDE.
+        seed (int): Random seed. Default to 0.
+
+    Returns:
+        pl.DataFrame: One row per metro area.
+    """
+    rng = np.random.default_rng(seed + 2)
+    n_apt = df_airports_lookup.height
+    n_metro = max(1, int(n_apt * 0.6))
+
+    df_metro_apt = (
+        df_airports_lookup
+        .select('APT_ID', 'APT_COUNTRY_CODE', 'APT_REGION', 'LATITUDE', 'LONGITUDE')
+        .with_columns(METRO_ID = pl.Series(rng.integers(1, n_metro + 1, n_apt)))
+        .with_columns(RANK = d.APT_ID.rank('ordinal').over('METRO_ID'))
+        .filter(d.RANK <= N_CITY_AIRPORTS)
+    )
+
+    df_cities = (
+        df_metro_apt
+        .group_by('METRO_ID')
+        .agg(
+            METRO_COUNTRY = d.APT_COUNTRY_CODE.first(),
+            REGION_ID = d.APT_REGION.first(),
+            NB_APT_2015 = pl.len().cast(pl.Int64),
+            METRO_AVG_LONG = d.LONGITUDE.mean(),
+            METRO_AVG_LAT = d.LATITUDE.mean(),
+            *[d.APT_ID.filter(d.RANK == i).first().alias(f'APT_ID_{i}') for i in range(1, N_CITY_AIRPORTS + 1)],
+        )
+        ## empty slots are 0, as in the real table
+        .with_columns(pl.col([f'APT_ID_{i}' for i in range(1, N_CITY_AIRPORTS + 1)]).fill_null(0))
+        .sort('METRO_ID')
+    )
+
+    n = df_cities.height
+    popu = rng.lognormal(13, 1.2, n)
+    inc = rng.lognormal(10, 0.6, n)
+    growth_popu = rng.normal(0.01, 0.01, n)
+    growth_inc = rng.normal(0.02, 0.02, n)
+
+    return df_cities.with_columns(
+        METRO_CITY = pl.format("Metro {}", d.METRO_ID),
+        *[pl.Series(f'POPU_{y}', np.round(popu * (1 + growth_popu)**(y - 2010))) for y in range(2010, 2016)],
+        *[pl.Series(f'INC_{y}_LC', inc * 0.9 * (1 + growth_inc)**(y - 2010)) for y in range(2010, 2016)],
+        *[pl.Series(f'INC_{y}_USD15', inc * (1 + growth_inc)**(y - 2010)) for y in range(2010, 2016)],
+        IS_SPECIAL = pl.Series(rng.random(n) < 0.02),
+        IS_CAPITAL = pl.Series(rng.random(n) < 0.05),
+        IS_GLOBAL_HUB = pl.Series(rng.random(n) < 0.03),
+        IS_DOMESTIC_HUB = pl.Series(rng.random(n) < 0.1),
+    )
+
+
+#########################
+# SCHEDULES
+#########################
+
+def generate_routes(df_airports_metrics: pl.DataFrame, scale: float = 1, seed: int = 0) -> pl.DataFrame:
+    """
+    Synthetic route universe: the directional airport pairs operated at least one year, with their lifecycle.
+
+    Airports are picked with a heavy-tailed popularity (hubs get many routes); each route opens in a random
+    year (a share already exists in FIRST_YEAR), runs for a random duration and may pause one year,
+    so the lifecycle tagging finds openings, ends, pauses and reopenings.
+
+    Parameters:
+        df_airports_metrics (pl.DataFrame): Airports with APT_CODE and REGION_ID.
+        scale (float): Scale of today's data. Default to 1.
+        seed (int): Random seed. Default to 0.
+
+    Returns:
+        pl.DataFrame: APT_CODE_A, APT_CODE_B, START_YEAR, END_YEAR, PAUSE_YEAR, WEIGHT, CARRIERS (list of carrier codes).
+    """
+    rng = np.random.default_rng(seed + 3)
+    n_routes = scaled_sizes(scale)['N_ROUTES']
+
+    codes = df_airports_metrics['APT_CODE'].to_numpy()
+    region = df_airports_metrics['REGION_ID'].to_numpy()
+    popularity = rng.pareto(1.2, len(codes)) + 0.1
+
+    ## transatlantic routes between the EU and US airports, the others anywhere
+    n_transat = int(n_routes * SHARE_TRANSATLANTIC_ROUTES)
+    eu, us = np.flatnonzero(region == REGION_ID_EUR), np.flatnonzero(region == REGION_ID_US)
+    p_eu, p_us, p_all = popularity[eu] / popularity[eu].sum(), popularity[us] / popularity[us].sum(), popularity / popularity.sum()
+
+    a_transat, b_transat = rng.choice(eu, n_transat, p=p_eu), rng.choice(us, n_transat, p=p_us)
+    flip = rng.random(n_transat) < 0.5
+    a = np.concatenate([np.where(flip, b_transat, a_transat), rng.choice(len(codes), n_routes - n_transat, p=p_all)])
+    b = np.concatenate([np.where(flip, a_transat, b_transat), rng.choice(len(codes), n_routes - n_transat, p=p_all)])
+
+    start_year = np.where(rng.random(n_routes) < 0.4, FIRST_YEAR, rng.integers(FIRST_YEAR, LAST_YEAR + 1, n_routes))
+    end_year = np.minimum(start_year + rng.geometric(0.12, n_routes) - 1, LAST_YEAR)
+    end_year = np.where(rng.random(n_routes) < 0.3, LAST_YEAR, end_year)
+    pause_year = np.where((rng.random(n_routes) < 0.1) & (end_year - start_year >= 2), start_year + 1, -1)
+
+    carriers = np.array([f"C{i:03d}" for i in range(N_CARRIERS)])
+    n_carriers = rng.integers(1, 4, n_routes)
+    carrier_idx = rng.integers(0, N_CARRIERS, (n_routes, 3))
+
+    return (
+        pl.DataFrame({
+            'APT_CODE_A': codes[a],
+            'APT_CODE_B': codes[b],
+            'START_YEAR': start_year,
+            'END_YEAR': end_year,
+            'PAUSE_YEAR': pause_year,
+            'WEIGHT': np.sqrt(popularity[a] * popularity[b]),
+            'CARRIERS': [list(carriers[idx[:k]]) for idx, k in zip(carrier_idx, n_carriers)],
+        })
+        .filter(d.APT_CODE_A != d.APT_CODE_B)
+        .unique(subset=['APT_CODE_A', 'APT_CODE_B'], keep='first', maintain_order=True)
+    )
+
+
+def generate_schedule_year(df_routes: pl.DataFrame, year: int, scale: float = 1, seed: int = 0) -> pl.DataFrame:
+    """
+    Synthetic raw schedule of one year (RAW_SCHEDULE_SCHEMA columns, as the yearly CSV files).
+
+    Rows are (route, carrier, time bin, aircraft) combinations of the routes active this year,
+    drawn proportionally to the route weight.
+
+    Parameters:
+        df_routes (pl.DataFrame): Route universe of `generate_routes`.
+        year (int): Year of the schedule.
+        scale (float): Scale of today's data. Default to 1.
+        seed (int): Random seed. Default to 0.
+
+    Returns:
+        pl.DataFrame: Raw schedule rows.
+    """
+    rng = np.random.default_rng([seed, year])
+    n_rows = scaled_sizes(scale)['SCHEDULE_ROWS_PER_YEAR']
+
+    df_active = df_routes.filter((d.START_YEAR <= year) & (d.END_YEAR >= year) & (d.PAUSE_YEAR != year))
+    if df_active.height == 0:
+        return pl.DataFrame(schema=RAW_SCHEDULE_SCHEMA)
+
+    weight = df_active['WEIGHT'].to_numpy()
+    route = rng.choice(df_active.height, n_rows, p=weight / weight.sum())
+
+    ## every active route appears at least once
+    route[:df_active.height] = np.arange(df_active.height)[:n_rows]
+
+    carriers = df_active['CARRIERS'].to_list()
+    carrier = [carriers[r][i % len(carriers[r])] for r, i in zip(route, rng.integers(0, 3, n_rows))]
+
+    size_cat = rng.integers(1, 8, n_rows)
+    seats_per_flight = np.array([0, 20, 50, 90, 150, 200, 280, 400])[size_cat]
+    departures = rng.integers(1, 120, n_rows).astype(np.float64)
+    arrivals = np.maximum(departures + rng.integers(-2, 3, n_rows), 0)
+    block_hours = rng.uniform(0.5, 12, n_rows)
+
+    return pl.DataFrame({
+        'OriginAirport': df_active['APT_CODE_A'].to_numpy()[route],
+        'DestinationAirport': df_active['APT_CODE_B'].to_numpy()[route],
+        'TimeBin': [f"{year}-{m:02d}" for m in rng.integers(1, TIME_BINS_PER_YEAR + 1, n_rows)],
+        'Equip': np.array([f"A{i:02d}" for i in range(N_AC_TYPES)])[rng.integers(0, N_AC_TYPES, n_rows)],
+        'Carrier': carrier,
+        'EquipSACode': size_cat,
+        'Departures': departures,
+        'Arrivals': arrivals,
+        'DepartureSeats': departures * seats_per_flight,
+        'ArrivalSeats': arrivals * seats_per_flight,
+        'DepartureFlightHours': departures * block_hours,
+        'ArrivalFlightHours': arrivals * block_hours,
+    }, schema=RAW_SCHEDULE_SCHEMA)
+
+
+#########################
+# MAIN FUNCTIONS
+#########################
+
+def schedule_file_name(year: int) -> str:
+    """
+    Name of a yearly schedule file (SCHEDULE_FILE_PATTERN with the year).
+    """
+    return SCHEDULE_FILE_PATTERN.replace('*', str(year))
+
+
+def write_synthetic_dataset(
+    output_path: str,
+    scale: float = 1,
+    years: list[int] = None,
+    seed: int = 0,
+    overwrite: bool = False
+) -> dict[str, str]:
+    """
+    Write a full synthetic dataset: yearly raw schedule CSVs and the airport, city and ratings lookups.
+
+    The yearly files reproduce the raw schema and its drift (2019 has the extra `EquipATIBin` column),
+    so they go through `utils_ingestion` exactly like the real files. Existing files are kept unless `overwrite`.
+
+    Parameters:
+        output_path (str): Folder of the dataset (created if needed).
+        scale (float): Scale of today's data (1, 10, 100...). Default to 1.
+        years (list[int]): Years of schedules. Default to None (FIRST_YEAR ... LAST_YEAR).
+        seed (int): Random seed. Default to 0.
+        overwrite (bool): If True, rewrite the existing files. Default to False.
+
+    Returns:
+        dict[str, str]: Name -> path of the written tables ('schedules' is the folder of the yearly files).
+
+    Example:
+        >>> paths = write_synthetic_dataset('synthetic_x10', scale=10)
+        >>> build_schedule_store(paths['schedules'], 'synthetic_x10/schedules_store')
+    """
+    years = years or list(range(FIRST_YEAR, LAST_YEAR + 1))
+    schedules_path = os.path.join(output_path, 'schedules')
+    os.makedirs(schedules_path, exist_ok=True)
+
+    df_airports_lookup, df_airports_metrics = generate_airports(scale, seed)
+
+    paths = {
+        'schedules': schedules_path,
+        'airports_lookup': os.path.join(output_path, 'df_airports_lookup_modif.csv'),
+        'airports_metrics': os.path.join(output_path, 'df_airports_metrics_modif.csv'),
+        'cities_metrics': os.path.join(output_path, 'df_cities_metrics_modif.csv'),
+        'airports_ratings': os.path.join(output_path, 'output_airport_ratings.csv'),
+        'airline_mapping': os.path.join(output_path, 'df_airline_mapping.csv'),
+    }
+    tables = {
+        'airports_lookup': lambda: df_airports_lookup,
+        'airports_metrics': lambda: df_airports_metrics,
+        'cities_metrics': lambda: generate_cities(df_airports_lookup, seed),
+        'airports_ratings': lambda: generate_ratings(df_airports_metrics, seed),
+        'airline_mapping': lambda: generate_airline_mapping(seed),
+    }
+    for name, table in tables.items():
+        if overwrite or not os.path.exists(paths[name]):
+            table().write_csv(paths[name])
+
+    df_routes = generate_routes(df_airports_metrics, scale, seed)
+    for year in years:
+        file_path = os.path.join(schedules_path, schedule_file_name(year))
+        if os.path.exists(file_path) and not overwrite:
+            continue
+
+        df_year = generate_schedule_year(df_routes, year, scale, seed)
+        if year == 2019: ## column drift of the real files
+            df_year = df_year.with_columns(EquipATIBin = pl.lit("NB"))
+
+        df_year.write_csv(file_path + '.tmp')
+        os.replace(file_path + '.tmp', file_path)
+        print(f"{year}: {df_year.height} rows written")
+
+    return paths
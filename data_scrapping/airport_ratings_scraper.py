@@ -1,6 +1,10 @@
 import polars as pl   ## Polars is a fast DataFrame library (like pandas but faster)
 import requests       ## To make HTTP requests to the Google Places API
 import time           ## To add pauses between requests (avoid hitting API too fast)
+import os             ## To check the cache / checkpoint files
+import json           ## To store the cache / checkpoint as JSON lines
+import asyncio        ## To send several requests at the same time (async mode)
+import argparse       ## To choose the mode from the command line
 
 #########################
 # CONFIGURATION
@@ -15,6 +19,23 @@ INPUT_FILE = "apt_scrapping_data.csv"
 ## Output CSV file where results will be saved
 OUTPUT_FILE = "output_airport_ratings.csv"
 
+## Base URL of the Google Places API (can be replaced by a local stub server for tests)
+BASE_URL = "https://maps.googleapis.com/maps/api/place"
+
+## Async mode: persistent cache of the API answers and checkpoint of the results (JSON lines)
+CACHE_FILE = "airport_ratings_cache.jsonl"
+CHECKPOINT_FILE = "airport_ratings_checkpoint.jsonl"
+
+## Async mode: max requests per second, max requests in flight, retries and timeout (s)
+RATE_LIMIT = 10.0
+MAX_CONCURRENCY = 8
+MAX_RETRIES = 4
+TIMEOUT = 30
+
+## Async mode: Google statuses that are real answers (cached), and transient ones (retried)
+CACHED_STATUSES = ("OK", "ZERO_RESULTS")
+RETRIED_STATUSES = ("OVER_QUERY_LIMIT", "UNKNOWN_ERROR")
+
 
 #########################
 # HELPER FUNCTIONS
@@ -31,7 +52,7 @@ def get_place_id(query: str) -> str | None:
         str: The Google 'place_id' (unique identifier for that location), 
              or None if not found.
     """
-    url = "https://maps.googleapis.com/maps/api/place/findplacefromtext/json"
+    url = f"{BASE_URL}/findplacefromtext/json"
     params = {
         "input": query,           ## the text we are searching
         "inputtype": "textquery", ## tells API that we are passing a text string
@@ -58,7 +79,7 @@ def get_airport_details(place_id: str) -> dict:
         dict: A dictionary with 'name', 'rating', and 'user_ratings_total'
               (or empty if request fails)
     """
-    url_details = "https://maps.googleapis.com/maps/api/place/details/json"
+    url_details = f"{BASE_URL}/details/json"
     params = {
         "place_id": place_id,                        ## the unique Google identifier
         "fields": "name,rating,user_ratings_total",  ## we only request what we need (name, rating and user ratings total)
@@ -71,10 +92,272 @@ def get_airport_details(place_id: str) -> dict:
     return resp.get("result", {})
 
 
+#########################
+# ASYNC MODE
+#########################
+
+class TokenBucket:
+    """
+    Token bucket rate limiter: at most `rate` requests per second, with bursts up to `capacity`.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until a token is available, then consume it."""
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def read_jsonl(path: str) -> list[dict]:
+    """
+    Read a JSON lines file written by an append-only writer.
+
+    A run killed in the middle of a write leaves a torn last line: it is logged and truncated from the file,
+    so the next appends start on a clean line. An undecodable line before the last one still raises.
+    """
+    items = []
+    with open(path, "rb+") as f:
+        lines = f.readlines()
+        offset = 0
+        for i, line in enumerate(lines):
+            try:
+                if line.strip():
+                    items.append(json.loads(line))
+            except json.JSONDecodeError:
+                if i < len(lines) - 1:
+                    raise
+                print(f"{path}: undecodable last line (interrupted write), truncated")
+                f.truncate(offset)
+                return items
+            offset += len(line)
+        ## a complete last line without its newline: the next append would be glued to it
+        if lines and not lines[-1].endswith(b"\n"):
+            f.write(b"\n")
+    return items
+
+
+class JsonlCache:
+    """
+    Persistent key -> value cache stored as an append-only JSON lines file.
+
+    Every new entry is written (and flushed) as soon as it is known, so an interrupted run
+    keeps everything fetched before the crash.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.data = {}
+        if os.path.exists(path):
+            for item in read_jsonl(path):
+                self.data[item["key"]] = item["value"]
+        self.file = open(path, "a")
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.data
+
+    def get(self, key: str):
+        return self.data.get(key)
+
+    def set(self, key: str, value):
+        self.data[key] = value
+        self.file.write(json.dumps({"key": key, "value": value}) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class GoogleAPIError(RuntimeError):
+    """
+    Google answered with a status that is not a result (REQUEST_DENIED, INVALID_REQUEST...): never cached.
+    """
+
+
+async def fetch_json(session, url: str, params: dict, bucket: TokenBucket, semaphore: asyncio.Semaphore) -> dict:
+    """
+    GET a JSON answer with rate limit, bounded concurrency and retries with exponential backoff.
+
+    Retried: network errors, timeouts, HTTP 429/5xx and the RETRIED_STATUSES of Google.
+    Only the CACHED_STATUSES are returned, any other status raises a GoogleAPIError.
+    """
+    import aiohttp
+
+    for attempt in range(MAX_RETRIES + 1):
+        await bucket.acquire()
+        try:
+            async with semaphore:
+                async with session.get(url, params=params) as resp:
+                    if resp.status == 429 or resp.status >= 500:
+                        raise aiohttp.ClientResponseError(resp.request_info, resp.history, status=resp.status)
+                    resp.raise_for_status()
+                    data = await resp.json(content_type=None)
+            status = data.get("status")
+            if status in CACHED_STATUSES:
+                return data
+            if status not in RETRIED_STATUSES:
+                raise GoogleAPIError(f"Google API status {status}: {data.get('error_message', '')}")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if isinstance(e, aiohttp.ClientResponseError) and e.status < 500 and e.status != 429:
+                raise
+            if attempt == MAX_RETRIES:
+                raise
+
+        ## wait before retrying: 0.5s, 1s, 2s, 4s...
+        if attempt < MAX_RETRIES:
+            await asyncio.sleep(0.5 * 2**attempt)
+
+    raise GoogleAPIError(f"Google API status {status} after {MAX_RETRIES} retries: {url}")
+
+
+async def get_place_id_async(session, query: str, cache: JsonlCache, bucket: TokenBucket, semaphore: asyncio.Semaphore) -> str | None:
+    """
+    Async version of `get_place_id`, with the answer cached by query.
+    """
+    key = f"place_id|{query}"
+    if key not in cache:
+        params = {"input": query, "inputtype": "textquery", "fields": "place_id", "key": API_KEY}
+        resp = await fetch_json(session, f"{BASE_URL}/findplacefromtext/json", params, bucket, semaphore)
+        cache.set(key, resp["candidates"][0]["place_id"] if resp.get("candidates") else None)
+
+    return cache.get(key)
+
+
+async def get_airport_details_async(session, place_id: str, cache: JsonlCache, bucket: TokenBucket, semaphore: asyncio.Semaphore) -> dict:
+    """
+    Async version of `get_airport_details`, with the answer cached by place_id.
+    """
+    key = f"details|{place_id}"
+    if key not in cache:
+        params = {"place_id": place_id, "fields": "name,rating,user_ratings_total", "key": API_KEY}
+        resp = await fetch_json(session, f"{BASE_URL}/details/json", params, bucket, semaphore)
+        cache.set(key, resp.get("result", {}))
+
+    return cache.get(key)
+
+
+async def scrape_airport(session, code: str, name: str, cache: JsonlCache, bucket: TokenBucket, semaphore: asyncio.Semaphore) -> dict:
+    """
+    Search one airport (first "CODE Airport", then its full name) and fetch its rating.
+    """
+    place_id = await get_place_id_async(session, f"{code} Airport", cache, bucket, semaphore)
+    if not place_id:
+        place_id = await get_place_id_async(session, name, cache, bucket, semaphore)
+
+    if not place_id:
+        return {"APT_CODE": code, "APT_NAME": name, "GOOGLE_NAME": None, "rating": None, "reviews": None}
+
+    details = await get_airport_details_async(session, place_id, cache, bucket, semaphore)
+
+    return {
+        "APT_CODE": code,
+        "APT_NAME": name,
+        "GOOGLE_NAME": details.get("name"),
+        "rating": details.get("rating"),
+        "reviews": details.get("user_ratings_total")
+    }
+
+
+async def scrape_airports_async(
+    df: pl.DataFrame,
+    cache_file: str = CACHE_FILE,
+    checkpoint_file: str = CHECKPOINT_FILE,
+    rate_limit: float = RATE_LIMIT,
+    max_concurrency: int = MAX_CONCURRENCY
+) -> pl.DataFrame:
+    """
+    Scrape the ratings of every airport of `df` concurrently, resuming from the checkpoint.
+
+    Parameters:
+        df (pl.DataFrame): Airports to scrape (columns APT_CODE and APT_NAME).
+        cache_file (str): JSON lines cache of the API answers (place_id by query, details by place_id).
+        checkpoint_file (str): JSON lines file where every result is appended as soon as it is known.
+                               Airports already in it are skipped, so an interrupted run resumes where it stopped.
+        rate_limit (float): Max number of requests per second.
+        max_concurrency (int): Max number of requests in flight.
+
+    Returns:
+        pl.DataFrame: One row per airport (APT_CODE, APT_NAME, GOOGLE_NAME, rating, reviews), in the order of `df`.
+                      An airport that failed (e.g. REQUEST_DENIED) is logged, not checkpointed, and missing from
+                      the result: it is scraped again by the next run.
+    """
+    import aiohttp
+
+    ## results of a previous (interrupted) run
+    done = {}
+    if os.path.exists(checkpoint_file):
+        for row in read_jsonl(checkpoint_file):
+            done[row["APT_CODE"]] = row
+
+    todo = [row for row in df.iter_rows(named=True) if row["APT_CODE"] not in done]
+    print(f"{len(done)} airports already done, {len(todo)} to scrape")
+
+    cache = JsonlCache(cache_file)
+    bucket = TokenBucket(rate_limit)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    connector = aiohttp.TCPConnector(limit=max_concurrency)  ## pooled connections, reused between requests
+    failed = 0
+
+    try:
+        async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=TIMEOUT)) as session:
+            with open(checkpoint_file, "a") as checkpoint:
+                async def scrape_or_fail(row):
+                    try:
+                        return await scrape_airport(session, row["APT_CODE"], row["APT_NAME"], cache, bucket, semaphore)
+                    except Exception as e:
+                        return {"APT_CODE": row["APT_CODE"], "error": f"{type(e).__name__}: {e}"}
+
+                tasks = [scrape_or_fail(row) for row in todo]
+                for i, task in enumerate(asyncio.as_completed(tasks), start=1):
+                    result = await task
+                    if "error" in result:
+                        failed += 1
+                        print(f"[{i}/{len(todo)}] {result['APT_CODE']}: failed ({result['error']}), not checkpointed")
+                        continue
+                    done[result["APT_CODE"]] = result
+                    checkpoint.write(json.dumps(result) + "\n")
+                    checkpoint.flush()
+                    print(f"[{i}/{len(todo)}] {result['APT_CODE']}: {result['rating']}")
+    finally:
+        cache.close()
+
+    if failed:
+        print(f"{failed} airports failed, run again to retry them")
+
+    return pl.DataFrame(
+        [done[code] for code in df["APT_CODE"].to_list() if code in done],
+        schema={"APT_CODE": pl.Utf8, "APT_NAME": pl.Utf8, "GOOGLE_NAME": pl.Utf8, "rating": pl.Float64, "reviews": pl.Int64}
+    )
+
+
 #########################
 # MAIN SCRIPT
 #########################
 
+def main_async(rate_limit: float = RATE_LIMIT, max_concurrency: int = MAX_CONCURRENCY):
+    ## Load the CSV file into a Polars DataFrame
+    df = pl.read_csv(INPUT_FILE)
+
+    ## Scrape concurrently (resumes from CHECKPOINT_FILE if a previous run was interrupted)
+    out_df = asyncio.run(scrape_airports_async(df, rate_limit=rate_limit, max_concurrency=max_concurrency))
+
+    ## Save results to CSV
+    out_df.write_csv(OUTPUT_FILE)
+    print(f"\n Finished! Results saved in {OUTPUT_FILE}")
+
+
 def main():
     ## Load the CSV file into a Polars DataFrame
     df = pl.read_csv(INPUT_FILE)
@@ -133,4 +416,16 @@ def main():
 # RUN
 #########################
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Scrape Google ratings of the airports of INPUT_FILE")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="concurrent, cached and resumable mode")
+    parser.add_argument("--rate", type=float, default=RATE_LIMIT, help="max requests per second (async mode)")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY, help="max requests in flight (async mode)")
+    parser.add_argument("--base-url", default=BASE_URL, help="Google Places API base URL (e.g. a local stub server)")
+    args = parser.parse_args()
+
+    BASE_URL = args.base_url
+
+    if args.use_async:
+        main_async(rate_limit=args.rate, max_concurrency=args.concurrency)
+    else:
+        main()
\ No newline at end of file
@@ -1,11 +1,187 @@
 import requests
 import pandas as pd
 import ipywidgets as widgets
-from IPython.display import display, clear_output
+from IPython.display import display
 import math
 import polars as pl ## need to harmonize between pandas et polars
 from polars import col as d
 import textwrap
+import os
+import json
+import time
+import asyncio
+import hashlib
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+
+BEA_URL = "https://apps.bea.gov/api/data/"
+BEA_TIMEOUT = 60  # seconds, for every request to the BEA API
+
+
+class BEAClient:
+    """
+    BEA API client with connection pooling, concurrent requests, retry/backoff and a persistent response cache.
+
+    Responses are cached on disk (one JSON file per request, keyed by the request parameters without the API key).
+    A cached response younger than `ttl_days` is reused without any network call; with `offline=True` the
+    cache is always used (even if expired) and a missing response raises an error.
+
+    Parameters:
+        api_key (str): BEA API key.
+        cache_dir (str): Folder of the response cache. Default to "bea_cache".
+        ttl_days (float): Time to live of a cached response, in days. Default to 30. None means never expire.
+        offline (bool): If True, only replay the cache (no network). Default to False.
+        max_workers (int): Number of requests sent at the same time. Default to 8.
+        max_retries (int): Number of retries on throttling (HTTP 429) and server errors. Default to 5.
+        timeout (float): Timeout of a request, in seconds. Default to 60.
+
+    Example:
+        >>> client = BEAClient(API_KEY)
+        >>> df = client.get_state_data_batch({'SAINC1': [1, 2, 3], 'SASUMMARY': [1, 2]})
+    """
+
+    def __init__(self, api_key, cache_dir="bea_cache", ttl_days=30, offline=False, max_workers=8, max_retries=5, timeout=BEA_TIMEOUT):
+        self.api_key = api_key
+        self.cache_dir = cache_dir
+        self.ttl_days = ttl_days
+        self.offline = offline
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.timeout = timeout
+
+        ## one pooled session shared by all the threads
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _cache_path(self, params):
+        """Path of the cached response of a request (the API key is not part of the key)."""
+        key_params = {k: str(v) for k, v in params.items() if k != "UserID"}
+        key = hashlib.sha256(json.dumps(key_params, sort_keys=True).encode()).hexdigest()[:32]
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    @staticmethod
+    def _retry_delay(r, attempt):
+        """Seconds of the Retry-After header, or the exponential backoff if it is missing or an HTTP date."""
+        try:
+            return max(0.0, float(r.headers.get("Retry-After", "")))
+        except ValueError:
+            return 2**attempt
+
+    def _fetch(self, params):
+        """GET a BEA request, retrying with exponential backoff (or Retry-After) on throttling and server errors."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                r = self.session.get(BEA_URL, params={"UserID": self.api_key, "ResultFormat": "JSON", **params}, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(2**attempt)
+                continue
+
+            if r.status_code == 429 or r.status_code >= 500:
+                if attempt == self.max_retries:
+                    r.raise_for_status()
+                time.sleep(self._retry_delay(r, attempt))
+                continue
+
+            r.raise_for_status()
+            return r.json()
+
+    def request(self, params):
+        """
+        Send one request to the BEA API (or replay it from the cache).
+
+        Parameters:
+            params (dict): Request parameters without UserID and ResultFormat (e.g. {"method": "GetData", ...}).
+
+        Returns:
+            dict: The JSON response.
+        """
+        path = self._cache_path(params)
+
+        if os.path.exists(path):
+            with open(path) as f:
+                cached = json.load(f)
+            is_fresh = self.ttl_days is None or (time.time() - cached["fetched_at"]) < self.ttl_days * 86400
+            if is_fresh or self.offline:
+                return cached["response"]
+
+        if self.offline:
+            raise ValueError(f"Offline mode: no cached BEA response for {params}")
+
+        meta = self._fetch(params)
+
+        ## errors are not cached, so that they are retried on the next run
+        if "Error" not in meta.get("BEAAPI", {}).get("Results", {}) and "Error" not in meta.get("BEAAPI", {}):
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"params": params, "fetched_at": time.time(), "response": meta}, f)
+            os.replace(tmp_path, path)
+
+        return meta
+
+    def request_many(self, list_params):
+        """
+        Send several requests concurrently (cached ones are not sent).
+
+        Parameters:
+            list_params (list[dict]): Requests parameters.
+
+        Returns:
+            list[dict]: JSON responses, in the same order as `list_params`.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(self.request, list_params))
+
+    def get_regional_tables(self):
+        """Same as `get_bea_regional_tables`, cached."""
+        return get_bea_regional_tables(self.api_key, client=self)
+
+    def get_table_linecodes(self, table_names):
+        """
+        Line codes of several tables of the BEA Regional dataset, fetched concurrently.
+
+        Parameters:
+            table_names (list[str]): TableName of the tables.
+
+        Returns:
+            pd.DataFrame: TableName, LineCode and LineDescription of every table.
+        """
+        list_params = [_linecodes_params(table_name) for table_name in table_names]
+        metas = self.request_many(list_params)
+
+        return pd.concat([_linecodes_to_frame(meta, table_name) for meta, table_name in zip(metas, table_names)], ignore_index=True)
+
+    def get_state_data(self, table_name, line_codes, metric_note=False):
+        """Same as `get_bea_state_data`, with the line codes fetched concurrently and cached."""
+        return get_bea_state_data(self.api_key, table_name, line_codes, metric_note=metric_note, client=self)
+
+    def get_state_data_batch(self, tables, metric_note=False):
+        """
+        State-level data of several tables and line codes in one batched call (all requests sent concurrently).
+
+        Parameters:
+            tables (dict[str, list[int]]): TableName -> list of LineCodes.
+            metric_note (bool): If True, prints the short descriptive note for each metric retrieved. By default False.
+
+        Returns:
+            pl.DataFrame: Same columns as `get_bea_state_data`, with a TABLE_NAME column first.
+        """
+        requests_list = [(table_name, line_code) for table_name, line_codes in tables.items() for line_code in line_codes]
+        metas = self.request_many([_state_data_params(table_name, line_code) for table_name, line_code in requests_list])
+
+        dfs = [
+            _state_data_to_frame(meta, table_name, line_code, metric_note).select(pl.lit(table_name).alias('TABLE_NAME'), pl.all())
+            for meta, (table_name, line_code) in zip(metas, requests_list)
+        ]
+
+        return pl.concat(dfs)
+
 
 def show_bea_datasets(api_key):
     """
@@ -14,14 +190,13 @@ def show_bea_datasets(api_key):
     Parameters:
         api_key (str): BEA API key
     """
-    base_url = "https://apps.bea.gov/api/data/"
     params = {
         "UserID": api_key,
         "method": "GetDataSetList",
         "ResultFormat": "JSON"
     }
 
-    r = requests.get(base_url, params=params)
+    r = requests.get(BEA_URL, params=params, timeout=BEA_TIMEOUT)
     r.raise_for_status()
     meta = r.json()
 
@@ -37,29 +212,30 @@ def show_bea_datasets(api_key):
         print(f"{key}: {desc}")
 
 
-def get_bea_regional_tables(api_key):
+def get_bea_regional_tables(api_key, client=None):
     """
     Get all available tables in the BEA Regional dataset with a short description for each.
 
     Parameters:
         api_key (str): BEA API key
+        client (BEAClient): If given, the request goes through this client (pooled, cached). Default to None.
 
     Returns:
         df_tables (pd.DataFrame): df containing the DataSetName (Regional), the TableName and the TableDescription
     """
-    base_url = "https://apps.bea.gov/api/data/"
 
     params = {
-        "UserID": api_key,
         "method": "GetParameterValues",
         "DataSetName": 'Regional',
         "ParameterName": 'TableName',
-        "ResultFormat": "JSON"
     }
 
-    r = requests.get(base_url, params=params)
-    r.raise_for_status()
-    meta = r.json()
+    if client is not None:
+        meta = client.request(params)
+    else:
+        r = requests.get(BEA_URL, params={"UserID": api_key, "ResultFormat": "JSON", **params}, timeout=BEA_TIMEOUT)
+        r.raise_for_status()
+        meta = r.json()
 
     if "Results" not in meta["BEAAPI"] or "ParamValue" not in meta["BEAAPI"]["Results"]:
         raise ValueError("Unable to retrieve BEA TableName")
@@ -78,32 +254,43 @@ def get_bea_regional_tables(api_key):
     return df_tables
 
 
-def get_bea_table_linecodes(table_name, api_key):
+def _linecodes_params(table_name):
+    """Parameters of the request listing the line codes of a Regional table."""
+    return {
+        "method": "GetParameterValuesFiltered",
+        "DataSetName": "Regional",
+        "TargetParameter": "LineCode",
+        "TableName": table_name,
+    }
+
+
+def get_bea_table_linecodes(table_name, api_key, client=None):
     """
     Get all available line codes of a table in the BEA Regional dataset with a short description for each line code.
 
     Parameters:
         table_name (str): the TableName of a table from the BEA Regional dataset
         api_key (str): BEA API key
+        client (BEAClient): If given, the request goes through this client (pooled, cached). Default to None.
 
     Returns:
         df_tables (pd.DataFrame): df containing the TableName, the LineCode and the LineDescription
 
     """
-    base_url = "https://apps.bea.gov/api/data/"
-    params = {
-        "UserID": api_key,
-        "method": "GetParameterValuesFiltered",
-        "DataSetName": "Regional",
-        "TargetParameter": "LineCode",   
-        "TableName": table_name,         
-        "ResultFormat": "JSON"
-    }
+    params = _linecodes_params(table_name)
 
-    r = requests.get(base_url, params=params, timeout=60)
-    r.raise_for_status()
-    meta = r.json()
+    if client is not None:
+        meta = client.request(params)
+    else:
+        r = requests.get(BEA_URL, params={"UserID": api_key, "ResultFormat": "JSON", **params}, timeout=BEA_TIMEOUT)
+        r.raise_for_status()
+        meta = r.json()
+
+    return _linecodes_to_frame(meta, table_name)
 
+
+def _linecodes_to_frame(meta, table_name):
+    """Line codes of a GetParameterValuesFiltered response as a pandas DataFrame."""
     results = meta.get("BEAAPI", {}).get("Results", {})
     if "Error" in results:
         raise ValueError(f"BEA API error for {table_name} table")
@@ -121,64 +308,216 @@ def get_bea_table_linecodes(table_name, api_key):
     return df_linecodes
 
 
-def explore_dataframe(df: pd.DataFrame, page_size=20):
+def _text_expr(expr, dtype):
+    """Text of a column with native Polars expressions (lists as "[a, b]", structs as JSON, nested null values as 'None')."""
+    if isinstance(dtype, (pl.List, pl.Array)):
+        inner = dtype.inner
+        items = expr.cast(pl.List(inner)).list.eval(_text_expr(pl.element(), inner).fill_null('None'))
+        return pl.concat_str([pl.lit('['), items.list.join(', '), pl.lit(']')])
+    if isinstance(dtype, pl.Struct):
+        return pl.when(expr.is_not_null()).then(expr.struct.json_encode())
+    return expr.cast(pl.Utf8)
+
+
+class DataFrameFilter:
+    """
+    Case-insensitive "contains" filters on every column of a table, with precomputed and incremental matching.
+
+    The lower-cased text of each column is computed once (Polars). For each column, the rows matching the last
+    filter string are kept: when the new string contains the previous one (the user kept typing), only these rows
+    are searched again instead of the whole column.
+
+    Parameters:
+        df (pd.DataFrame | pl.DataFrame): Table to filter.
+
+    Example:
+        >>> df_filter = DataFrameFilter(df_route_combinaison_enhanced)
+        >>> rows = df_filter.filter({'APT_CODE_A': 'jf', 'APT_CODE_B': 'cdg'})
+        >>> df_filter.page(rows, page=1, page_size=20)
+    """
+
+    def __init__(self, df):
+        if isinstance(df, pd.DataFrame):
+            ## mixed-type object columns (e.g. [1, 'x', None]) cannot be converted by Arrow: their cells as str()
+            df = df.copy(deep=False)
+            for c in df.select_dtypes(include="object").columns:
+                try:
+                    pl.from_pandas(df[c])
+                except (TypeError, ValueError):
+                    df[c] = df[c].map(str).where(df[c].notna(), None)
+
+            df = pl.from_pandas(df)
+
+        self.df = df
+
+        ## lower-cased text of every column (lists as "[a, b]", nulls as 'None' / 'nan')
+        self.lower = self.df.select([
+            _text_expr(d(c), self.df.schema[c])
+            .fill_null('nan' if self.df.schema[c].is_float() else 'None')
+            .str.to_lowercase()
+            .alias(c)
+            for c in self.df.columns
+        ])
+
+        self.columns = self.df.columns
+
+        ## column -> (last filter string, matching row indices)
+        self._matches = {}
+
+    def _column_rows(self, col, pattern):
+        """Indices of the rows of `col` containing `pattern` (already lower-cased)."""
+        previous = self._matches.get(col)
+
+        if previous is not None and previous[0] == pattern:
+            return previous[1]
+
+        ## the new string extends the previous one: only its matching rows can still match
+        if previous is not None and previous[0] in pattern:
+            candidates = previous[1]
+            values = self.lower[col].gather(candidates)
+        else:
+            candidates = None
+            values = self.lower[col]
+
+        mask = values.str.contains(pattern, literal=True).to_numpy()
+        rows = np.flatnonzero(mask) if candidates is None else candidates[mask]
+
+        self._matches[col] = (pattern, rows)
+        return rows
+
+    def filter(self, filters):
+        """
+        Indices of the rows matching all the filters.
+
+        Parameters:
+            filters (dict[str, str]): column -> text to search (case-insensitive, empty strings are ignored).
+
+        Returns:
+            np.ndarray: Sorted row indices.
+        """
+        rows = None
+        for col, value in filters.items():
+            pattern = value.strip().lower()
+            if not pattern:
+                continue
+
+            col_rows = self._column_rows(col, pattern)
+            rows = col_rows if rows is None else np.intersect1d(rows, col_rows, assume_unique=True)
+
+        return np.arange(self.df.height) if rows is None else rows
+
+    def page(self, rows, page, page_size):
+        """Rows of one page of the filtered table (pages start at 1)."""
+        start = (page - 1) * page_size
+        return self.df[rows[start:start + page_size]]
+
+
+def explore_dataframe(df, page_size=20, debounce_ms=150):
     """
     Explore a DataFrame interactively with multi-column filters and pagination.
-    
+
+    Filtering is done by a `DataFrameFilter` (precomputed lower-cased columns, incremental narrowing while typing),
+    the widget events are debounced and only the current page is rendered.
+
     Parameters:
-        df (pd.DataFrame): the DataFrame to explore
+        df (pd.DataFrame | pl.DataFrame): the DataFrame to explore
         page_size (int): number of rows to display per page (default: 20)
+        debounce_ms (int): delay without new event before the table is updated, in milliseconds (default: 150)
     """
-    
-    filter_columns = df.columns.tolist()
+    df_filter = DataFrameFilter(df)
+    filter_columns = df_filter.columns
 
     ## create a text filter widget for each column
     filters = {col: widgets.Text(placeholder=f"Filter {col}…") for col in filter_columns}
-    
+
     ## slider to move between pages
     page_slider = widgets.IntSlider(value=1, min=1, max=1, step=1, description="Page")
     output = widgets.Output()
 
-    def update(_=None):
-        """Update the displayed DataFrame based on filters and current page."""
-        with output:
-            clear_output()
-            df_filtered = df.copy()
-
-            ## apply filters on each selected column
-            for col, widget in filters.items():
-                if widget.value.strip():
-                    df_filtered = df_filtered[
-                        df_filtered[col].astype(str).str.contains(widget.value, case=False, na=False)
-                    ]
-            
-            ## update pagination values
-            n_pages = max(1, math.ceil(len(df_filtered) / page_size))
-            page_slider.max = n_pages
-            current_page = min(page_slider.value, n_pages)
-
-            start = (current_page - 1) * page_size
-            end = start + page_size
-            df_page = df_filtered.iloc[start:end]
-
-            ## display the current page of the DataFrame
-            display(df_page.style.hide(axis="index"))
-            print(f"Page {current_page}/{n_pages} | {len(df_filtered)} rows found")
-
-    ## observe changes in filters and pagination
+    state = {'rows': df_filter.filter({}), 'timer': None}
+
+    def render():
+        """Display the current page of the filtered rows."""
+        n_rows = len(state['rows'])
+        n_pages = max(1, math.ceil(n_rows / page_size))
+        page_slider.max = n_pages
+        current_page = min(page_slider.value, n_pages)
+
+        df_page = df_filter.page(state['rows'], current_page, page_size).to_pandas()
+
+        output.clear_output(wait=True)
+        output.append_display_data(df_page.style.hide(axis="index"))
+        output.append_stdout(f"Page {current_page}/{n_pages} | {n_rows} rows found\n")
+
+    def update():
+        """Update the filtered rows based on filters, then display the current page."""
+        state['rows'] = df_filter.filter({col: widget.value for col, widget in filters.items()})
+        render()
+
+    def on_filter_change(_=None):
+        """Wait `debounce_ms` without new keystroke before filtering (timer of the kernel event loop, same thread as the widgets)."""
+        if state['timer'] is not None:
+            state['timer'].cancel()
+        try:
+            state['timer'] = asyncio.get_running_loop().call_later(debounce_ms / 1000, update)
+        except RuntimeError:
+            ## no event loop (e.g. called outside of a kernel): no debounce
+            update()
+
+    ## observe changes in filters and pagination (changing page does not filter again)
     for widget in filters.values():
-        widget.observe(update, names="value")
-    page_slider.observe(update, names="value")
+        widget.observe(on_filter_change, names="value")
+    page_slider.observe(lambda _: render(), names="value")
 
     ## layout: filters on top, slider below, then the output
     filter_box = widgets.HBox(list(filters.values()))
     display(filter_box, page_slider, output)
 
     ## initial display
-    update()
+    render()
+
+
+def _state_data_params(table_name, line_code):
+    """Parameters of the request of one metric (LineCode) of a Regional table, at the state level."""
+    return {
+        "method": "GetData",
+        "DataSetName": "Regional",
+        "TableName": table_name, ## table from Regional dataset 
+        "LineCode": str(line_code), ## the metrics we want to extract
+        "GeoFIPS": "STATE", ## geographical granularity
+        "Year": 'ALL', #str(year), ## which year
+    }
+
+
+def _state_data_to_frame(meta, table_name, line_code, metric_note=False):
+    """State-level data of a GetData response as a Polars DataFrame (and print the metric description)."""
+    if "Results" not in meta["BEAAPI"] or "Data" not in meta["BEAAPI"]["Results"]:
+        raise ValueError(f"Unable to retrieve BEA data with LineCode {line_code} from {table_name} table")
+
+    df_line_code = (pl.DataFrame(meta["BEAAPI"]["Results"]["Data"])
+                      .rename({'GeoName':'STATE', 'TimePeriod':'YEAR', 'DataValue':'VALUE'})
+                      .with_columns(UNIT_MULT = d.UNIT_MULT.cast(pl.Int64),
+                                    VALUE = d.VALUE.cast(pl.Float64),
+                                    LINE_CODE = line_code,    
+                                    YEAR = d.YEAR.cast(pl.Int32)            
+                                   )
 
+                      .with_columns(VALUE_MULT = d.VALUE*(10**d.UNIT_MULT))
+                      [['STATE', 'YEAR', 'LINE_CODE', 'UNIT_MULT', 'VALUE', 'VALUE_MULT']]
+                    )
 
-def get_bea_state_data(api_key, table_name, line_codes, metric_note=False):
+    print(f"\nLine code {line_code}: {meta['BEAAPI']['Results']['Statistic']} with unit {meta['BEAAPI']['Results']['UnitOfMeasure']}")
+
+    if metric_note:
+        note = meta['BEAAPI']['Results']['Notes'][0]['NoteText']
+        wrapped_note = textwrap.fill(note.strip(), width=100)
+        print("\nShort description:")
+        print(wrapped_note)
+
+    return df_line_code
+
+
+def get_bea_state_data(api_key, table_name, line_codes, metric_note=False, client=None):
 
     """
     Retrieve state-level economic data from the BEA (U.S. Bureau of Economic Analysis) 
@@ -193,6 +532,7 @@ def get_bea_state_data(api_key, table_name, line_codes, metric_note=False):
         table_name (str): BEA Regional table name.
         line_codes (list[int]): List of BEA LineCodes specifying which metrics to extract.
         metric_note (bool): If True, prints the short descriptive note for each metric retrieved. By default False.
+        client (BEAClient): If given, the line codes are fetched concurrently through this client (pooled, cached). Default to None.
 
     Returns:
         df (pl.DataFrame): A Polars DataFrame with the following columns:
@@ -211,51 +551,19 @@ def get_bea_state_data(api_key, table_name, line_codes, metric_note=False):
           including the unit of measure.  
     """
 
-    url = "https://apps.bea.gov/api/data/"
-    dfs = []
-
-    for line_code in line_codes:
-        params = {
-            "UserID": api_key,
-            "method": "GetData",
-            "DataSetName": "Regional",
-            "TableName": table_name, ## table from Regional dataset 
-            "LineCode": str(line_code), ## the metrics we want to extract
-            "GeoFIPS": "STATE", ## geographical granularity
-            "Year": 'ALL', #str(year), ## which year
-            "ResultFormat": "JSON"
-        }
-
-        r = requests.get(url, params=params)
-        r.raise_for_status()
-        meta = r.json()
-
-
-        if "Results" not in meta["BEAAPI"] or "Data" not in meta["BEAAPI"]["Results"]:
-            raise ValueError(f"Unable to retrieve BEA data with LineCode {line_code} from {table_name} table")
-
-        df_line_code = (pl.DataFrame(meta["BEAAPI"]["Results"]["Data"])
-                          .rename({'GeoName':'STATE', 'TimePeriod':'YEAR', 'DataValue':'VALUE'})
-                          .with_columns(UNIT_MULT = d.UNIT_MULT.cast(pl.Int64),
-                                        VALUE = d.VALUE.cast(pl.Float64),
-                                        LINE_CODE = line_code,    
-                                        YEAR = d.YEAR.cast(pl.Int32)            
-                                       )
-
-                          .with_columns(VALUE_MULT = d.VALUE*(10**d.UNIT_MULT))
-                          [['STATE', 'YEAR', 'LINE_CODE', 'UNIT_MULT', 'VALUE', 'VALUE_MULT']]
-                        )
+    list_params = [_state_data_params(table_name, line_code) for line_code in line_codes]
 
-        dfs.append(df_line_code)
+    if client is not None:
+        metas = client.request_many(list_params)
+    else:
+        metas = []
+        for params in list_params:
+            r = requests.get(BEA_URL, params={"UserID": api_key, "ResultFormat": "JSON", **params}, timeout=BEA_TIMEOUT)
+            r.raise_for_status()
+            metas.append(r.json())
 
-        print(f"\nLine code {line_code}: {meta['BEAAPI']['Results']['Statistic']} with unit {meta['BEAAPI']['Results']['UnitOfMeasure']}")
+    dfs = [_state_data_to_frame(meta, table_name, line_code, metric_note) for meta, line_code in zip(metas, line_codes)]
 
-        if metric_note:
-            note = meta['BEAAPI']['Results']['Notes'][0]['NoteText']
-            wrapped_note = textwrap.fill(note.strip(), width=100)
-            print("\nShort description:")
-            print(wrapped_note)
-            
     df = pl.concat(dfs)
 
     return df
@@ -0,0 +1,300 @@
+import os
+import json
+import time
+import hashlib
+import requests
+import pandas as pd
+import polars as pl
+from polars import col as d
+from io import StringIO
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+
+
+#########################
+# CONFIGURATION
+#########################
+
+WIKI_URL = "https://en.wikipedia.org/wiki/"
+
+## set a User-Agent to avoid request blocking
+HEADERS = {"User-Agent": "Mozilla/5.0 (ATSLab airport lists harvester)"}
+
+## states list
+US_STATES = [
+    "Alabama","Alaska","Arizona","Arkansas","California","Colorado","Connecticut","Delaware",
+    "Florida","Georgia","Hawaii","Idaho","Illinois","Indiana","Iowa","Kansas","Kentucky",
+    "Louisiana","Maine","Maryland","Massachusetts","Michigan","Minnesota","Mississippi",
+    "Missouri","Montana","Nebraska","Nevada","New_Hampshire","New_Jersey","New_Mexico",
+    "New_York","North_Carolina","North_Dakota","Ohio","Oklahoma","Oregon","Pennsylvania",
+    "Rhode_Island","South_Carolina","South_Dakota","Tennessee","Texas","Utah","Vermont",
+    "Virginia","Washington","West_Virginia","Wisconsin","Wyoming"
+]
+
+## pages whose title is not "List_of_airports_in_<name>" (homonyms)
+PAGE_TITLE_OVERRIDES = {
+    "Washington": "List_of_airports_in_Washington_(state)",
+    "New_York": "List_of_airports_in_New_York_(state)",
+    "Georgia": "List_of_airports_in_Georgia_(U.S._state)",
+}
+
+## Wikipedia column names -> our column names (the pages are not all consistent)
+WIKI_RENAME = {
+    'City served': 'CITY_SERVED',
+    'City served, Island': 'CITY_SERVED', ## Hawaii
+    'Location served': 'CITY_SERVED', ## most of the non US lists
+    'Airport name': 'APT_NAME',
+    'Role': 'FAA_ROLE',
+    'IATA': 'IATA_CODE',
+    'ICAO': 'ICAO_CODE',
+}
+
+## schema of the harvested tables (same columns as airports_us_wikipedia.csv)
+WIKI_SCHEMA = {
+    'IATA_CODE': pl.Utf8,
+    'ICAO_CODE': pl.Utf8,
+    'APT_NAME': pl.Utf8,
+    'APT_CAT': pl.Utf8,
+    'FAA_ROLE': pl.Utf8,
+    'STATE': pl.Utf8,
+    'CITY_SERVED': pl.Utf8,
+}
+
+
+#########################
+# HELPER FUNCTIONS
+#########################
+
+def airport_list_pages(names: list[str]) -> dict[str, str]:
+    """
+    Wikipedia page title of the airport list of each state/country.
+
+    Parameters:
+        names (list[str]): States or countries, as in the page titles (e.g. "New_York", "United_Kingdom").
+
+    Returns:
+        dict[str, str]: name -> page title.
+    """
+    return {name: PAGE_TITLE_OVERRIDES.get(name, f"List_of_airports_in_{name}") for name in names}
+
+
+def parse_airport_table(html: str, name: str) -> pl.DataFrame:
+    """
+    Parse the airport table of a Wikipedia list page into a typed Polars frame.
+
+    The category header rows (only the airport name column filled) are turned into the
+    APT_CAT column of the rows below them with a forward fill, instead of a Python loop.
+
+    Parameters:
+        html (str): HTML of the page.
+        name (str): State/country of the page (STATE column).
+
+    Returns:
+        pl.DataFrame: Table with the WIKI_SCHEMA columns (empty if no airport table is found).
+    """
+    tables = pd.read_html(StringIO(html))
+
+    ## keep only the tables that have columns "Airport name" or "Role"
+    tables = [t for t in tables if 'Airport name' in t.columns or 'Role' in t.columns]
+    if not tables:
+        return pl.DataFrame(schema=WIKI_SCHEMA)
+
+    df = tables[0]
+    df.columns = [" ".join(map(str, c)) if isinstance(c, tuple) else str(c) for c in df.columns]
+    df = pl.from_pandas(df.astype("string")) ## every cell as text, missing cells as null
+
+    first_col = df.columns[0]
+    airport_col = 'Airport name' if 'Airport name' in df.columns else df.columns[min(4, len(df.columns) - 1)]
+    other_cols = [c for c in df.columns if c != airport_col]
+
+    df = (
+        df
+        ## rows with only the airport column filled are category headers
+        .with_columns(APT_CAT = pl.when(d(airport_col).is_not_null() & pl.all_horizontal([d(c).is_null() for c in other_cols]))
+                                  .then(d(airport_col))
+                                  .forward_fill())
+
+        ## remove rows where the first column is empty (headers, banners)
+        .filter(d(first_col).is_not_null())
+
+        .rename({c: WIKI_RENAME[c] for c in df.columns if c in WIKI_RENAME and WIKI_RENAME[c] not in df.columns})
+        .with_columns(STATE = pl.lit(name))
+    )
+
+    return df.select([(d(c) if c in df.columns else pl.lit(None)).cast(dtype).alias(c) for c, dtype in WIKI_SCHEMA.items()])
+
+
+#########################
+# HTML CACHE
+#########################
+
+class WikiPageCache:
+    """
+    Local content cache of Wikipedia pages with conditional revalidation.
+
+    For each page, the cache keeps the raw HTML, its ETag/Last-Modified headers, the hash of
+    the HTML and the parsed table (parquet). A refresh sends If-None-Match/If-Modified-Since:
+    on "304 Not Modified" (or an identical content hash) the parsed table is reused without
+    re-parsing the page.
+
+    Parameters:
+        cache_dir (str): Folder of the cache. Default to "wiki_cache".
+        max_workers (int): Number of pages fetched at the same time. Default to 8.
+        timeout (float): Timeout of a request, in seconds. Default to 30.
+    """
+
+    def __init__(self, cache_dir="wiki_cache", max_workers=8, timeout=30):
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        self.session.mount("https://", HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers))
+
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, title, ext):
+        """Path of a cached file of a page."""
+        return os.path.join(self.cache_dir, f"{hashlib.sha256(title.encode()).hexdigest()[:24]}.{ext}")
+
+    def _read_meta(self, title):
+        """Cached metadata of a page (None if the page is not cached)."""
+        path = self._path(title, "json")
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def fetch(self, title, refresh=True):
+        """
+        Get the HTML of a page, revalidated against Wikipedia.
+
+        Parameters:
+            title (str): Page title.
+            refresh (bool): If False, a cached page is returned without any request. Default to True.
+
+        Returns:
+            tuple[str, bool]: the HTML and True if it changed since the previous fetch.
+        """
+        meta = self._read_meta(title)
+        html_path = self._path(title, "html")
+
+        if meta is not None and not refresh:
+            with open(html_path, encoding="utf-8") as f:
+                return f.read(), False
+
+        headers = {}
+        if meta is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        response = self.session.get(WIKI_URL + quote(title, safe="_()."), headers=headers, timeout=self.timeout)
+
+        if response.status_code == 304:
+            with open(html_path, encoding="utf-8") as f:
+                return f.read(), False
+        response.raise_for_status()
+
+        html = response.text
+        content_hash = hashlib.sha256(html.encode()).hexdigest()
+        changed = meta is None or meta.get("content_hash") != content_hash
+
+        with open(html_path, "w", encoding="utf-8") as f:
+            f.write(html)
+        with open(self._path(title, "json"), "w") as f:
+            json.dump({
+                "title": title,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "content_hash": content_hash,
+                "parsed_hash": meta.get("parsed_hash") if meta else None,
+                "fetched_at": time.time(),
+            }, f)
+
+        return html, changed
+
+    def get_table(self, title, name, refresh=True):
+        """
+        Airport table of a page, parsed only if the page changed since it was last parsed.
+
+        Parameters:
+            title (str): Page title.
+            name (str): State/country of the page (STATE column).
+            refresh (bool): If False, cached pages are not revalidated. Default to True.
+
+        Returns:
+            pl.DataFrame: Table with the WIKI_SCHEMA columns.
+        """
+        html, _ = self.fetch(title, refresh=refresh)
+        meta = self._read_meta(title)
+        parquet_path = self._path(title, "parquet")
+
+        ## the parsed table is up to date with the cached HTML
+        if meta.get("parsed_hash") == meta["content_hash"] and os.path.exists(parquet_path):
+            return pl.read_parquet(parquet_path).with_columns(STATE = pl.lit(name))
+
+        df = parse_airport_table(html, name)
+        df.write_parquet(parquet_path)
+
+        meta["parsed_hash"] = meta["content_hash"]
+        with open(self._path(title, "json"), "w") as f:
+            json.dump(meta, f)
+
+        return df
+
+
+#########################
+# MAIN FUNCTIONS
+#########################
+
+def harvest_airport_lists(
+    pages: dict[str, str],
+    cache_dir: str = "wiki_cache",
+    max_workers: int = 8,
+    refresh: bool = True
+) -> pl.DataFrame:
+    """
+    Fetch several Wikipedia airport list pages concurrently and concat their airport tables.
+
+    Parameters:
+        pages (dict[str, str]): name (STATE column) -> page title, e.g. `airport_list_pages(US_STATES)`.
+        cache_dir (str): Folder of the HTML cache. Default to "wiki_cache".
+        max_workers (int): Number of pages fetched at the same time. Default to 8.
+        refresh (bool): If True, cached pages are revalidated (conditional requests);
+                        if False, cached pages are used as they are. Default to True.
+
+    Returns:
+        pl.DataFrame: All the airports, with the WIKI_SCHEMA columns.
+
+    Example:
+        >>> all_airports_df = harvest_airport_lists(airport_list_pages(US_STATES))
+        >>> all_airports_df.write_csv("airports_us_wikipedia.csv")
+        >>> df_eu = harvest_airport_lists(airport_list_pages(["France", "Germany", "Italy"]))
+    """
+    cache = WikiPageCache(cache_dir, max_workers=max_workers)
+
+    def harvest(item):
+        name, title = item
+        try:
+            df = cache.get_table(title, name, refresh=refresh)
+            print(f"{name} : {len(df)} added lines")
+            return df
+        except Exception as e:
+            print(f"Error for {name} : {e}")
+            return pl.DataFrame(schema=WIKI_SCHEMA)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        dfs = list(executor.map(harvest, pages.items()))
+
+    return pl.concat(dfs)
+
+
+def harvest_us_airports(cache_dir: str = "wiki_cache", max_workers: int = 8, refresh: bool = True) -> pl.DataFrame:
+    """
+    Airports of the 50 US states from Wikipedia (same output as wikipedia_us_airports_scrapper.ipynb).
+    """
+    return harvest_airport_lists(airport_list_pages(US_STATES), cache_dir=cache_dir, max_workers=max_workers, refresh=refresh)
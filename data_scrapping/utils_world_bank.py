@@ -0,0 +1,323 @@
+import os
+import time
+import datetime
+import requests
+import polars as pl
+from polars import col as d
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+
+
+#########################
+# CONFIGURATION
+#########################
+
+WB_URL = "https://api.worldbank.org/v2/country/all/indicator/"
+
+## schema of the long format store
+STORE_SCHEMA = {
+    'INDICATOR_CODE': pl.Utf8,
+    'COUNTRY_CODE': pl.Utf8, ## ISO3 code (same as the "id" of wbdata.get_countries())
+    'COUNTRY_ISO2': pl.Utf8, ## ISO2 code (same as APT_COUNTRY_CODE of the airports tables)
+    'COUNTRY_NAME': pl.Utf8,
+    'YEAR': pl.Int32,
+    'VALUE': pl.Float64,
+}
+
+## schema of the coverage table: which (indicator, year) slices have already been downloaded
+COVERAGE_SCHEMA = {
+    'INDICATOR_CODE': pl.Utf8,
+    'YEAR': pl.Int32,
+}
+
+
+class WorldBankStore:
+    """
+    Local, incremental store of World Bank indicators (long format parquet).
+
+    The store keeps one row per (INDICATOR_CODE, COUNTRY_ISO2, YEAR) in `values.parquet`, and the list of
+    the (indicator, year) slices already downloaded in `coverage.parquet`. `update` only downloads the missing
+    slices, one request per indicator, with the indicators fetched concurrently.
+
+    The World Bank publishes with a lag: a slice is covered once it has at least one value, or once it is
+    older than `publication_lag` years (then it has no data for good). The recent years without data are
+    downloaded again by the next `update`, and `update(..., refresh=True)` downloads again all the recent years.
+
+    Parameters:
+        store_dir (str): Folder of the store. Default to "worldbank_store".
+        max_workers (int): Number of indicators downloaded at the same time. Default to 8.
+        max_retries (int): Number of retries on server errors. Default to 4.
+        timeout (float): Timeout of a request, in seconds. Default to 60.
+        publication_lag (int): Number of years before the current year that can still get new values. Default to 2.
+
+    Example:
+        >>> store = WorldBankStore()
+        >>> store.update([ind["code"] for ind in indicators], 2000, 2023)
+        >>> df_country = store.get_wide(ind_dict, years=(2000, 2023))
+    """
+
+    def __init__(self, store_dir="worldbank_store", max_workers=8, max_retries=4, timeout=60, publication_lag=2):
+        self.store_dir = store_dir
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.publication_lag = publication_lag
+
+        self.values_path = os.path.join(store_dir, "values.parquet")
+        self.coverage_path = os.path.join(store_dir, "coverage.parquet")
+
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers))
+
+        os.makedirs(store_dir, exist_ok=True)
+
+    #########################
+    # STORAGE
+    #########################
+
+    def scan(self):
+        """Lazy frame of the stored values."""
+        if not os.path.exists(self.values_path):
+            return pl.LazyFrame(schema=STORE_SCHEMA)
+        return pl.scan_parquet(self.values_path)
+
+    def coverage(self):
+        """(INDICATOR_CODE, YEAR) slices already downloaded."""
+        if not os.path.exists(self.coverage_path):
+            return pl.DataFrame(schema=COVERAGE_SCHEMA)
+        return pl.read_parquet(self.coverage_path)
+
+    def _write(self, df_values, df_coverage):
+        """Add new values and covered slices to the store (atomic replace of both files)."""
+        df_values = (
+            pl.concat([self.scan().collect(), df_values])
+            .unique(subset=['INDICATOR_CODE', 'COUNTRY_ISO2', 'YEAR'], keep='last')
+            .sort('INDICATOR_CODE', 'COUNTRY_CODE', 'YEAR')
+        )
+        df_coverage = pl.concat([self.coverage(), df_coverage]).unique().sort('INDICATOR_CODE', 'YEAR')
+
+        for df, path in [(df_values, self.values_path), (df_coverage, self.coverage_path)]:
+            df.write_parquet(path + ".tmp")
+            os.replace(path + ".tmp", path)
+
+    #########################
+    # DOWNLOAD
+    #########################
+
+    def first_recent_year(self):
+        """First year that can still get new values (the years before it are final)."""
+        return datetime.date.today().year - self.publication_lag
+
+    def missing_slices(self, indicator_codes, start_year, end_year, refresh=False):
+        """
+        Years not downloaded yet for each indicator.
+
+        Parameters:
+            refresh (bool): If True, the recent years (see `first_recent_year`) are missing even if covered. Default to False.
+
+        Returns:
+            dict[str, list[int]]: indicator code -> missing years (only indicators with missing years).
+        """
+        covered = {}
+        for code, year in self.coverage().iter_rows():
+            if not (refresh and year >= self.first_recent_year()):
+                covered.setdefault(code, set()).add(year)
+
+        missing = {}
+        for code in indicator_codes:
+            years = [y for y in range(start_year, end_year + 1) if y not in covered.get(code, set())]
+            if years:
+                missing[code] = years
+
+        return missing
+
+    def _fetch_indicator(self, code, start_year, end_year):
+        """
+        Download one indicator for all the countries between two years (all the pages).
+
+        The store is yearly: the quarterly / monthly observations of an indicator (date "2019Q1", "2019M01") are skipped.
+        """
+        rows, page, nb_pages = [], 1, 1
+        while page <= nb_pages:
+            params = {"date": f"{start_year}:{end_year}", "format": "json", "per_page": 20000, "page": page}
+
+            for attempt in range(self.max_retries + 1):
+                try:
+                    r = self.session.get(WB_URL + code, params=params, timeout=self.timeout)
+                    if r.status_code < 500:
+                        break
+                except (requests.ConnectionError, requests.Timeout):
+                    if attempt == self.max_retries:
+                        raise
+                if attempt < self.max_retries:
+                    time.sleep(2**attempt)
+            r.raise_for_status()
+            meta = r.json()
+
+            ## an unknown indicator returns a message instead of [pagination, data]
+            if len(meta) < 2 or meta[1] is None:
+                if isinstance(meta[0], dict) and "message" in meta[0]:
+                    raise ValueError(f"World Bank API error for {code}: {meta[0]['message']}")
+                break
+
+            nb_pages = meta[0]["pages"]
+            rows += [
+                {
+                    'INDICATOR_CODE': code,
+                    'COUNTRY_CODE': item.get("countryiso3code") or None,
+                    'COUNTRY_ISO2': item["country"]["id"],
+                    'COUNTRY_NAME': item["country"]["value"],
+                    'YEAR': int(item["date"]),
+                    'VALUE': item["value"],
+                }
+                for item in meta[1]
+                if str(item["date"]).isdigit()
+            ]
+            page += 1
+
+        return pl.DataFrame(rows, schema=STORE_SCHEMA)
+
+    def update(self, indicator_codes, start_year, end_year, refresh=False):
+        """
+        Download the missing (indicator, year) slices, indicators in parallel, and add them to the store.
+
+        An indicator that fails (HTTP error, unknown code...) is logged and left missing: the indicators already
+        downloaded are still written, and the next call retries the failed ones only. A recent year without any
+        value (not published yet) is not marked as covered, so the next call asks for it again.
+
+        Parameters:
+            indicator_codes (list[str]): World Bank indicator codes (e.g. "SP.POP.TOTL").
+            start_year (int): First year needed.
+            end_year (int): Last year needed.
+            refresh (bool): If True, also download again the recent years already covered (revised or completed
+                            figures). Default to False.
+
+        Returns:
+            dict[str, list[int]]: the slices downloaded during this call (without the failed indicators).
+        """
+        missing = self.missing_slices(indicator_codes, start_year, end_year, refresh=refresh)
+        if not missing:
+            print("Everything already in the store")
+            return {}
+
+        print(f"Downloading {len(missing)} indicators from World Bank API...")
+
+        def fetch(item):
+            code, years = item
+            try:
+                return self._fetch_indicator(code, min(years), max(years))
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = dict(zip(missing, executor.map(fetch, missing.items())))
+
+        failed = {code: e for code, e in results.items() if isinstance(e, Exception)}
+        downloaded = {code: years for code, years in missing.items() if code not in failed}
+
+        if downloaded:
+            df_values = pl.concat([results[code] for code in downloaded]).filter(d.VALUE.is_not_null())
+
+            ## a recent year without values may not be published yet: covered only once it has data
+            with_data = set(df_values.select('INDICATOR_CODE', 'YEAR').unique().iter_rows())
+            df_coverage = pl.DataFrame(
+                [
+                    {'INDICATOR_CODE': code, 'YEAR': year}
+                    for code, years in downloaded.items() for year in years
+                    if (code, year) in with_data or year < self.first_recent_year()
+                ],
+                schema=COVERAGE_SCHEMA
+            )
+            self._write(df_values, df_coverage)
+
+        for code, e in failed.items():
+            print(f"{code}: failed ({type(e).__name__}: {e}), not stored")
+        if failed:
+            print(f"{len(failed)} indicators failed, run again to retry them")
+        else:
+            print("Download completed!")
+
+        return downloaded
+
+    #########################
+    # LOOKUP
+    #########################
+
+    def get(self, indicators, years=None, countries=None):
+        """
+        Stored values in long format.
+
+        Parameters:
+            indicators (dict[str, str] | list[str]): Indicator codes, or code -> name (adds an INDICATOR_NAME column).
+            years (tuple[int, int]): (first, last) year. Default to None (all years).
+            countries (list[str]): ISO3 country codes. Default to None (all countries).
+
+        Returns:
+            pl.DataFrame: INDICATOR_CODE, (INDICATOR_NAME), COUNTRY_CODE, COUNTRY_ISO2, COUNTRY_NAME, YEAR, VALUE.
+        """
+        lf = self.scan().filter(d.INDICATOR_CODE.is_in(list(indicators)))
+        if years is not None:
+            lf = lf.filter(d.YEAR.is_between(years[0], years[1]))
+        if countries is not None:
+            lf = lf.filter(d.COUNTRY_CODE.is_in(countries))
+        if isinstance(indicators, dict):
+            lf = lf.with_columns(INDICATOR_NAME = d.INDICATOR_CODE.replace_strict(indicators, return_dtype=pl.Utf8))
+
+        return lf.collect()
+
+    def get_wide(self, indicators, years=None, countries=None):
+        """
+        Stored values with one column per indicator (same layout as the wbdata.get_dataframe extract).
+
+        Parameters:
+            indicators (dict[str, str]): Indicator code -> column name.
+            years (tuple[int, int]): (first, last) year. Default to None (all years).
+            countries (list[str]): ISO3 country codes. Default to None (all countries).
+
+        Returns:
+            pl.DataFrame: COUNTRY_CODE, COUNTRY_ISO2, COUNTRY_NAME, YEAR and one column per indicator.
+        """
+        df_wide = (
+            self.get(indicators, years, countries)
+            .pivot(on='INDICATOR_NAME', index=['COUNTRY_CODE', 'COUNTRY_ISO2', 'COUNTRY_NAME', 'YEAR'], values='VALUE')
+            .sort('COUNTRY_CODE', 'YEAR')
+        )
+
+        ## indicators without any value are still returned (as null columns)
+        return df_wide.with_columns([pl.lit(None, dtype=pl.Float64).alias(name) for name in indicators.values() if name not in df_wide.columns])
+
+    def join(self, df, indicators, country_col, year_col=None, suffix="", iso2=False):
+        """
+        Join country-level indicators onto a table of airports or routes.
+
+        Parameters:
+            df (pl.DataFrame): Table to enrich.
+            indicators (dict[str, str]): Indicator code -> column name.
+            country_col (str): Column of `df` with the country code (ISO3, or ISO2 if `iso2`).
+            year_col (str): Column of `df` with the year. Default to None (latest non-null value of every indicator and country).
+            suffix (str): Suffix added to the indicator columns (e.g. "_A" / "_B" for the two ends of a route). Default to "".
+            iso2 (bool): If True, `country_col` holds ISO2 codes (e.g. APT_COUNTRY_CODE). Default to False.
+
+        Returns:
+            pl.DataFrame: `df` with one column per indicator.
+
+        Example:
+            >>> df_airports = store.join(df_airports, {"SP.POP.TOTL": "POPU"}, "APT_COUNTRY_CODE", iso2=True)
+            >>> df_scheduled = store.join(df_scheduled, {"SP.POP.TOTL": "POPU"}, "APT_COUNTRY_CODE_A", "YEAR", suffix="_A", iso2=True)
+        """
+        key = 'COUNTRY_ISO2' if iso2 else 'COUNTRY_CODE'
+        df_wide = self.get_wide(indicators).drop('COUNTRY_NAME', 'COUNTRY_ISO2' if key == 'COUNTRY_CODE' else 'COUNTRY_CODE')
+
+        if year_col is None:
+            ## the latest year differs between indicators and countries
+            df_wide = df_wide.sort('YEAR').group_by(key).agg(pl.exclude('YEAR').drop_nulls().last())
+            on_right = [key]
+            on_left = [country_col]
+        else:
+            on_right = [key, 'YEAR']
+            on_left = [country_col, year_col]
+            df_wide = df_wide.with_columns(d.YEAR.cast(df.schema[year_col]))
+
+        df_wide = df_wide.rename({name: f"{name}{suffix}" for name in indicators.values()})
+
+        return df.join(df_wide, left_on=on_left, right_on=on_right, how='left')